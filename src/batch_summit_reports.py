@@ -0,0 +1,211 @@
+"""
+Generate summit reports for local GPX and FIT files that have not been uploaded to Strava, such as archives of club
+event logs. Directories are searched recursively for activity files. For example, from the src directory:
+
+    python batch_summit_reports.py ~/club_events/2022 --workers 8 --output reports.jsonl
+
+Files are processed in parallel by a pool of worker processes. The summit database is loaded once, before the pool is
+started, and is shared by the forked workers.
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Union
+
+from data_sources.activity_files import ACTIVITY_FILE_EXTENSIONS, read_activity_file
+from data_sources.summits import SummitReference, open_summit_reference
+from summits.parallel import resolve_worker_count
+from summits.report_configuration import REPORT_CONFIG
+from summits.summit_report import generate_summit_report
+from summits.visited_summits import find_visited_summits
+
+DEFAULT_DATABASE_FILEPATH = os.environ.get('summit_database_path',
+                                           os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data_sources',
+                                                        'database.pkl'))
+
+# Summit reference of each worker process, set by the pool initialiser
+_worker_summit_reference: Union[SummitReference, None] = None
+
+
+@dataclass
+class FileReport:
+    """
+    :param filepath: path of the activity file
+    :param points: number of track points read from the file
+    :param summits: number of summits visited
+    :param report: summit report, or None if no summits were visited or the file could not be processed
+    :param seconds: time taken to read and search the file
+    :param error: description of the error if the file could not be processed
+    """
+    filepath: str
+    points: int = 0
+    summits: int = 0
+    report: Union[str, None] = None
+    seconds: float = 0.
+    error: Union[str, None] = None
+
+
+def find_activity_files(paths: Iterable[str]) -> List[str]:
+    """
+    Expand a list of paths into activity files: files are included as given, and directories are searched recursively
+    for GPX and FIT files, in sorted order.
+    """
+    filepaths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filepaths.append(path)
+            continue
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories.sort()
+            filepaths.extend(os.path.join(directory, filename) for filename in sorted(filenames)
+                             if os.path.splitext(filename)[1].lower() in ACTIVITY_FILE_EXTENSIONS)
+    return filepaths
+
+
+def open_shared_summit_reference(database_filepath: str) -> SummitReference:
+    """
+    Open the summit database and load it into this process's cache of summit tables, so that processes forked
+    afterwards share the loaded table instead of each reading the database.
+    """
+    summit_reference = open_summit_reference(database_filepath,
+                                             classification_codes=REPORT_CONFIG.classification_codes)
+    summit_reference.warm()
+    return summit_reference
+
+
+def report_activity_file(filepath: str,
+                         summit_reference: SummitReference,
+                         elevation_tolerance: Union[float, None] = None) -> FileReport:
+    """
+    Read an activity file and report the summits visited. Errors, and files without any track points, are recorded in
+    the returned FileReport, so that one unreadable file does not stop a batch.
+    """
+    start_time = time.perf_counter()
+    file_report = FileReport(filepath=filepath)
+    try:
+        gpx_trail = read_activity_file(filepath)
+        file_report.points = gpx_trail.length
+        if not gpx_trail.length:
+            file_report.error = 'The file contains no track points'
+            file_report.seconds = time.perf_counter() - start_time
+            return file_report
+
+        visited_summits = find_visited_summits(summit_reference_data=summit_reference,
+                                               gpx_trail=gpx_trail,
+                                               elevation_tolerance=elevation_tolerance)
+        file_report.summits = len(visited_summits)
+        file_report.report = generate_summit_report(summits=visited_summits, config=REPORT_CONFIG)
+    except Exception as error:
+        logging.exception(f'Unable to report the summits of {filepath}')
+        file_report.error = f'{type(error).__name__}: {error}'
+    file_report.seconds = time.perf_counter() - start_time
+    return file_report
+
+
+def batch_summit_reports(filepaths: Iterable[str],
+                         database_filepath: str = DEFAULT_DATABASE_FILEPATH,
+                         workers: Union[int, None] = None,
+                         elevation_tolerance: Union[float, None] = None) -> Iterator[FileReport]:
+    """
+    Report the summits visited by each of a list of activity files, in a pool of worker processes.
+
+    :param filepaths: paths of GPX or FIT files
+    :param database_filepath: path of the summit database, or the directory of a tiled summit database
+    :param workers: number of worker processes. If None, one worker is used per available CPU. With one worker, the
+    files are processed in the current process.
+    :param elevation_tolerance: if given, prune the summit search by elevation, with this allowance in metres
+    :return: iterator of the file reports, in the order of filepaths, yielded as each file is processed
+    """
+    summit_reference = open_shared_summit_reference(database_filepath)
+    workers = resolve_worker_count(workers)
+    if workers == 1:
+        for filepath in filepaths:
+            yield report_activity_file(filepath, summit_reference, elevation_tolerance=elevation_tolerance)
+        return
+
+    # Forked workers inherit the summit table loaded above; with other start methods, each worker loads the table when
+    # it processes its first file
+    mp_context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=mp_context,
+                             initializer=_initialise_worker,
+                             initargs=(database_filepath,)) as executor:
+        yield from executor.map(_report_activity_file_in_worker, filepaths, itertools.repeat(elevation_tolerance))
+
+
+def _initialise_worker(database_filepath: str):
+    global _worker_summit_reference
+    _worker_summit_reference = open_summit_reference(database_filepath,
+                                                     classification_codes=REPORT_CONFIG.classification_codes)
+
+
+def _report_activity_file_in_worker(filepath: str, elevation_tolerance: Union[float, None]) -> FileReport:
+    return report_activity_file(filepath, _worker_summit_reference, elevation_tolerance=elevation_tolerance)
+
+
+def summarise_batch(file_reports: List[FileReport], seconds: float) -> Dict:
+    """
+    Summarise the throughput of a batch.
+
+    :param file_reports: reports of the processed files
+    :param seconds: wall-clock time taken to process the batch
+    :return: dictionary of file, point and summit counts, and throughput in files and points per second
+    """
+    points = sum(r.points for r in file_reports)
+    return {'files': len(file_reports),
+            'failed': sum(r.error is not None for r in file_reports),
+            'points': points,
+            'summits': sum(r.summits for r in file_reports),
+            'seconds': seconds,
+            'files_per_second': len(file_reports) / seconds if seconds > 0 else 0.,
+            'points_per_second': points / seconds if seconds > 0 else 0.}
+
+
+def format_summary(summary: Dict) -> str:
+    return (f"Processed {summary['files']} files ({summary['failed']} failed), {summary['points']} points and "
+            f"{summary['summits']} summit visits in {summary['seconds']:.1f} s: "
+            f"{summary['files_per_second']:.1f} files/s, {summary['points_per_second']:.0f} points/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate summit reports for local GPX and FIT files.')
+    parser.add_argument('paths', nargs='+', help='activity files, or directories searched recursively for them')
+    parser.add_argument('--database', default=DEFAULT_DATABASE_FILEPATH,
+                        help='path of the summit database, or the directory of a tiled summit database')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes, by default one per CPU')
+    parser.add_argument('--elevation-tolerance', type=float, default=None,
+                        help='prune the summit search by elevation, with this allowance in metres')
+    parser.add_argument('--output', default=None,
+                        help='write the reports to this file as JSON lines, instead of printing them')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    filepaths = find_activity_files(args.paths)
+    start_time = time.perf_counter()
+    file_reports = []
+    output = open(args.output, 'w') if args.output is not None else None
+    try:
+        for file_report in batch_summit_reports(filepaths, database_filepath=args.database, workers=args.workers,
+                                                elevation_tolerance=args.elevation_tolerance):
+            file_reports.append(file_report)
+            if output is not None:
+                output.write(json.dumps(asdict(file_report)) + '\n')
+            else:
+                print(f'{file_report.filepath}\n{file_report.error or file_report.report or "No summits visited"}\n')
+    finally:
+        if output is not None:
+            output.close()
+
+    print(format_summary(summarise_batch(file_reports, time.perf_counter() - start_time)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
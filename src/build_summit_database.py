@@ -0,0 +1,67 @@
+"""
+Build the summit database artifact used by update_strava_description from the hills database CSV
+(http://www.hills-database.co.uk/downloads.html), e.g. from the src directory:
+
+    python build_summit_database.py DoBIH_v17_5.csv data_sources/database.pkl
+
+Large datasets, such as worldwide peak datasets in the same format, can be sharded into spatial tiles that are loaded
+on demand, by giving a tile size in decimal degrees and an output directory:
+
+    python build_summit_database.py world_peaks.csv data_sources/world_peaks --tile-size 1
+"""
+import argparse
+import logging
+from typing import Union
+
+import pandas as pd
+
+from data_sources.summit_database import (HEIGHT_COLUMN, ID_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN, NAME_COLUMN,
+                                          optimise_summit_table, write_summit_database)
+from data_sources.tiled_summits import write_tiled_summit_database
+from summits.report_configuration import REPORT_CONFIG
+
+
+def build_summit_database(csv_filepath: str,
+                          output_filepath: str,
+                          encoding: str = 'latin-1',
+                          tile_size: Union[float, None] = None) -> str:
+    """
+    Read the hills database CSV, keeping only the columns used to report summits, and write an optimised, versioned
+    summit database artifact.
+
+    :param csv_filepath: path of the hills database CSV
+    :param output_filepath: path at which the artifact is written, or the output directory if tile_size is given
+    :param encoding: text encoding of the CSV
+    :param tile_size: if given, write a tiled summit database with tiles of this size in decimal degrees
+    :return: version of the written database
+    """
+    classification_columns = REPORT_CONFIG.classification_codes
+    retained_columns = {ID_COLUMN, NAME_COLUMN, HEIGHT_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN,
+                        *classification_columns}
+    raw = pd.read_csv(csv_filepath, usecols=lambda c: c in retained_columns, encoding=encoding, low_memory=False)
+
+    table = optimise_summit_table(raw, classification_columns=classification_columns)
+    if tile_size is not None:
+        version = write_tiled_summit_database(table, output_filepath, classification_codes=classification_columns,
+                                              tile_size=tile_size)
+    else:
+        version = write_summit_database(table, output_filepath, classification_codes=classification_columns)
+    logging.info(f'Wrote {len(table)} summits to {output_filepath} (version {version})')
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the summit database artifact from the hills database CSV.')
+    parser.add_argument('csv', help='path of the hills database CSV')
+    parser.add_argument('output', help='path at which the summit database artifact is written')
+    parser.add_argument('--encoding', default='latin-1', help='text encoding of the CSV')
+    parser.add_argument('--tile-size', type=float, default=None,
+                        help='write a tiled database to the output directory, with tiles of this size in degrees')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(build_summit_database(args.csv, args.output, encoding=args.encoding, tile_size=args.tile_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import os
+import struct
+import xml.etree.ElementTree as ElementTree
+from array import array
+from typing import BinaryIO, Dict, Iterator, Tuple, Union
+
+import numpy as np
+
+from models.coordinates import CoordinateSet
+
+GPX_EXTENSION = '.gpx'
+FIT_EXTENSION = '.fit'
+ACTIVITY_FILE_EXTENSIONS = (GPX_EXTENSION, FIT_EXTENSION)
+
+# FIT global message number of record messages, and field numbers of their position and altitude fields
+FIT_RECORD_MESSAGE = 20
+FIT_POSITION_LAT_FIELD = 0
+FIT_POSITION_LONG_FIELD = 1
+FIT_ALTITUDE_FIELD = 2
+FIT_ENHANCED_ALTITUDE_FIELD = 78
+# struct formats and invalid values of the FIT base types used by the position and altitude fields
+FIT_BASE_TYPES = {0x85: ('i', 0x7FFFFFFF), 0x84: ('H', 0xFFFF), 0x86: ('I', 0xFFFFFFFF)}
+SEMICIRCLES_TO_DEGREES = 180. / 2 ** 31
+
+# Point of an activity file: latitude and longitude in decimal degrees, and altitude in metres (NaN if not recorded)
+TrackPoint = Tuple[float, float, float]
+
+
+class ActivityFileError(Exception):
+    pass
+
+
+def read_activity_file(filepath: str) -> CoordinateSet:
+    """
+    Read the track of a GPX or FIT activity file, selected by the file extension. The file is parsed incrementally, so
+    only the track coordinates are held in memory, not the whole file.
+
+    :param filepath: path of a .gpx or .fit file
+    :return: CoordinateSet of the track points, with altitudes if every point has one
+    :raises ActivityFileError: if the file type is not supported, or the file cannot be parsed
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == GPX_EXTENSION:
+        points = iter_gpx_points(filepath)
+    elif extension == FIT_EXTENSION:
+        points = iter_fit_points(filepath)
+    else:
+        raise ActivityFileError(f'Unsupported activity file type: {filepath}')
+
+    latitude, longitude, altitude = array('d'), array('d'), array('d')
+    for point_latitude, point_longitude, point_altitude in points:
+        latitude.append(point_latitude)
+        longitude.append(point_longitude)
+        altitude.append(point_altitude)
+
+    altitude = np.frombuffer(altitude, dtype=np.float64) if len(altitude) else np.empty(0)
+    return CoordinateSet(latitude=np.frombuffer(latitude, dtype=np.float64) if len(latitude) else np.empty(0),
+                         longitude=np.frombuffer(longitude, dtype=np.float64) if len(longitude) else np.empty(0),
+                         altitude=altitude if len(altitude) and not np.isnan(altitude).any() else None)
+
+
+def iter_gpx_points(filepath: str) -> Iterator[TrackPoint]:
+    """
+    Yield the track points of a GPX file in order, parsing the file incrementally and removing each track point
+    element from its parent once it has been read, so that memory does not grow with the length of a track segment.
+    """
+    # Open elements, from the root to the element being parsed
+    ancestors = []
+    try:
+        for event, element in ElementTree.iterparse(filepath, events=('start', 'end')):
+            if event == 'start':
+                ancestors.append(element)
+                continue
+
+            ancestors.pop()
+            if _local_name(element.tag) == 'trkpt':
+                elevation = next((child.text for child in element if _local_name(child.tag) == 'ele'), None)
+                yield (float(element.attrib['lat']), float(element.attrib['lon']),
+                       float(elevation) if elevation else np.nan)
+                if ancestors:
+                    ancestors[-1].remove(element)
+    except (ElementTree.ParseError, KeyError, ValueError) as error:
+        raise ActivityFileError(f'Unable to parse GPX file {filepath}: {error}')
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_fit_points(filepath: str) -> Iterator[TrackPoint]:
+    """
+    Yield the positions of the record messages of a FIT file in order, reading the file one message at a time. Records
+    without a valid position, e.g. before a GPS fix, are skipped. Chained FIT files are read in sequence.
+    """
+    with open(filepath, 'rb') as file:
+        try:
+            while True:
+                data_size = _read_fit_header(file, filepath)
+                if data_size is None:
+                    return
+                yield from _iter_fit_records(file, data_size, filepath)
+                # File CRC
+                file.read(2)
+        except struct.error as error:
+            raise ActivityFileError(f'Unable to parse FIT file {filepath}: {error}')
+
+
+def _read_fit_header(file: BinaryIO, filepath: str) -> Union[int, None]:
+    header_size = file.read(1)
+    if not header_size:
+        return None
+    header = header_size + file.read(max(header_size[0] - 1, 0))
+    if len(header) < 12 or header[8:12] != b'.FIT':
+        raise ActivityFileError(f'{filepath} is not a FIT file')
+    return struct.unpack('<I', header[4:8])[0]
+
+
+def _iter_fit_records(file: BinaryIO, data_size: int, filepath: str) -> Iterator[TrackPoint]:
+    # Definitions of the local message types, as (size, decoder) pairs. The decoder is None for messages other than
+    # records, which are skipped.
+    definitions: Dict[int, Tuple[int, Union['_FitRecordDecoder', None]]] = {}
+    end = file.tell() + data_size
+    while file.tell() < end:
+        record_header = _read_exactly(file, 1, filepath)[0]
+        if record_header & 0x80:
+            # Compressed timestamp header, followed by a data message
+            local_message_type = (record_header >> 5) & 0x03
+        elif record_header & 0x40:
+            definitions[record_header & 0x0F] = _read_fit_definition(file, bool(record_header & 0x20), filepath)
+            continue
+        else:
+            local_message_type = record_header & 0x0F
+
+        if local_message_type not in definitions:
+            raise ActivityFileError(f'Unable to parse FIT file {filepath}: undefined local message type')
+        size, decoder = definitions[local_message_type]
+        message = _read_exactly(file, size, filepath)
+        if decoder is not None:
+            point = decoder.decode(message)
+            if point is not None:
+                yield point
+
+
+def _read_fit_definition(file: BinaryIO, has_developer_fields: bool,
+                         filepath: str) -> Tuple[int, Union['_FitRecordDecoder', None]]:
+    fixed = _read_exactly(file, 5, filepath)
+    byte_order = '>' if fixed[1] else '<'
+    global_message_number = struct.unpack(byte_order + 'H', fixed[2:4])[0]
+    fields = [tuple(_read_exactly(file, 3, filepath)) for _ in range(fixed[4])]
+    size = sum(field_size for _, field_size, _ in fields)
+    if has_developer_fields:
+        developer_field_count = _read_exactly(file, 1, filepath)[0]
+        size += sum(_read_exactly(file, 3, filepath)[1] for _ in range(developer_field_count))
+
+    if global_message_number != FIT_RECORD_MESSAGE:
+        return size, None
+    return size, _FitRecordDecoder(fields, byte_order, size)
+
+
+def _read_exactly(file: BinaryIO, size: int, filepath: str) -> bytes:
+    data = file.read(size)
+    if len(data) < size:
+        raise ActivityFileError(f'Unable to parse FIT file {filepath}: unexpected end of file')
+    return data
+
+
+class _FitRecordDecoder:
+    """
+    Decodes the position and altitude fields of record messages of one definition, skipping every other field.
+    """
+    decoded_fields = (FIT_POSITION_LAT_FIELD, FIT_POSITION_LONG_FIELD, FIT_ALTITUDE_FIELD, FIT_ENHANCED_ALTITUDE_FIELD)
+
+    def __init__(self, fields, byte_order: str, size: int):
+        message_format = byte_order
+        self.field_numbers = []
+        self.invalid_values = []
+        for field_number, field_size, base_type in fields:
+            base_type_format = FIT_BASE_TYPES.get(base_type)
+            if (field_number in self.decoded_fields and base_type_format is not None and
+                    struct.calcsize('<' + base_type_format[0]) == field_size):
+                message_format += base_type_format[0]
+                self.field_numbers.append(field_number)
+                self.invalid_values.append(base_type_format[1])
+            else:
+                message_format += f'{field_size}x'
+        # Developer fields follow the fields of the definition
+        message_format += f'{size - sum(field_size for _, field_size, _ in fields)}x'
+        self.struct = struct.Struct(message_format)
+
+    def decode(self, message: bytes) -> Union[TrackPoint, None]:
+        values = {field_number: value
+                  for field_number, value, invalid_value in zip(self.field_numbers, self.struct.unpack(message),
+                                                                self.invalid_values)
+                  if value != invalid_value}
+        if FIT_POSITION_LAT_FIELD not in values or FIT_POSITION_LONG_FIELD not in values:
+            return None
+
+        altitude = values.get(FIT_ENHANCED_ALTITUDE_FIELD, values.get(FIT_ALTITUDE_FIELD))
+        return (values[FIT_POSITION_LAT_FIELD] * SEMICIRCLES_TO_DEGREES,
+                values[FIT_POSITION_LONG_FIELD] * SEMICIRCLES_TO_DEGREES,
+                altitude / 5. - 500. if altitude is not None else np.nan)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Protocol, Union
+
+import numpy as np
+
+DEFAULT_MAX_REPORTS = 1024
+
+
+class ReportStore(Protocol):
+    def get(self, key: str) -> Union[Dict, None]:
+        pass
+
+    def put(self, key: str, value: Dict):
+        pass
+
+
+class InMemoryReportStore:
+    """
+    Report store held in memory, shared by invocations that run in the same process. The least recently used reports
+    are discarded beyond max_reports, so that a long-lived container or queue worker does not grow without limit.
+
+    :param max_reports: maximum number of reports held in memory
+    """
+
+    def __init__(self, max_reports: int = DEFAULT_MAX_REPORTS):
+        self.max_reports = max_reports
+        self._reports: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Union[Dict, None]:
+        with self._lock:
+            report = self._reports.get(key)
+            if report is not None:
+                self._reports.move_to_end(key)
+            return report
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._reports[key] = value
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+
+    def __len__(self):
+        return len(self._reports)
+
+
+class LocalFileReportStore:
+    """
+    Report store persisted to a local directory, with one JSON file per key.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Union[Dict, None]:
+        filepath = self._filepath(key)
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r') as file:
+            return json.load(file)
+
+    def put(self, key: str, value: Dict):
+        temporary_filepath = self._filepath(key) + '.tmp'
+        with open(temporary_filepath, 'w') as file:
+            json.dump(value, file)
+        os.replace(temporary_filepath, self._filepath(key))
+
+    def _filepath(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+
+def hash_arrays(*arrays: np.array) -> str:
+    """
+    Return a hex digest of the contents of one or more numeric arrays, after conversion to float64.
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        values = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def hash_strings(*values: str) -> str:
+    """
+    Return a hex digest of an ordered sequence of strings.
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(value.encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
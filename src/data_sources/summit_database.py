@@ -0,0 +1,238 @@
+import hashlib
+import pickle
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ARTIFACT_FORMAT = 'summit-database'
+ARTIFACT_FORMAT_VERSION = 2
+# Fixed prefix at the start of every artifact, so that artifacts can be told apart from plain pickled DataFrames without
+# unpickling anything. The magic bytes are followed by the format version, as an unsigned big-endian short.
+ARTIFACT_MAGIC = b'SUMMITDB'
+_VERSION_PREFIX = struct.Struct('>H')
+HILBERT_ORDER = 16
+
+ID_COLUMN = 'Number'
+NAME_COLUMN = 'Name'
+HEIGHT_COLUMN = 'Metres'
+LATITUDE_COLUMN = 'Latitude'
+LONGITUDE_COLUMN = 'Longitude'
+STORED_HEIGHT_COLUMN = 'Decimetres'
+CLASSIFICATION_COLUMN = 'Classification'
+
+
+class SummitDatabaseError(Exception):
+    pass
+
+
+def hilbert_index(latitude: np.array, longitude: np.array, order: int = HILBERT_ORDER) -> np.array:
+    """
+    Position of each coordinate along a Hilbert curve covering the globe, with 2 ** order cells along each axis.
+    Coordinates that are close together on the ground are usually close together along the curve.
+
+    :param latitude: array of latitudes in decimal degrees
+    :param longitude: array of longitudes in decimal degrees
+    :param order: number of bits used to quantise each axis
+    :return: array of int64 curve positions
+    """
+    n = 1 << order
+    x = np.clip(((np.asarray(longitude, dtype=np.float64) + 180.) / 360. * n).astype(np.int64), 0, n - 1)
+    y = np.clip(((np.asarray(latitude, dtype=np.float64) + 90.) / 180. * n).astype(np.int64), 0, n - 1)
+    d = np.zeros(len(x), dtype=np.int64)
+
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+
+        # rotate the quadrant so that the curve is continuous
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return d
+
+
+def optimise_summit_table(raw: pd.DataFrame, classification_columns: List[str]) -> pd.DataFrame:
+    """
+    Reduce a raw hills database table to the columns used to report summits, with compact data types, sorted along a
+    Hilbert curve so that summits that are close together are stored together.
+
+    Coordinates are stored as float32, and names as a categorical. Heights are stored as whole decimetres in the
+    smallest integer type that fits (int16 for the British and Irish hills), so that the one-decimal heights used in
+    reports are preserved exactly. The classification flag columns are encoded into a single bitmask column, with one
+    bit per classification in the order given.
+
+    :param raw: table read from the hills database CSV
+    :param classification_columns: classification flag columns to encode, in bit order
+    :return: optimised summit table
+    """
+    required_columns = [NAME_COLUMN, HEIGHT_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN]
+    missing_columns = [c for c in required_columns if c not in raw.columns]
+    if missing_columns:
+        raise SummitDatabaseError(f'Hills database is missing required columns: {missing_columns}')
+
+    raw = raw.dropna(subset=[HEIGHT_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN])
+    order = np.argsort(hilbert_index(raw[LATITUDE_COLUMN].values, raw[LONGITUDE_COLUMN].values), kind='stable')
+    raw = raw.iloc[order]
+
+    decimetres = np.round(raw[HEIGHT_COLUMN].values.astype(np.float64) * 10.)
+    table = pd.DataFrame({NAME_COLUMN: pd.Categorical(raw[NAME_COLUMN].astype(str).values),
+                          STORED_HEIGHT_COLUMN: decimetres.astype(_smallest_int_dtype(decimetres)),
+                          LATITUDE_COLUMN: raw[LATITUDE_COLUMN].values.astype(np.float32),
+                          LONGITUDE_COLUMN: raw[LONGITUDE_COLUMN].values.astype(np.float32)})
+    if ID_COLUMN in raw.columns:
+        table.insert(0, ID_COLUMN, raw[ID_COLUMN].values.astype(np.int32))
+    table[CLASSIFICATION_COLUMN] = encode_classification_bitmask(raw, classification_columns)
+    return table
+
+
+def classification_bitmask_dtype(n_classifications: int) -> type:
+    """
+    Smallest unsigned integer type with at least one bit per classification.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_classifications <= np.iinfo(dtype).bits:
+            return dtype
+    raise SummitDatabaseError(f'Cannot encode {n_classifications} classifications in a single bitmask')
+
+
+def encode_classification_bitmask(table: pd.DataFrame, classification_columns: Sequence[str]) -> np.array:
+    """
+    Encode classification flag columns (values denoting True/False are 1/0 respectively) as one bitmask per row, where
+    bit i is set if the row belongs to classification_columns[i]. Classifications without a column are left unset.
+
+    :param table: table of summits, including classification flag columns
+    :param classification_columns: classification flag columns, in bit order
+    :return: array of bitmasks, one per row
+    """
+    dtype = classification_bitmask_dtype(len(classification_columns))
+    masks = np.zeros(len(table), dtype=dtype)
+    for bit, column in enumerate(classification_columns):
+        if column in table.columns:
+            flags = pd.to_numeric(table[column], errors='coerce').fillna(0).values == 1
+            masks |= flags.astype(dtype) << dtype(bit)
+    return masks
+
+
+def remap_classification_bitmask(masks: np.array,
+                                 from_codes: Sequence[str],
+                                 to_codes: Sequence[str]) -> np.array:
+    """
+    Translate bitmasks from one classification bit layout to another. Classifications missing from the source layout
+    are left unset.
+
+    :param masks: array of bitmasks in the from_codes layout
+    :param from_codes: classification codes of the source layout, in bit order
+    :param to_codes: classification codes of the target layout, in bit order
+    :return: array of bitmasks in the to_codes layout
+    """
+    if list(from_codes) == list(to_codes):
+        return masks
+
+    dtype = classification_bitmask_dtype(len(to_codes))
+    source_bits = {code: bit for bit, code in enumerate(from_codes)}
+    remapped = np.zeros(len(masks), dtype=dtype)
+    for bit, code in enumerate(to_codes):
+        if code in source_bits:
+            flags = (masks >> masks.dtype.type(source_bits[code])) & masks.dtype.type(1)
+            remapped |= flags.astype(dtype) << dtype(bit)
+    return remapped
+
+
+def _smallest_int_dtype(values: np.array) -> type:
+    for dtype in (np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return dtype
+    return np.int64
+
+
+def write_summit_database(table: pd.DataFrame, filepath: str, classification_codes: Sequence[str]) -> str:
+    """
+    Write an optimised summit table to a versioned artifact. The artifact holds a fixed prefix of magic bytes and the
+    format version, then a small pickled header, followed by the pickled table. The header records the format, row
+    count, columns, classification bit layout and a content hash of the table, which serves as the database version.
+
+    :param table: optimised summit table, as returned by optimise_summit_table
+    :param filepath: artifact path
+    :param classification_codes: classification codes encoded in the bitmask column, in bit order
+    :return: database version
+    """
+    data = pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL)
+    version = hashlib.sha256(data).hexdigest()
+    header = {'format': ARTIFACT_FORMAT,
+              'format_version': ARTIFACT_FORMAT_VERSION,
+              'version': version,
+              'rows': len(table),
+              'columns': list(table.columns),
+              'classification_codes': list(classification_codes)}
+    with open(filepath, 'wb') as file:
+        file.write(ARTIFACT_MAGIC + _VERSION_PREFIX.pack(ARTIFACT_FORMAT_VERSION))
+        pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.write(data)
+    return version
+
+
+def read_summit_database_header(filepath: str) -> Dict:
+    """
+    Read the header of a summit database artifact, without loading the table.
+
+    :raises SummitDatabaseError: if the file is not a summit database artifact of a supported format version
+    """
+    with open(filepath, 'rb') as file:
+        return _read_header(file)
+
+
+def read_summit_database(filepath: str, validate: bool = True) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Load a summit database artifact, decoding heights back to metres.
+
+    :param filepath: artifact path
+    :param validate: if True, check the table against the content hash and row count recorded in the header
+    :return: tuple of the artifact header and the summit table
+    :raises SummitDatabaseError: if the artifact is not valid
+    """
+    with open(filepath, 'rb') as file:
+        header = _read_header(file)
+        data = file.read()
+
+    if validate and hashlib.sha256(data).hexdigest() != header['version']:
+        raise SummitDatabaseError(f'Summit database {filepath} does not match its content hash')
+
+    table = pickle.loads(data)
+    if validate and len(table) != header['rows']:
+        raise SummitDatabaseError(f'Summit database {filepath} does not contain the expected number of rows')
+
+    table[HEIGHT_COLUMN] = table.pop(STORED_HEIGHT_COLUMN).astype(np.float64) / 10.
+    return header, table
+
+
+def is_summit_database_artifact(filepath: str) -> bool:
+    """
+    Whether a file is a summit database artifact, of any format version, judged from its first few bytes only.
+    """
+    with open(filepath, 'rb') as file:
+        return file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+
+
+def _read_header(file) -> Dict:
+    if file.read(len(ARTIFACT_MAGIC)) != ARTIFACT_MAGIC:
+        raise SummitDatabaseError(f'{file.name} is not a summit database artifact')
+    version_prefix = file.read(_VERSION_PREFIX.size)
+    format_version = _VERSION_PREFIX.unpack(version_prefix)[0] if len(version_prefix) == _VERSION_PREFIX.size else None
+    if format_version != ARTIFACT_FORMAT_VERSION:
+        raise SummitDatabaseError(f'Unsupported summit database format version: {format_version}')
+
+    try:
+        header = pickle.load(file)
+    except Exception:
+        raise SummitDatabaseError(f'{file.name} has a corrupted summit database header')
+
+    if not isinstance(header, dict) or header.get('format') != ARTIFACT_FORMAT:
+        raise SummitDatabaseError(f'{file.name} has a corrupted summit database header')
+    return header
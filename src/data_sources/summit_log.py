@@ -0,0 +1,464 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Protocol, Sequence, Union
+
+import boto3
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from data_sources.summit_database import CLASSIFICATION_COLUMN, ID_COLUMN
+
+# Period key of the all-time aggregates; yearly aggregates are keyed by the year, e.g. '2022'
+ALL_TIME = 'all'
+
+
+@dataclass
+class SummitVisit:
+    """
+    :param summit_id: ID of the summit in the summit database
+    :param classification_mask: classification bitmask of the summit, in the bit layout of the summit log
+    """
+    summit_id: int
+    classification_mask: int
+
+
+@dataclass
+class SummitAscents:
+    summit_id: int
+    classification_mask: int
+    first_activity_id: int
+    first_ascent_date: datetime.date
+    ascents: int
+
+
+@dataclass
+class RecordedActivity:
+    """
+    :param activity_id: Strava activity ID
+    :param summit_ids: IDs of the summits visited by the activity
+    :param new_summit_ids: IDs of the summits of which the activity is the athlete's first recorded ascent
+    :param already_recorded: True if the activity had been recorded before, in which case the log was not changed
+    """
+    activity_id: int
+    summit_ids: List[int] = field(default_factory=list)
+    new_summit_ids: List[int] = field(default_factory=list)
+    already_recorded: bool = False
+
+
+class SummitLog(Protocol):
+    """
+    Log of the summits visited by each athlete's activities, with aggregates that are updated as each activity is
+    recorded, so that they can be read without reprocessing the athlete's history.
+    """
+    classification_codes: List[str]
+
+    def record_activity(self, athlete_id: int, activity_id: int, activity_date: datetime.date,
+                        visits: Sequence[SummitVisit]) -> RecordedActivity:
+        pass
+
+    def classification_totals(self, athlete_id: int, year: Union[int, None] = None) -> Dict[str, int]:
+        pass
+
+    def visited_summit_ids(self, athlete_id: int, year: Union[int, None] = None,
+                           classification_code: Union[str, None] = None) -> List[int]:
+        pass
+
+    def summit_ascents(self, athlete_id: int, summit_ids: Sequence[int]) -> Dict[int, SummitAscents]:
+        pass
+
+
+class SQLiteSummitLog:
+    """
+    Summit log held in a SQLite database: a local file, or by default an in-memory database that is only shared by
+    invocations in the same process. Recording an activity takes a constant number of indexed reads and writes per
+    visited summit, in a single transaction, so its cost does not grow with the athlete's history:
+
+    - the first ascent, ascent count and classification of each summit are held per athlete and summit
+    - the distinct summits visited in each year, and of all time, are held per athlete and period, and each summit
+      added to a period increments that period's total for each of the summit's classifications
+
+    An activity that is recorded again, e.g. on a repeated event, leaves the log unchanged. Activities may be recorded
+    out of order, e.g. when backfilling: an activity dated before a summit's first recorded ascent becomes its first
+    ascent.
+
+    :param database: path of the SQLite database file, or ':memory:'
+    :param classification_codes: classification codes of the bits of the recorded classification bitmasks, in bit order
+    """
+
+    def __init__(self, database: str = ':memory:', classification_codes: Sequence[str] = ()):
+        self.database = database
+        self.classification_codes = list(classification_codes)
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS activities (
+                    athlete_id INTEGER, activity_id INTEGER, activity_date TEXT,
+                    PRIMARY KEY (athlete_id, activity_id));
+                CREATE TABLE IF NOT EXISTS visits (
+                    athlete_id INTEGER, activity_id INTEGER, summit_id INTEGER,
+                    PRIMARY KEY (athlete_id, activity_id, summit_id));
+                CREATE TABLE IF NOT EXISTS ascents (
+                    athlete_id INTEGER, summit_id INTEGER, classification_mask INTEGER, first_activity_id INTEGER,
+                    first_ascent_date TEXT, ascents INTEGER,
+                    PRIMARY KEY (athlete_id, summit_id));
+                CREATE TABLE IF NOT EXISTS period_summits (
+                    athlete_id INTEGER, period TEXT, summit_id INTEGER,
+                    PRIMARY KEY (athlete_id, period, summit_id));
+                CREATE TABLE IF NOT EXISTS classification_totals (
+                    athlete_id INTEGER, period TEXT, classification TEXT, summits INTEGER,
+                    PRIMARY KEY (athlete_id, period, classification));
+            """)
+
+    def record_activity(self,
+                        athlete_id: int,
+                        activity_id: int,
+                        activity_date: datetime.date,
+                        visits: Sequence[SummitVisit]) -> RecordedActivity:
+        """
+        Record the summits visited by an activity, and update the athlete's aggregates.
+
+        :param athlete_id: Strava athlete ID
+        :param activity_id: Strava activity ID
+        :param activity_date: local start date of the activity, which determines the year it counts towards
+        :param visits: summits visited by the activity
+        :return: the summits recorded for the activity, and which of them are first ascents
+        """
+        visits = list({visit.summit_id: visit for visit in visits}.values())
+        with self._lock, self._connection:
+            cursor = self._connection.cursor()
+            cursor.execute('INSERT OR IGNORE INTO activities VALUES (?, ?, ?)',
+                           (athlete_id, activity_id, activity_date.isoformat()))
+            if not cursor.rowcount:
+                return self._recorded_activity(cursor, athlete_id, activity_id)
+
+            new_summit_ids = []
+            for visit in visits:
+                cursor.execute('INSERT INTO visits VALUES (?, ?, ?)', (athlete_id, activity_id, visit.summit_id))
+                if self._record_ascent(cursor, athlete_id, activity_id, activity_date, visit):
+                    new_summit_ids.append(visit.summit_id)
+                for period in (ALL_TIME, str(activity_date.year)):
+                    self._add_to_period(cursor, athlete_id, period, visit)
+
+        return RecordedActivity(activity_id=activity_id,
+                                summit_ids=[visit.summit_id for visit in visits],
+                                new_summit_ids=new_summit_ids)
+
+    def classification_totals(self, athlete_id: int, year: Union[int, None] = None) -> Dict[str, int]:
+        """
+        Number of distinct summits of each classification visited by an athlete.
+
+        :param athlete_id: Strava athlete ID
+        :param year: if given, only count summits visited in this year
+        :return: dictionary of summit counts, keyed by classification code. Classifications without any visited summits
+        are omitted.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT classification, summits FROM classification_totals '
+                'WHERE athlete_id = ? AND period = ? AND summits > 0',
+                (athlete_id, _period(year))).fetchall()
+        return dict(rows)
+
+    def visited_summit_ids(self,
+                           athlete_id: int,
+                           year: Union[int, None] = None,
+                           classification_code: Union[str, None] = None) -> List[int]:
+        """
+        IDs of the distinct summits visited by an athlete, e.g. the Munros visited this year.
+
+        :param athlete_id: Strava athlete ID
+        :param year: if given, only return summits visited in this year
+        :param classification_code: if given, only return summits of this classification
+        """
+        query = ('SELECT period_summits.summit_id, ascents.classification_mask FROM period_summits '
+                 'JOIN ascents USING (athlete_id, summit_id) '
+                 'WHERE period_summits.athlete_id = ? AND period = ? ORDER BY period_summits.summit_id')
+        with self._lock:
+            rows = self._connection.execute(query, (athlete_id, _period(year))).fetchall()
+        if classification_code is None:
+            return [summit_id for summit_id, _ in rows]
+        bit = 1 << self.classification_codes.index(classification_code)
+        return [summit_id for summit_id, mask in rows if mask & bit]
+
+    def summit_ascents(self, athlete_id: int, summit_ids: Sequence[int]) -> Dict[int, SummitAscents]:
+        """
+        First ascent and number of ascents of each of the given summits, for those the athlete has visited.
+        """
+        with self._lock:
+            cursor = self._connection.cursor()
+            ascents = [self._read_ascents(cursor, athlete_id, summit_id) for summit_id in summit_ids]
+        return {a.summit_id: a for a in ascents if a is not None}
+
+    def close(self):
+        self._connection.close()
+
+    def _record_ascent(self, cursor: sqlite3.Cursor, athlete_id: int, activity_id: int, activity_date: datetime.date,
+                       visit: SummitVisit) -> bool:
+        # Returns True if the activity is the first recorded ascent of the summit
+        ascents = self._read_ascents(cursor, athlete_id, visit.summit_id)
+        if ascents is None:
+            cursor.execute('INSERT INTO ascents VALUES (?, ?, ?, ?, ?, 1)',
+                           (athlete_id, visit.summit_id, visit.classification_mask, activity_id,
+                            activity_date.isoformat()))
+            return True
+
+        is_first_ascent = activity_date < ascents.first_ascent_date
+        if is_first_ascent:
+            ascents.first_activity_id, ascents.first_ascent_date = activity_id, activity_date
+        cursor.execute('UPDATE ascents SET first_activity_id = ?, first_ascent_date = ?, ascents = ascents + 1 '
+                       'WHERE athlete_id = ? AND summit_id = ?',
+                       (ascents.first_activity_id, ascents.first_ascent_date.isoformat(), athlete_id,
+                        visit.summit_id))
+        return is_first_ascent
+
+    def _add_to_period(self, cursor: sqlite3.Cursor, athlete_id: int, period: str, visit: SummitVisit):
+        cursor.execute('INSERT OR IGNORE INTO period_summits VALUES (?, ?, ?)', (athlete_id, period, visit.summit_id))
+        if not cursor.rowcount:
+            return
+        for classification in _classifications(visit.classification_mask, self.classification_codes):
+            cursor.execute('INSERT INTO classification_totals VALUES (?, ?, ?, 1) '
+                           'ON CONFLICT (athlete_id, period, classification) DO UPDATE SET summits = summits + 1',
+                           (athlete_id, period, classification))
+
+    def _recorded_activity(self, cursor: sqlite3.Cursor, athlete_id: int, activity_id: int) -> RecordedActivity:
+        summit_ids = [row[0] for row in cursor.execute(
+            'SELECT summit_id FROM visits WHERE athlete_id = ? AND activity_id = ?', (athlete_id, activity_id))]
+        new_summit_ids = [summit_id for summit_id in summit_ids
+                          if self._read_ascents(cursor, athlete_id, summit_id).first_activity_id == activity_id]
+        return RecordedActivity(activity_id=activity_id, summit_ids=summit_ids, new_summit_ids=new_summit_ids,
+                                already_recorded=True)
+
+    def _read_ascents(self, cursor: sqlite3.Cursor, athlete_id: int, summit_id: int) -> Union[SummitAscents, None]:
+        row = cursor.execute('SELECT classification_mask, first_activity_id, first_ascent_date, ascents FROM ascents '
+                             'WHERE athlete_id = ? AND summit_id = ?', (athlete_id, summit_id)).fetchone()
+        if row is None:
+            return None
+        return SummitAscents(summit_id=summit_id, classification_mask=row[0], first_activity_id=row[1],
+                             first_ascent_date=datetime.date.fromisoformat(row[2]), ascents=row[3])
+
+
+class DynamoDBSummitLog:
+    """
+    Summit log backed by a DynamoDB table, with a string partition key 'athlete_key' and a string sort key 'item_key',
+    so that it is shared by every container and persists between cold starts. Each athlete's items are:
+
+    - 'activity:<activity_id>': the activity's date and visited summits, marked complete once it has been recorded
+    - 'ascent:<summit_id>': the summit's classification, first ascent, and the set of activities that visited it
+    - 'period:<period>:summit:<summit_id>': a summit visited in the period, 'all' or a year
+    - 'totals:<period>:<classification>': the number of distinct summits of the classification visited in the period
+
+    Every write that records an activity is conditional, so recording an activity is idempotent: an activity that is
+    recorded again, concurrently or after a failure part way through, completes the recording without counting any
+    summit twice. As with SQLiteSummitLog, the cost of recording an activity does not grow with the athlete's history,
+    and an activity dated before a summit's first recorded ascent becomes its first ascent.
+
+    :param table: DynamoDB table, or any table exposing the boto3 Table interface
+    :param classification_codes: classification codes of the bits of the recorded classification bitmasks, in bit order
+    """
+    partition_key = 'athlete_key'
+    sort_key = 'item_key'
+
+    def __init__(self, table, classification_codes: Sequence[str] = ()):
+        self.table = table
+        self.classification_codes = list(classification_codes)
+
+    def record_activity(self,
+                        athlete_id: int,
+                        activity_id: int,
+                        activity_date: datetime.date,
+                        visits: Sequence[SummitVisit]) -> RecordedActivity:
+        """
+        Record the summits visited by an activity, and update the athlete's aggregates. See SQLiteSummitLog.
+        """
+        visits = list({visit.summit_id: visit for visit in visits}.values())
+        activity_item = self._read(athlete_id, f'activity:{activity_id}')
+        if activity_item is not None and activity_item.get('complete'):
+            return self._recorded_activity(athlete_id, activity_id, [int(i) for i in activity_item['summit_ids']],
+                                           already_recorded=True)
+
+        self.table.put_item(Item={**self._key(athlete_id, f'activity:{activity_id}'),
+                                  'activity_date': activity_date.isoformat(),
+                                  'summit_ids': [visit.summit_id for visit in visits]})
+        for visit in visits:
+            self._record_ascent(athlete_id, activity_id, activity_date, visit)
+            for period in (ALL_TIME, str(activity_date.year)):
+                self._add_to_period(athlete_id, period, visit)
+        self.table.update_item(Key=self._key(athlete_id, f'activity:{activity_id}'),
+                               UpdateExpression='SET complete = :complete',
+                               ExpressionAttributeValues={':complete': True})
+
+        return self._recorded_activity(athlete_id, activity_id, [visit.summit_id for visit in visits],
+                                       already_recorded=False)
+
+    def classification_totals(self, athlete_id: int, year: Union[int, None] = None) -> Dict[str, int]:
+        prefix = f'totals:{_period(year)}:'
+        return {item[self.sort_key][len(prefix):]: int(item['summits'])
+                for item in self._query(athlete_id, prefix) if item['summits'] > 0}
+
+    def visited_summit_ids(self,
+                           athlete_id: int,
+                           year: Union[int, None] = None,
+                           classification_code: Union[str, None] = None) -> List[int]:
+        items = self._query(athlete_id, f'period:{_period(year)}:summit:')
+        if classification_code is not None:
+            bit = 1 << self.classification_codes.index(classification_code)
+            items = [item for item in items if int(item['classification_mask']) & bit]
+        return sorted(int(item['summit_id']) for item in items)
+
+    def summit_ascents(self, athlete_id: int, summit_ids: Sequence[int]) -> Dict[int, SummitAscents]:
+        ascents = [self._read_ascents(athlete_id, summit_id) for summit_id in summit_ids]
+        return {a.summit_id: a for a in ascents if a is not None}
+
+    def _record_ascent(self, athlete_id: int, activity_id: int, activity_date: datetime.date, visit: SummitVisit):
+        key = self._key(athlete_id, f'ascent:{visit.summit_id}')
+        self._update_if(key,
+                        update='ADD activity_ids :activity_ids SET classification_mask = :mask',
+                        condition='NOT contains(activity_ids, :activity_id)',
+                        values={':activity_ids': {activity_id}, ':activity_id': activity_id,
+                                ':mask': visit.classification_mask})
+        # ISO dates compare in date order
+        self._update_if(key,
+                        update='SET first_activity_id = :activity_id, first_ascent_date = :date',
+                        condition='attribute_not_exists(first_ascent_date) OR first_ascent_date > :date',
+                        values={':activity_id': activity_id, ':date': activity_date.isoformat()})
+
+    def _add_to_period(self, athlete_id: int, period: str, visit: SummitVisit):
+        # The summit is added to the period, and counted in the period's totals, in one transaction conditional on
+        # the summit not being in the period yet
+        athlete_key = {'S': self._athlete_key(athlete_id)}
+        transact_items = [{'Put': {'TableName': self.table.name,
+                                   'Item': {self.partition_key: athlete_key,
+                                            self.sort_key: {'S': f'period:{period}:summit:{visit.summit_id}'},
+                                            'summit_id': {'N': str(visit.summit_id)},
+                                            'classification_mask': {'N': str(visit.classification_mask)}},
+                                   'ConditionExpression': 'attribute_not_exists(#key)',
+                                   'ExpressionAttributeNames': {'#key': self.sort_key}}}]
+        transact_items += [{'Update': {'TableName': self.table.name,
+                                       'Key': {self.partition_key: athlete_key,
+                                               self.sort_key: {'S': f'totals:{period}:{classification}'}},
+                                       'UpdateExpression': 'ADD summits :one',
+                                       'ExpressionAttributeValues': {':one': {'N': '1'}}}}
+                           for classification in _classifications(visit.classification_mask, self.classification_codes)]
+        try:
+            self.table.meta.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+
+    def _recorded_activity(self, athlete_id: int, activity_id: int, summit_ids: List[int],
+                           already_recorded: bool) -> RecordedActivity:
+        # New summits are read back from the first ascents, so that they are reported consistently for an activity
+        # recorded concurrently, or again
+        ascents = self.summit_ascents(athlete_id, summit_ids)
+        return RecordedActivity(activity_id=activity_id,
+                                summit_ids=summit_ids,
+                                new_summit_ids=[summit_id for summit_id in summit_ids
+                                                if ascents[summit_id].first_activity_id == activity_id],
+                                already_recorded=already_recorded)
+
+    def _read_ascents(self, athlete_id: int, summit_id: int) -> Union[SummitAscents, None]:
+        item = self._read(athlete_id, f'ascent:{summit_id}')
+        if item is None:
+            return None
+        return SummitAscents(summit_id=summit_id,
+                             classification_mask=int(item['classification_mask']),
+                             first_activity_id=int(item['first_activity_id']),
+                             first_ascent_date=datetime.date.fromisoformat(item['first_ascent_date']),
+                             ascents=len(item['activity_ids']))
+
+    def _update_if(self, key: Dict, update: str, condition: str, values: Dict) -> bool:
+        try:
+            self.table.update_item(Key=key, UpdateExpression=update, ConditionExpression=condition,
+                                   ExpressionAttributeValues=values)
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def _read(self, athlete_id: int, item_key: str) -> Union[Dict, None]:
+        return self.table.get_item(Key=self._key(athlete_id, item_key), ConsistentRead=True).get('Item')
+
+    def _query(self, athlete_id: int, item_key_prefix: str) -> List[Dict]:
+        query_arguments = {'KeyConditionExpression': '#athlete = :athlete AND begins_with(#item, :prefix)',
+                           'ExpressionAttributeNames': {'#athlete': self.partition_key, '#item': self.sort_key},
+                           'ExpressionAttributeValues': {':athlete': self._athlete_key(athlete_id),
+                                                         ':prefix': item_key_prefix},
+                           'ConsistentRead': True}
+        items = []
+        while True:
+            response = self.table.query(**query_arguments)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            query_arguments['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _key(self, athlete_id: int, item_key: str) -> Dict:
+        return {self.partition_key: self._athlete_key(athlete_id), self.sort_key: item_key}
+
+    @staticmethod
+    def _athlete_key(athlete_id: int) -> str:
+        return f'athlete:{athlete_id}'
+
+
+def _period(year: Union[int, None]) -> str:
+    return ALL_TIME if year is None else str(year)
+
+
+def _classifications(classification_mask: int, classification_codes: List[str]) -> List[str]:
+    return [code for bit, code in enumerate(classification_codes) if classification_mask >> bit & 1]
+
+
+def summit_visits(summits: pd.DataFrame) -> List[SummitVisit]:
+    """
+    Summit visits of a table of visited summits, as returned by find_visited_summits from a summit reference
+    constructed with the classification codes of the summit log. Summits are identified by the ID column of the summit
+    database; tables without one, e.g. of a plain pickled DataFrame, yield no visits.
+    """
+    if ID_COLUMN not in summits.columns or not len(summits):
+        return []
+    masks = (summits[CLASSIFICATION_COLUMN].values if CLASSIFICATION_COLUMN in summits.columns
+             else np.zeros(len(summits), dtype=np.int64))
+    return [SummitVisit(summit_id=int(summit_id), classification_mask=int(mask))
+            for summit_id, mask in zip(summits[ID_COLUMN].values, masks)]
+
+
+def activity_date(activity_data: Dict) -> datetime.date:
+    """
+    Local start date of a Strava activity, from its start_date_local property, or otherwise its start_date.
+    """
+    start_date = activity_data.get('start_date_local') or activity_data['start_date']
+    return pd.to_datetime(start_date).date()
+
+
+def create_summit_log_from_env(classification_codes: Sequence[str]) -> Union[SummitLog, None]:
+    """
+    Create a SummitLog selected by the environment: a DynamoDB table if 'summit_log_table_name' is set, or a SQLite
+    database file if 'summit_log_filepath' is set. If neither is set, returns None, and visited summits are not logged.
+    A SQLite file is not used on AWS Lambda, where it could only be held on the container's ephemeral disk, and would
+    be lost on every cold start.
+    """
+    table_name = os.environ.get('summit_log_table_name')
+    filepath = os.environ.get('summit_log_filepath')
+
+    if table_name is not None:
+        logging.info('Connecting to summit log table...')
+        dynamodb = boto3.resource('dynamodb',
+                                  region_name=os.environ.get('region_name'),
+                                  aws_access_key_id=os.environ.get('aws_access_key_id'),
+                                  aws_secret_access_key=os.environ.get('aws_secret_access_key'))
+        return DynamoDBSummitLog(dynamodb.Table(table_name), classification_codes=classification_codes)
+    if filepath is None:
+        return None
+    if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') is not None:
+        logging.warning('A SQLite summit log is not persisted on AWS Lambda, set summit_log_table_name instead. '
+                        'Visited summits are not logged.')
+        return None
+    logging.info('Opening summit log...')
+    return SQLiteSummitLog(filepath, classification_codes=classification_codes)
@@ -1,26 +1,101 @@
-from typing import Protocol, Tuple
+import hashlib
+import os
+import threading
+from typing import Dict, List, Protocol, Sequence, Tuple, Union
 
 import pandas as pd
 
+from data_sources.summit_database import (CLASSIFICATION_COLUMN, encode_classification_bitmask,
+                                          is_summit_database_artifact, read_summit_database,
+                                          read_summit_database_header, remap_classification_bitmask)
+from data_sources.tiled_summits import TiledSummitReference, is_tiled_summit_database
+
+# Summit tables loaded in this process, keyed by file path, modification time, size and classification bit layout, so
+# that warm Lambda containers do not reload and revalidate the database on every invocation.
+_loaded_tables: Dict[Tuple, pd.DataFrame] = {}
+_loaded_tables_lock = threading.Lock()
+# Content hashes of plain pickled DataFrames, keyed likewise by file path, modification time and size
+_file_hashes: Dict[Tuple, str] = {}
+_file_hashes_lock = threading.Lock()
+
 
 class SummitReference(Protocol):
     altitude_column: str
     latitude_column: str
     longitude_column: str
+    classification_column: str
+    version: str
 
     def load(self,
              latitude_window: Tuple[float, float] = None,
              longitude_window: Tuple[float, float] = None) -> pd.DataFrame:
         pass
 
+    def warm(self):
+        pass
+
 
 class LocalFileSummitReference:
     altitude_column = 'Metres'
     latitude_column = 'Latitude'
     longitude_column = 'Longitude'
+    classification_column = CLASSIFICATION_COLUMN
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, classification_codes: Union[Sequence[str], None] = None):
+        """
+        :param filepath: path of a summit database artifact, or of a pickled DataFrame of summits
+        :param classification_codes: if given, loaded tables include a classification bitmask column with this bit
+        layout, translated from the artifact's layout or encoded from the classification flag columns of a DataFrame
+        """
         self.filepath = filepath
+        self.classification_codes: Union[List[str], None] = (list(classification_codes)
+                                                             if classification_codes is not None else None)
+        self._version = None
+        self._is_artifact: Union[bool, None] = None
+
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the summit data, used to key any results derived from it. For a database artifact built by
+        build_summit_database.py this is read from the artifact header; for a plain pickled DataFrame the whole file is
+        hashed, once per version of the file in this process.
+        """
+        if self._version is None:
+            if self.is_artifact():
+                self._version = read_summit_database_header(self.filepath)['version']
+            else:
+                self._version = self._hash_file()
+        return self._version
+
+    def is_artifact(self) -> bool:
+        """
+        Whether the file is a summit database artifact rather than a plain pickled DataFrame, judged from its first few
+        bytes once per instance.
+        """
+        if self._is_artifact is None:
+            self._is_artifact = is_summit_database_artifact(self.filepath)
+        return self._is_artifact
+
+    def _hash_file(self) -> str:
+        stat = os.stat(self.filepath)
+        key = (os.path.realpath(self.filepath), stat.st_mtime_ns, stat.st_size)
+        with _file_hashes_lock:
+            file_hash = _file_hashes.get(key)
+            if file_hash is None:
+                digest = hashlib.sha256()
+                with open(self.filepath, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        digest.update(block)
+                file_hash = digest.hexdigest()
+                _file_hashes.clear()
+                _file_hashes[key] = file_hash
+        return file_hash
+
+    def warm(self):
+        """
+        Load the summit table into the cache shared by this process, so that the first search does not wait for it.
+        """
+        self._load_from_file()
 
     def load(self,
              latitude_window: Tuple[float, float] = None,
@@ -36,6 +111,42 @@ class LocalFileSummitReference:
                         (df[self.longitude_column] <= longitude_window[1])]
         return df.reset_index(drop=True)
 
-    def _load_from_file(self):
-        df = pd.read_pickle(self.filepath)
+    def _load_from_file(self) -> pd.DataFrame:
+        stat = os.stat(self.filepath)
+        layout = tuple(self.classification_codes) if self.classification_codes is not None else None
+        key = (os.path.realpath(self.filepath), stat.st_mtime_ns, stat.st_size, layout)
+        with _loaded_tables_lock:
+            df = _loaded_tables.get(key)
+            if df is None:
+                df = self._read_table()
+                _loaded_tables.clear()
+                _loaded_tables[key] = df
+        return df
+
+    def _read_table(self) -> pd.DataFrame:
+        if not self.is_artifact():
+            df = pd.read_pickle(self.filepath)
+            if self.classification_codes is not None:
+                df[self.classification_column] = encode_classification_bitmask(df, self.classification_codes)
+            return df
+
+        header, df = read_summit_database(self.filepath, validate=True)
+        self._version = header['version']
+        if self.classification_codes is not None:
+            df[self.classification_column] = remap_classification_bitmask(df[self.classification_column].values,
+                                                                          from_codes=header['classification_codes'],
+                                                                          to_codes=self.classification_codes)
         return df
+
+
+def open_summit_reference(path, classification_codes: Union[Sequence[str], None] = None) -> SummitReference:
+    """
+    Open a summit database: a TiledSummitReference if path is the directory of a tiled summit database, otherwise a
+    LocalFileSummitReference.
+
+    :param path: path of a summit database artifact or pickled DataFrame, or directory of a tiled summit database
+    :param classification_codes: if given, loaded tables include a classification bitmask column with this bit layout
+    """
+    if is_tiled_summit_database(path):
+        return TiledSummitReference(path, classification_codes=classification_codes)
+    return LocalFileSummitReference(filepath=path, classification_codes=classification_codes)
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data_sources.summit_database import (CLASSIFICATION_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN,
+                                          SummitDatabaseError, read_summit_database, remap_classification_bitmask,
+                                          write_summit_database)
+
+TILED_FORMAT = 'tiled-summit-database'
+TILED_FORMAT_VERSION = 1
+INDEX_FILENAME = 'index.json'
+DEFAULT_TILE_SIZE = 1.
+DEFAULT_TILE_CACHE_SIZE = 16
+
+
+def tile_name(latitude_index: int, longitude_index: int) -> str:
+    return f'{latitude_index:+04d}{longitude_index:+05d}.pkl'
+
+
+def write_tiled_summit_database(table: pd.DataFrame,
+                                directory: str,
+                                classification_codes: Sequence[str],
+                                tile_size: float = DEFAULT_TILE_SIZE) -> str:
+    """
+    Shard an optimised summit table into square tiles of tile_size decimal degrees, each written as a summit database
+    artifact, with an index of the tiles. Only tiles containing summits are written. The rows of each tile keep their
+    order in the table.
+
+    :param table: optimised summit table, as returned by optimise_summit_table
+    :param directory: directory in which the tiles and index are written
+    :param classification_codes: classification codes encoded in the bitmask column, in bit order
+    :param tile_size: width and height of each tile in decimal degrees
+    :return: database version, a hash of the versions of all tiles
+    """
+    os.makedirs(directory, exist_ok=True)
+    latitude_index = np.floor(table[LATITUDE_COLUMN].values.astype(np.float64) / tile_size).astype(np.int64)
+    longitude_index = np.floor(table[LONGITUDE_COLUMN].values.astype(np.float64) / tile_size).astype(np.int64)
+
+    tiles = {}
+    for (i, j), rows in pd.DataFrame({'i': latitude_index, 'j': longitude_index}).groupby(['i', 'j']).indices.items():
+        name = tile_name(int(i), int(j))
+        tile = table.iloc[np.sort(rows)].reset_index(drop=True)
+        tile_version = write_summit_database(tile, os.path.join(directory, name),
+                                             classification_codes=classification_codes)
+        tiles[name] = {'latitude_index': int(i), 'longitude_index': int(j), 'rows': len(tile),
+                       'version': tile_version}
+
+    version = hashlib.sha256(''.join(f'{name}:{tiles[name]["version"]}' for name in sorted(tiles)).encode()).hexdigest()
+    index = {'format': TILED_FORMAT,
+             'format_version': TILED_FORMAT_VERSION,
+             'version': version,
+             'tile_size': tile_size,
+             'rows': len(table),
+             'classification_codes': list(classification_codes),
+             'tiles': tiles}
+    temporary_filepath = os.path.join(directory, '.' + INDEX_FILENAME)
+    with open(temporary_filepath, 'w') as file:
+        json.dump(index, file)
+    os.replace(temporary_filepath, os.path.join(directory, INDEX_FILENAME))
+    return version
+
+
+def read_tiled_summit_index(directory: str) -> Dict:
+    """
+    Read the index of a tiled summit database.
+
+    :raises SummitDatabaseError: if the directory does not hold a tiled summit database of a supported format version
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILENAME), 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        raise SummitDatabaseError(f'{directory} is not a tiled summit database')
+
+    if not isinstance(index, dict) or index.get('format') != TILED_FORMAT:
+        raise SummitDatabaseError(f'{directory} is not a tiled summit database')
+    if index.get('format_version') != TILED_FORMAT_VERSION:
+        raise SummitDatabaseError(f'Unsupported tiled summit database format version: {index.get("format_version")}')
+    return index
+
+
+def is_tiled_summit_database(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, INDEX_FILENAME))
+
+
+class TileCache:
+    """
+    Bounded least-recently-used cache of loaded summit tiles, shared by all tiled summit references in this process.
+
+    :param max_tiles: maximum number of tiles held in memory
+    """
+
+    def __init__(self, max_tiles: int = DEFAULT_TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self.hit_count = 0
+        self.miss_count = 0
+        self._tiles: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Union[pd.DataFrame, None]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.miss_count += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hit_count += 1
+            return tile
+
+    def put(self, key: Tuple, tile: pd.DataFrame):
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+_tile_cache = TileCache()
+# Tile indexes read in this process, keyed by directory and index modification time
+_loaded_indexes: Dict[Tuple, Dict] = {}
+_loaded_indexes_lock = threading.Lock()
+
+
+def get_tile_cache() -> TileCache:
+    return _tile_cache
+
+
+class TiledSummitReference:
+    """
+    Summit reference for datasets too large to hold in memory, such as worldwide peak datasets. The summits are sharded
+    into spatial tiles on disk by write_tiled_summit_database, and only the tiles intersecting the requested search
+    window are loaded. Loaded tiles are held in a bounded LRU cache, so memory use depends on the size of the search
+    window and the cache, not on the size of the dataset.
+
+    :param directory: directory of a tiled summit database
+    :param classification_codes: if given, loaded tables include a classification bitmask column with this bit layout,
+    translated from the layout of the tiles
+    :param tile_cache: cache of loaded tiles. Defaults to the cache shared by this process.
+    """
+    altitude_column = 'Metres'
+    latitude_column = LATITUDE_COLUMN
+    longitude_column = LONGITUDE_COLUMN
+    classification_column = CLASSIFICATION_COLUMN
+
+    def __init__(self,
+                 directory: str,
+                 classification_codes: Union[Sequence[str], None] = None,
+                 tile_cache: Union[TileCache, None] = None):
+        self.directory = directory
+        self.classification_codes: Union[List[str], None] = (list(classification_codes)
+                                                             if classification_codes is not None else None)
+        self.tile_cache = tile_cache if tile_cache is not None else get_tile_cache()
+        self._index = None
+
+    @property
+    def index(self) -> Dict:
+        return self.load_index()
+
+    def load_index(self) -> Dict:
+        """
+        Read the tile index, once per instance and once per version of the index file in this process.
+        """
+        if self._index is None:
+            try:
+                stat = os.stat(os.path.join(self.directory, INDEX_FILENAME))
+            except OSError:
+                raise SummitDatabaseError(f'{self.directory} is not a tiled summit database')
+            key = (os.path.realpath(self.directory), stat.st_mtime_ns, stat.st_size)
+            with _loaded_indexes_lock:
+                index = _loaded_indexes.get(key)
+                if index is None:
+                    index = read_tiled_summit_index(self.directory)
+                    _loaded_indexes.clear()
+                    _loaded_indexes[key] = index
+            self._index = index
+        return self._index
+
+    @property
+    def version(self) -> str:
+        return self.index['version']
+
+    def warm(self):
+        """
+        Read the tile index. Tiles are only loaded as searches need them, so they are not read up front.
+        """
+        self.load_index()
+
+    def tiles_in_window(self,
+                        latitude_window: Tuple[float, float] = None,
+                        longitude_window: Tuple[float, float] = None) -> List[str]:
+        """
+        Names of the tiles intersecting a search window. If either window is None, the tiles are not limited along
+        that axis.
+        """
+        tiles = self.index['tiles']
+        if latitude_window is None or longitude_window is None:
+            latitude_indices = self._indices_in_window(latitude_window)
+            longitude_indices = self._indices_in_window(longitude_window)
+            return sorted(name for name, tile in tiles.items()
+                          if (latitude_indices is None or tile['latitude_index'] in latitude_indices) and
+                          (longitude_indices is None or tile['longitude_index'] in longitude_indices))
+
+        return [tile_name(i, j)
+                for i in self._indices_in_window(latitude_window)
+                for j in self._indices_in_window(longitude_window)
+                if tile_name(i, j) in tiles]
+
+    def load(self,
+             latitude_window: Tuple[float, float] = None,
+             longitude_window: Tuple[float, float] = None) -> pd.DataFrame:
+        """
+        Load the summits within a search window. Without a window, every tile is loaded, so memory use is proportional
+        to the size of the dataset.
+        """
+        frames = []
+        for name in self.tiles_in_window(latitude_window, longitude_window):
+            df = self._load_tile(name)
+            if latitude_window is not None:
+                df = df.loc[(df[self.latitude_column] >= latitude_window[0]) &
+                            (df[self.latitude_column] <= latitude_window[1])]
+            if longitude_window is not None:
+                df = df.loc[(df[self.longitude_column] >= longitude_window[0]) &
+                            (df[self.longitude_column] <= longitude_window[1])]
+            frames.append(df)
+
+        if not frames:
+            return self._empty_table()
+        return pd.concat(frames, ignore_index=True)
+
+    def _indices_in_window(self, window: Union[Tuple[float, float], None]) -> Union[range, None]:
+        if window is None:
+            return None
+        tile_size = self.index['tile_size']
+        return range(int(np.floor(window[0] / tile_size)), int(np.floor(window[1] / tile_size)) + 1)
+
+    def _load_tile(self, name: str) -> pd.DataFrame:
+        layout = tuple(self.classification_codes) if self.classification_codes is not None else None
+        key = (os.path.realpath(self.directory), name, self.index['tiles'][name]['version'], layout)
+        tile = self.tile_cache.get(key)
+        if tile is None:
+            header, tile = read_summit_database(os.path.join(self.directory, name), validate=True)
+            if self.classification_codes is not None:
+                tile[self.classification_column] = remap_classification_bitmask(
+                    tile[self.classification_column].values,
+                    from_codes=header['classification_codes'],
+                    to_codes=self.classification_codes)
+            self.tile_cache.put(key, tile)
+        return tile
+
+    def _empty_table(self) -> pd.DataFrame:
+        # Any tile has the columns of the dataset
+        first_tile = min(self.index['tiles'], default=None)
+        if first_tile is None:
+            return pd.DataFrame(columns=[self.latitude_column, self.longitude_column, self.altitude_column])
+        return self._load_tile(first_tile).iloc[:0]
@@ -0,0 +1,243 @@
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Protocol
+
+import boto3
+from botocore.exceptions import ClientError
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Time for which an event is held while it is being processed. This must be longer than the handler timeout (at most
+# 15 minutes on Lambda), so that a claim held by a running handler does not expire before the handler finishes.
+DEFAULT_LEASE_SECONDS = 20 * 60
+
+
+class IdempotencyStore(Protocol):
+    def add(self, key: str, ttl: float) -> bool:
+        pass
+
+    def put(self, key: str, ttl: float):
+        pass
+
+    def remove(self, key: str):
+        pass
+
+
+class InMemoryIdempotencyStore:
+    """
+    Idempotency store held in memory, with a time-to-live on each key. Keys are only shared by invocations that run in
+    the same process. Keys are claimed under a lock, so the store is safe to share between threads.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._expiry_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, ttl: float) -> bool:
+        """
+        Add a key to the store, unless an unexpired copy of it is already present.
+
+        :param key: idempotency key
+        :param ttl: time in seconds for which the key is retained
+        :return: True if the key was added, False if it was already present
+        """
+        with self._lock:
+            now = self.clock()
+            self._expiry_times = {k: expiry for k, expiry in self._expiry_times.items() if expiry > now}
+            if key in self._expiry_times:
+                return False
+            self._expiry_times[key] = now + ttl
+            return True
+
+    def put(self, key: str, ttl: float):
+        """
+        Add a key to the store, replacing the expiry time of any copy already present.
+
+        :param key: idempotency key
+        :param ttl: time in seconds for which the key is retained
+        """
+        with self._lock:
+            self._expiry_times[key] = self.clock() + ttl
+
+    def remove(self, key: str):
+        with self._lock:
+            self._expiry_times.pop(key, None)
+
+
+class LocalFileIdempotencyStore:
+    """
+    Idempotency store persisted to a local JSON file, so that keys survive process restarts. Each read-modify-write of
+    the file is guarded by a thread lock and an exclusive lock on a sidecar '.lock' file, so the store is safe to share
+    between threads and between processes on the same host.
+    """
+
+    def __init__(self, filepath: str, clock: Callable[[], float] = time.time):
+        self.filepath = filepath
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def add(self, key: str, ttl: float) -> bool:
+        with self._locked():
+            now = self.clock()
+            expiry_times = {k: expiry for k, expiry in self._read().items() if expiry > now}
+            if key in expiry_times:
+                return False
+            expiry_times[key] = now + ttl
+            self._write(expiry_times)
+            return True
+
+    def put(self, key: str, ttl: float):
+        with self._locked():
+            expiry_times = self._read()
+            expiry_times[key] = self.clock() + ttl
+            self._write(expiry_times)
+
+    def remove(self, key: str):
+        with self._locked():
+            expiry_times = self._read()
+            if expiry_times.pop(key, None) is not None:
+                self._write(expiry_times)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock, open(self.filepath + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, float]:
+        if not os.path.exists(self.filepath):
+            return {}
+        with open(self.filepath, 'r') as file:
+            return json.load(file)
+
+    def _write(self, expiry_times: Dict[str, float]):
+        file_descriptor, temporary_filepath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filepath)),
+                                                               suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as file:
+                json.dump(expiry_times, file)
+            os.replace(temporary_filepath, self.filepath)
+        except BaseException:
+            os.remove(temporary_filepath)
+            raise
+
+
+class DynamoDBIdempotencyStore:
+    """
+    Idempotency store backed by a DynamoDB table (or any table exposing the boto3 Table interface), keyed on a string
+    attribute 'idempotency_key'. Keys are claimed with a conditional write, so the store is safe to share between
+    concurrent invocations. The 'expires_at' attribute can be configured as the table's TTL attribute.
+    """
+    key_attribute = 'idempotency_key'
+    expiry_attribute = 'expires_at'
+
+    def __init__(self, table, clock: Callable[[], float] = time.time):
+        self.table = table
+        self.clock = clock
+
+    def add(self, key: str, ttl: float) -> bool:
+        now = self.clock()
+        try:
+            self.table.put_item(Item={self.key_attribute: key,
+                                      self.expiry_attribute: int(now + ttl)},
+                                ConditionExpression='attribute_not_exists(#key) OR #expiry < :now',
+                                ExpressionAttributeNames={'#key': self.key_attribute,
+                                                          '#expiry': self.expiry_attribute},
+                                ExpressionAttributeValues={':now': int(now)})
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def put(self, key: str, ttl: float):
+        self.table.put_item(Item={self.key_attribute: key,
+                                  self.expiry_attribute: int(self.clock() + ttl)})
+
+    def remove(self, key: str):
+        self.table.delete_item(Key={self.key_attribute: key})
+
+
+class EventDeduplicator:
+    """
+    Suppresses repeated processing of the same (athlete_id, activity_id) event. Keys are prefixed with a namespace, so
+    that separate pipeline stages sharing one store do not suppress each other's events.
+
+    An event is claimed with a short lease while it is processed, and only held for the full time-to-live once it is
+    marked as complete. If the handler crashes before completing the event, the lease expires and a retried delivery
+    is processed again.
+    """
+
+    def __init__(self, store: IdempotencyStore, namespace: str, ttl: float = DEFAULT_TTL_SECONDS,
+                 lease: float = DEFAULT_LEASE_SECONDS):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.lease = lease
+        self.suppressed_count = 0
+        self._lock = threading.Lock()
+
+    def claim(self, athlete_id: int, activity_id: int) -> bool:
+        """
+        Claim an event for processing, for the duration of the lease.
+
+        :param athlete_id: Strava athlete ID
+        :param activity_id: Strava activity ID
+        :return: True if the event should be processed, False if it is a duplicate and should be dropped
+        """
+        is_new = self.store.add(self.key(athlete_id, activity_id), ttl=self.lease)
+        if not is_new:
+            with self._lock:
+                self.suppressed_count += 1
+        return is_new
+
+    def complete(self, athlete_id: int, activity_id: int):
+        """
+        Mark a claimed event as processed, so that repeated deliveries are suppressed for the full time-to-live.
+        """
+        self.store.put(self.key(athlete_id, activity_id), ttl=self.ttl)
+
+    def release(self, athlete_id: int, activity_id: int):
+        """
+        Release a previously claimed event, e.g. if processing failed, so that a retried delivery is not suppressed.
+        """
+        self.store.remove(self.key(athlete_id, activity_id))
+
+    def key(self, athlete_id: int, activity_id: int) -> str:
+        return f'{self.namespace}:{athlete_id}:{activity_id}'
+
+
+def create_event_deduplicator_from_env(namespace: str) -> EventDeduplicator:
+    """
+    Create an EventDeduplicator, with a store selected by the environment: a DynamoDB table if
+    'idempotency_table_name' is set, a local file if 'idempotency_filepath' is set, or otherwise an in-memory store.
+    Events are leased for 'idempotency_lease' seconds while processed, and retained for 'idempotency_ttl' seconds once
+    complete.
+    """
+    ttl = float(os.environ.get('idempotency_ttl', DEFAULT_TTL_SECONDS))
+    lease = float(os.environ.get('idempotency_lease', DEFAULT_LEASE_SECONDS))
+    table_name = os.environ.get('idempotency_table_name')
+    filepath = os.environ.get('idempotency_filepath')
+
+    if table_name is not None:
+        logging.info('Connecting to idempotency table...')
+        dynamodb = boto3.resource('dynamodb',
+                                  region_name=os.environ.get('region_name'),
+                                  aws_access_key_id=os.environ.get('aws_access_key_id'),
+                                  aws_secret_access_key=os.environ.get('aws_secret_access_key'))
+        store = DynamoDBIdempotencyStore(dynamodb.Table(table_name))
+    elif filepath is not None:
+        store = LocalFileIdempotencyStore(filepath)
+    else:
+        store = InMemoryIdempotencyStore()
+
+    return EventDeduplicator(store, namespace=namespace, ttl=ttl, lease=lease)
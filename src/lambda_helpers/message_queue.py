@@ -0,0 +1,137 @@
+import json
+import os
+import queue
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Protocol, Union
+
+
+@dataclass
+class QueueMessage:
+    message_id: str
+    body: str
+    attempts: int = 1
+    receipt_handle: Union[str, None] = None
+
+
+class MessageQueue(Protocol):
+    """
+    Queue of messages consumed by a long-running worker. Queues also implement NotificationTopic, so that the webhook
+    handler can publish to them in place of SNS. A received message is hidden from other consumers until it is
+    acknowledged, once processed, or released, to be delivered again.
+    """
+
+    def publish(self, Message: str) -> Dict:
+        pass
+
+    def receive(self, timeout: float) -> Union[QueueMessage, None]:
+        pass
+
+    def acknowledge(self, message: QueueMessage):
+        pass
+
+    def release(self, message: QueueMessage):
+        pass
+
+
+class InMemoryQueue:
+    """
+    Message queue held in memory, shared by the threads of a single process.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def publish(self, Message: str) -> Dict:
+        message_id = str(uuid.uuid4())
+        self._queue.put(QueueMessage(message_id=message_id, body=Message))
+        return {'MessageId': message_id}
+
+    def receive(self, timeout: float) -> Union[QueueMessage, None]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def acknowledge(self, message: QueueMessage):
+        pass
+
+    def release(self, message: QueueMessage):
+        self._queue.put(QueueMessage(message_id=message.message_id, body=message.body, attempts=message.attempts + 1))
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+class FileQueue:
+    """
+    Message queue stored as one JSON file per message in a directory, which can be shared by several processes on the
+    same host. Messages are delivered in the order they were published. A message is claimed by atomically renaming its
+    file into the processing subdirectory, so each message is received by one consumer only. Messages left in the
+    processing directory by a consumer that stopped unexpectedly can be returned to the queue with recover().
+
+    :param directory: directory in which messages are stored
+    :param poll_interval: interval in seconds at which an empty queue is checked for new messages
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 0.1):
+        self.pending_directory = os.path.join(directory, 'pending')
+        self.processing_directory = os.path.join(directory, 'processing')
+        self.poll_interval = poll_interval
+        os.makedirs(self.pending_directory, exist_ok=True)
+        os.makedirs(self.processing_directory, exist_ok=True)
+
+    def publish(self, Message: str) -> Dict:
+        message_id = str(uuid.uuid4())
+        self._write(QueueMessage(message_id=message_id, body=Message))
+        return {'MessageId': message_id}
+
+    def receive(self, timeout: float) -> Union[QueueMessage, None]:
+        deadline = time.monotonic() + timeout
+        while True:
+            for filename in sorted(f for f in os.listdir(self.pending_directory) if not f.startswith('.')):
+                try:
+                    os.rename(os.path.join(self.pending_directory, filename),
+                              os.path.join(self.processing_directory, filename))
+                except FileNotFoundError:
+                    # claimed by another consumer
+                    continue
+                with open(os.path.join(self.processing_directory, filename), 'r') as file:
+                    record = json.load(file)
+                return QueueMessage(message_id=record['message_id'], body=record['body'], attempts=record['attempts'],
+                                    receipt_handle=filename)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.poll_interval, remaining))
+
+    def acknowledge(self, message: QueueMessage):
+        os.remove(os.path.join(self.processing_directory, message.receipt_handle))
+
+    def release(self, message: QueueMessage):
+        self.acknowledge(message)
+        self._write(QueueMessage(message_id=message.message_id, body=message.body, attempts=message.attempts + 1))
+
+    def recover(self) -> int:
+        """
+        Return all messages in the processing directory to the queue. Only call this while no consumers are running.
+
+        :return: number of messages returned to the queue
+        """
+        filenames = [f for f in os.listdir(self.processing_directory) if not f.startswith('.')]
+        for filename in filenames:
+            os.rename(os.path.join(self.processing_directory, filename),
+                      os.path.join(self.pending_directory, filename))
+        return len(filenames)
+
+    def __len__(self):
+        return len([f for f in os.listdir(self.pending_directory) if not f.startswith('.')])
+
+    def _write(self, message: QueueMessage):
+        filename = f'{time.time_ns():020d}-{message.message_id}.json'
+        temporary_filepath = os.path.join(self.processing_directory, '.' + filename)
+        with open(temporary_filepath, 'w') as file:
+            json.dump({'message_id': message.message_id, 'body': message.body, 'attempts': message.attempts}, file)
+        os.replace(temporary_filepath, os.path.join(self.pending_directory, filename))
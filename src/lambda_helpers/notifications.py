@@ -0,0 +1,21 @@
+import uuid
+from typing import Dict, List, Protocol
+
+
+class NotificationTopic(Protocol):
+    def publish(self, Message: str) -> Dict:
+        pass
+
+
+class LocalTopic:
+    """
+    In-memory stand-in for an SNS Topic. Published messages are retained in the order they were received, so that the
+    webhook handler can be exercised and benchmarked without AWS.
+    """
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    def publish(self, Message: str) -> Dict:
+        self.messages.append(Message)
+        return {'MessageId': str(uuid.uuid4())}
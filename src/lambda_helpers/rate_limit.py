@@ -0,0 +1,286 @@
+import logging
+import os
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Dict, List, Tuple, Union
+
+# Default Strava API quotas: requests per 15 minutes and per day
+DEFAULT_SHORT_TERM_LIMIT = 100
+DEFAULT_DAILY_LIMIT = 1000
+SHORT_TERM_PERIOD = 15 * 60
+DAILY_PERIOD = 24 * 60 * 60
+# Fraction of each quota that backfill requests may not use, kept for live activities
+DEFAULT_BACKFILL_RESERVE = 0.2
+# Maximum time in seconds for which a live request waits for quota before failing
+DEFAULT_LIVE_MAX_WAIT = 10.
+
+RATE_LIMIT_HEADER = 'X-RateLimit-Limit'
+RATE_LIMIT_USAGE_HEADER = 'X-RateLimit-Usage'
+
+
+class Priority(IntEnum):
+    """
+    Priority of Strava API requests. Lower values are more urgent.
+    """
+    LIVE = 0
+    BACKFILL = 1
+
+    @classmethod
+    def from_name(cls, name: Union[str, None]) -> 'Priority':
+        """
+        Parse a priority name, e.g. from a queue message. Missing or unknown names are treated as live requests.
+        """
+        if name is None:
+            return cls.LIVE
+        try:
+            return cls[str(name).upper()]
+        except KeyError:
+            logging.warning(f'Unknown request priority {name}, treating as live')
+            return cls.LIVE
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to capacity tokens, refilled continuously so that the bucket fills from empty over one
+    period.
+
+    :param capacity: maximum number of tokens, i.e. the number of requests allowed per period
+    :param period: time in seconds over which an empty bucket is refilled
+    :param clock: function returning the current time in seconds
+    """
+
+    def __init__(self, capacity: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.period = period
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def consume(self, tokens: float = 1.):
+        self._refill()
+        self._tokens -= tokens
+
+    def time_until(self, tokens: float) -> float:
+        """
+        Time in seconds until the bucket holds at least the given number of tokens.
+        """
+        deficit = tokens - self.tokens
+        return max(deficit, 0.) * self.period / self.capacity
+
+    def set_remaining(self, capacity: int, remaining: int):
+        """
+        Synchronise the bucket with the quota reported by the server.
+        """
+        self._refill()
+        self.capacity = capacity
+        self._tokens = float(min(max(remaining, 0), capacity))
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self._tokens + (now - self._updated) * self.capacity / self.period, self.capacity)
+        self._updated = now
+
+
+def parse_rate_limit_headers(headers: Dict) -> Union[List[Tuple[int, int]], None]:
+    """
+    Parse the Strava rate limit headers of an API response, e.g. 'X-RateLimit-Limit: 100,1000' and
+    'X-RateLimit-Usage: 20,300'.
+
+    :param headers: response headers
+    :return: list of (limit, usage) pairs for the 15-minute and daily quotas, or None if the headers are missing
+    """
+    headers = {str(k).lower(): v for k, v in dict(headers).items()}
+    limits = headers.get(RATE_LIMIT_HEADER.lower())
+    usage = headers.get(RATE_LIMIT_USAGE_HEADER.lower())
+    if limits is None or usage is None:
+        return None
+    try:
+        return list(zip([int(v) for v in str(limits).split(',')], [int(v) for v in str(usage).split(',')]))
+    except ValueError:
+        logging.warning(f'Unable to parse rate limit headers {limits}, {usage}')
+        return None
+
+
+class StravaRateLimiter:
+    """
+    Schedules Strava API requests within the 15-minute and daily quotas, with one token bucket per quota. Requests
+    wait until both buckets hold a token. Waiting live requests are served before backfill requests, and backfill
+    requests may not use the last backfill_reserve fraction of either quota, so that live activities can still be
+    processed while a backfill is running. The buckets are synchronised with the usage reported in response headers
+    whenever these are available, which accounts for requests made by other processes.
+
+    :param short_term_limit: requests allowed per 15 minutes
+    :param daily_limit: requests allowed per day
+    :param backfill_reserve: fraction of each quota reserved for live requests
+    :param clock: function returning the current time in seconds
+    """
+
+    def __init__(self,
+                 short_term_limit: int = DEFAULT_SHORT_TERM_LIMIT,
+                 daily_limit: int = DEFAULT_DAILY_LIMIT,
+                 backfill_reserve: float = DEFAULT_BACKFILL_RESERVE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.buckets = [TokenBucket(short_term_limit, SHORT_TERM_PERIOD, clock=clock),
+                        TokenBucket(daily_limit, DAILY_PERIOD, clock=clock)]
+        self.backfill_reserve = backfill_reserve
+        self.delayed_count = 0
+        self._waiting = {priority: 0 for priority in Priority}
+        self._condition = threading.Condition()
+
+    def try_acquire(self, priority: Priority = Priority.LIVE) -> float:
+        """
+        Take a token from each bucket if the request may be made now.
+
+        :param priority: priority of the request
+        :return: 0 if the request may be made, otherwise the time in seconds after which to try again
+        """
+        with self._condition:
+            return self._try_acquire(priority)
+
+    def acquire(self, priority: Priority = Priority.LIVE, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait until the request may be made, then take a token from each bucket.
+
+        :param priority: priority of the request
+        :param timeout: maximum time in seconds to wait. If None, wait indefinitely.
+        :return: True if the request may be made, False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            wait = self._try_acquire(priority)
+            if not wait:
+                return True
+
+            self.delayed_count += 1
+            self._waiting[priority] += 1
+            try:
+                while wait:
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._condition.wait(wait)
+                    wait = self._try_acquire(priority)
+                return True
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def update_from_headers(self, headers: Dict):
+        """
+        Synchronise the buckets with the quota usage reported in the headers of a Strava API response.
+        """
+        quotas = parse_rate_limit_headers(headers)
+        if quotas is None:
+            return
+        with self._condition:
+            for bucket, (limit, usage) in zip(self.buckets, quotas):
+                bucket.set_remaining(limit, limit - usage)
+            self._condition.notify_all()
+
+    def _try_acquire(self, priority: Priority) -> float:
+        # Leave tokens to requests of higher priority that are already waiting
+        if any(self._waiting[p] for p in Priority if p < priority):
+            return min(bucket.period / bucket.capacity for bucket in self.buckets)
+
+        waits = []
+        for bucket in self.buckets:
+            reserve = bucket.capacity * self.backfill_reserve if priority > Priority.LIVE else 0.
+            waits.append(bucket.time_until(reserve + 1.))
+        if max(waits) > 0:
+            return max(waits)
+
+        for bucket in self.buckets:
+            bucket.consume()
+        return 0.
+
+
+class RateLimitedStravaClient:
+    """
+    Wraps a StravaClient so that every API request is scheduled by a StravaRateLimiter. Live requests fail with
+    RateLimitExceeded if no quota becomes available within max_wait; backfill requests wait as long as necessary.
+    Other attributes, such as the authorisation handler, are those of the wrapped client.
+
+    :param client: StravaClient to wrap
+    :param rate_limiter: rate limiter shared by all clients in this process
+    :param priority: priority of the requests made with this client
+    :param max_wait: maximum time in seconds to wait for quota. If None, live requests wait for DEFAULT_LIVE_MAX_WAIT
+    and backfill requests wait indefinitely.
+    """
+
+    def __init__(self,
+                 client,
+                 rate_limiter: StravaRateLimiter,
+                 priority: Priority = Priority.LIVE,
+                 max_wait: Union[float, None] = None):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        self.max_wait = DEFAULT_LIVE_MAX_WAIT if max_wait is None and priority == Priority.LIVE else max_wait
+
+    def get_activity(self, athlete_id: int, activity_id: int):
+        return self._request(self.client.get_activity, athlete_id=athlete_id, activity_id=activity_id)
+
+    def get_activity_stream_set(self, athlete_id: int, activity_id: int, streams: List[str], as_df: bool = False):
+        return self._request(self.client.get_activity_stream_set, athlete_id=athlete_id, activity_id=activity_id,
+                             streams=streams, as_df=as_df)
+
+    def update_activity(self, athlete_id: int, activity_id: int, updatable_activity):
+        return self._request(self.client.update_activity, athlete_id=athlete_id, activity_id=activity_id,
+                             updatable_activity=updatable_activity)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _request(self, request: Callable, **kwargs):
+        if not self.rate_limiter.acquire(self.priority, timeout=self.max_wait):
+            raise RateLimitExceeded(f'No Strava API quota available within {self.max_wait} s')
+        try:
+            return request(**kwargs)
+        except Exception as e:
+            # requests.HTTPError carries the response, e.g. of a 429 Too Many Requests
+            headers = getattr(getattr(e, 'response', None), 'headers', None)
+            if headers is not None:
+                self.rate_limiter.update_from_headers(headers)
+            raise
+
+
+# Rate limiter shared by all activities processed in this process, created on first use
+_rate_limiter: Union[StravaRateLimiter, None] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> StravaRateLimiter:
+    """
+    Return the StravaRateLimiter shared by all requests made by this process. The quotas may be set with the
+    strava_short_term_limit and strava_daily_limit environment variables, e.g. to the share of the application quota
+    allocated to this process.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = StravaRateLimiter(
+                short_term_limit=int(os.environ.get('strava_short_term_limit', DEFAULT_SHORT_TERM_LIMIT)),
+                daily_limit=int(os.environ.get('strava_daily_limit', DEFAULT_DAILY_LIMIT)))
+        return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: Union[StravaRateLimiter, None]):
+    """
+    Replace the shared rate limiter, e.g. with one configured for testing. Set to None to create a rate limiter from
+    the environment on next use.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = rate_limiter
@@ -0,0 +1,355 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Protocol, Set, Union
+
+import boto3
+from botocore.exceptions import ClientError
+
+# Number of attempts to reset the registered athlete count while registrations change concurrently
+MAX_RESET_ATTEMPTS = 5
+
+
+class RegisteredAthleteStore(Protocol):
+    """
+    Maintained count of registered athletes, so that the number of registered athletes can be read at constant cost
+    instead of by counting the authorisation tokens. Registrations are recorded per athlete, so that re-authorising a
+    registered athlete, or a repeated deregistration event, does not change the count. A reconciliation job corrects
+    the registrations and the count, should they drift from the authorisation tokens.
+    """
+
+    def register(self, athlete_id: int) -> bool:
+        pass
+
+    def deregister(self, athlete_id: int) -> bool:
+        pass
+
+    def count(self) -> int:
+        pass
+
+    def registered_athlete_ids(self) -> Set[int]:
+        pass
+
+    def reset_count(self) -> bool:
+        pass
+
+
+class InMemoryRegisteredAthleteStore:
+    """
+    Registered athlete count held in memory, only shared by invocations that run in the same process.
+    """
+
+    def __init__(self):
+        self._athlete_ids = set()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def register(self, athlete_id: int) -> bool:
+        """
+        Record the registration of an athlete.
+
+        :param athlete_id: Strava athlete ID
+        :return: True if the athlete was newly registered, False if they were already registered
+        """
+        with self._lock:
+            if athlete_id in self._athlete_ids:
+                return False
+            self._athlete_ids.add(athlete_id)
+            self._count += 1
+            return True
+
+    def deregister(self, athlete_id: int) -> bool:
+        """
+        Record the deregistration of an athlete.
+
+        :param athlete_id: Strava athlete ID
+        :return: True if the athlete was registered, False otherwise
+        """
+        with self._lock:
+            if athlete_id not in self._athlete_ids:
+                return False
+            self._athlete_ids.remove(athlete_id)
+            self._count -= 1
+            return True
+
+    def count(self) -> int:
+        return self._count
+
+    def registered_athlete_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._athlete_ids)
+
+    def reset_count(self) -> bool:
+        """
+        Reset the count to the number of registered athletes, should it have drifted.
+
+        :return: True if the count was reset, False if it was changed concurrently and should be reset again
+        """
+        with self._lock:
+            self._count = len(self._athlete_ids)
+            return True
+
+
+class LocalFileRegisteredAthleteStore:
+    """
+    Registered athlete count persisted to a local JSON file. The file is not locked, so the store should only be used
+    by one process at a time.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def register(self, athlete_id: int) -> bool:
+        record = self._read()
+        if athlete_id in record['athlete_ids']:
+            return False
+        record['athlete_ids'].append(athlete_id)
+        record['count'] += 1
+        self._write(record)
+        return True
+
+    def deregister(self, athlete_id: int) -> bool:
+        record = self._read()
+        if athlete_id not in record['athlete_ids']:
+            return False
+        record['athlete_ids'].remove(athlete_id)
+        record['count'] -= 1
+        self._write(record)
+        return True
+
+    def count(self) -> int:
+        return self._read()['count']
+
+    def registered_athlete_ids(self) -> Set[int]:
+        return set(self._read()['athlete_ids'])
+
+    def reset_count(self) -> bool:
+        record = self._read()
+        record['count'] = len(record['athlete_ids'])
+        self._write(record)
+        return True
+
+    def _read(self) -> Dict:
+        if not os.path.exists(self.filepath):
+            return {'count': 0, 'athlete_ids': []}
+        with open(self.filepath, 'r') as file:
+            return json.load(file)
+
+    def _write(self, record: Dict):
+        temporary_filepath = self.filepath + '.tmp'
+        with open(temporary_filepath, 'w') as file:
+            json.dump(record, file)
+        os.replace(temporary_filepath, self.filepath)
+
+
+class DynamoDBRegisteredAthleteStore:
+    """
+    Registered athlete count backed by a DynamoDB table, keyed on a string attribute 'registration_key'. Each
+    registered athlete has an item, and a single counter item holds the number of registered athletes. Registrations
+    and deregistrations update both in one transaction, conditional on the athlete's item, so the count is safe to
+    update from concurrent invocations and is read with a single GetItem. Each transaction also increments the
+    counter's version, so that a reset of the count can be made conditional on no registration changing in between.
+    """
+    key_attribute = 'registration_key'
+    count_attribute = 'athlete_count'
+    version_attribute = 'version'
+    counter_key = 'registered_athletes'
+    athlete_key_prefix = 'athlete:'
+
+    def __init__(self, table):
+        self.table = table
+
+    def register(self, athlete_id: int) -> bool:
+        return self._transact({'Put': {'TableName': self.table.name,
+                                       'Item': {self.key_attribute: {'S': self.athlete_key(athlete_id)}},
+                                       'ConditionExpression': 'attribute_not_exists(#key)',
+                                       'ExpressionAttributeNames': {'#key': self.key_attribute}}},
+                              increment=1)
+
+    def deregister(self, athlete_id: int) -> bool:
+        return self._transact({'Delete': {'TableName': self.table.name,
+                                          'Key': {self.key_attribute: {'S': self.athlete_key(athlete_id)}},
+                                          'ConditionExpression': 'attribute_exists(#key)',
+                                          'ExpressionAttributeNames': {'#key': self.key_attribute}}},
+                              increment=-1)
+
+    def count(self) -> int:
+        return int(self._read_counter().get(self.count_attribute, 0))
+
+    def registered_athlete_ids(self) -> Set[int]:
+        """
+        IDs of the registered athletes, read by a scan of the athlete items.
+        """
+        scan_arguments = {'FilterExpression': 'begins_with(#key, :prefix)',
+                          'ProjectionExpression': '#key',
+                          'ExpressionAttributeNames': {'#key': self.key_attribute},
+                          'ExpressionAttributeValues': {':prefix': self.athlete_key_prefix},
+                          'ConsistentRead': True}
+        athlete_ids = set()
+        while True:
+            response = self.table.scan(**scan_arguments)
+            athlete_ids.update(int(item[self.key_attribute][len(self.athlete_key_prefix):])
+                               for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return athlete_ids
+            scan_arguments['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def reset_count(self) -> bool:
+        """
+        Reset the count to the number of athlete items, conditional on the counter's version being unchanged since the
+        athlete items were counted.
+
+        :return: True if the count was reset, False if a registration changed concurrently and the count should be
+        reset again
+        """
+        version = self._read_counter().get(self.version_attribute)
+        count = len(self.registered_athlete_ids())
+        if version is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(#version)',
+                         'ExpressionAttributeNames': {'#version': self.version_attribute}}
+        else:
+            condition = {'ConditionExpression': '#version = :version',
+                         'ExpressionAttributeNames': {'#version': self.version_attribute},
+                         'ExpressionAttributeValues': {':version': version}}
+        try:
+            self.table.put_item(Item={self.key_attribute: self.counter_key,
+                                      self.count_attribute: count,
+                                      self.version_attribute: int(version or 0) + 1},
+                                **condition)
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def athlete_key(self, athlete_id: int) -> str:
+        return f'{self.athlete_key_prefix}{athlete_id}'
+
+    def _read_counter(self) -> Dict:
+        response = self.table.get_item(Key={self.key_attribute: self.counter_key}, ConsistentRead=True)
+        return response.get('Item', {})
+
+    def _transact(self, athlete_item_operation: Dict, increment: int) -> bool:
+        counter_update = {'Update': {'TableName': self.table.name,
+                                     'Key': {self.key_attribute: {'S': self.counter_key}},
+                                     'UpdateExpression': 'ADD #count :increment, #version :one',
+                                     'ExpressionAttributeNames': {'#count': self.count_attribute,
+                                                                  '#version': self.version_attribute},
+                                     'ExpressionAttributeValues': {':increment': {'N': str(increment)},
+                                                                   ':one': {'N': '1'}}}}
+        try:
+            self.table.meta.client.transact_write_items(TransactItems=[athlete_item_operation, counter_update])
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'TransactionCanceledException':
+                return False
+            raise
+
+
+def create_registered_athlete_store_from_env() -> Union[RegisteredAthleteStore, None]:
+    """
+    Create a RegisteredAthleteStore selected by the environment: a DynamoDB table if 'registration_table_name' is set,
+    or a local file if 'registration_filepath' is set. If neither is set, returns None, and registered athletes are
+    counted from the authorisation token cache.
+    """
+    table_name = os.environ.get('registration_table_name')
+    filepath = os.environ.get('registration_filepath')
+
+    if table_name is not None:
+        logging.info('Connecting to registration table...')
+        dynamodb = boto3.resource('dynamodb',
+                                  region_name=os.environ.get('region_name'),
+                                  aws_access_key_id=os.environ.get('aws_access_key_id'),
+                                  aws_secret_access_key=os.environ.get('aws_secret_access_key'))
+        return DynamoDBRegisteredAthleteStore(dynamodb.Table(table_name))
+    if filepath is not None:
+        return LocalFileRegisteredAthleteStore(filepath)
+    return None
+
+
+# Store shared by all invocations in this container, created on first use
+_registered_athlete_store: Union[RegisteredAthleteStore, None] = None
+_registered_athlete_store_configured = False
+
+
+def get_registered_athlete_store() -> Union[RegisteredAthleteStore, None]:
+    global _registered_athlete_store, _registered_athlete_store_configured
+    if not _registered_athlete_store_configured:
+        _registered_athlete_store = create_registered_athlete_store_from_env()
+        _registered_athlete_store_configured = True
+    return _registered_athlete_store
+
+
+def set_registered_athlete_store(store: Union[RegisteredAthleteStore, None]):
+    """
+    Replace the shared store, e.g. with an in-memory store for testing. Set to None to create a store from the
+    environment on next use.
+    """
+    global _registered_athlete_store, _registered_athlete_store_configured
+    _registered_athlete_store = store
+    _registered_athlete_store_configured = store is not None
+
+
+def count_registered_athletes(token_cache) -> int:
+    """
+    Number of registered athletes, read from the maintained count if a store is configured, or otherwise counted from
+    the authorisation token cache.
+    """
+    store = get_registered_athlete_store()
+    if store is None:
+        return token_cache.total_tokens
+    return store.count()
+
+
+def reconcile_registered_athlete_count(store: RegisteredAthleteStore, token_cache) -> int:
+    """
+    Correct the registered athletes of a store from the authorisation tokens, which requires a scan of the token cache:
+    athletes with a token are registered, athletes without one are deregistered, and the count is reset to the number
+    of registered athletes. Run periodically, and once when the store is first deployed, so that athletes who
+    registered before the store existed are recorded and can later be deregistered.
+
+    The registrations are read before the token cache, so that an athlete registering or deregistering during the
+    reconciliation is registered or deregistered by both, and the corrections made here are no-ops.
+
+    :param store: store of the registered athletes
+    :param token_cache: authorisation token cache
+    :return: difference between the number of authorisation tokens and the count before reconciliation
+    """
+    recorded_count = store.count()
+    registered_athlete_ids = store.registered_athlete_ids()
+    token_athlete_ids = set(token_cache_athlete_ids(token_cache))
+
+    for athlete_id in token_athlete_ids - registered_athlete_ids:
+        store.register(athlete_id)
+    for athlete_id in registered_athlete_ids - token_athlete_ids:
+        store.deregister(athlete_id)
+
+    for _ in range(MAX_RESET_ATTEMPTS):
+        if store.reset_count():
+            break
+    else:
+        logging.warning(f'Unable to reset the registered athlete count in {MAX_RESET_ATTEMPTS} attempts, registrations '
+                        f'changed concurrently')
+
+    if len(token_athlete_ids) != recorded_count:
+        logging.warning(f'Registered athlete count {recorded_count} differed from {len(token_athlete_ids)} '
+                        f'authorisation tokens, corrected')
+    return len(token_athlete_ids) - recorded_count
+
+
+def token_cache_athlete_ids(token_cache) -> Iterable[int]:
+    """
+    Athlete IDs of the authorisation tokens, read by a scan of the token cache's DynamoDB table, which is keyed on the
+    athlete ID.
+    """
+    key_attribute = token_cache.table.key_schema[0]['AttributeName']
+    scan_arguments = {'ProjectionExpression': '#key',
+                      'ExpressionAttributeNames': {'#key': key_attribute}}
+    while True:
+        response = token_cache.table.scan(**scan_arguments)
+        for item in response.get('Items', []):
+            yield int(item[key_attribute])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_arguments['ExclusiveStartKey'] = response['LastEvaluatedKey']
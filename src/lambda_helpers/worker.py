@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Union
+
+from lambda_helpers.message_queue import MessageQueue, QueueMessage
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL = 1.
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class QueueWorker:
+    """
+    Long-running consumer of a MessageQueue. Each message body is decoded from JSON and passed to the handler by one of
+    concurrency worker threads. Messages are acknowledged once handled; if the handler raises, the message is released
+    to be delivered again, until it has been attempted max_attempts times, after which it is logged and dropped.
+
+    Stopping the worker lets every thread finish the message it is handling, then returns.
+
+    :param queue: queue from which messages are received
+    :param handler: function called with each decoded message
+    :param concurrency: number of messages handled concurrently
+    :param poll_interval: maximum time in seconds for which each thread waits for a message before checking whether the
+    worker has been stopped
+    :param max_attempts: maximum number of times a message is handled before it is dropped
+    """
+
+    def __init__(self,
+                 queue: MessageQueue,
+                 handler: Callable[[Dict], None],
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(concurrency, 1)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.processed_count = 0
+        self.retried_count = 0
+        self.dropped_count = 0
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """
+        Start the worker threads, without blocking.
+        """
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._consume, name=f'queue-worker-{i}', daemon=True)
+                         for i in range(self.concurrency)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Union[float, None] = None):
+        """
+        Stop receiving messages and wait for the messages being handled to finish.
+
+        :param timeout: maximum time in seconds to wait for each worker thread. If None, wait indefinitely.
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run(self):
+        """
+        Start the worker threads and block until the worker is stopped, e.g. by a signal handler calling stop().
+        """
+        self.start()
+        while not self._stop_event.wait(self.poll_interval):
+            pass
+        self.stop()
+
+    def _consume(self):
+        while not self._stop_event.is_set():
+            message = self.queue.receive(timeout=self.poll_interval)
+            if message is not None:
+                self._handle(message)
+
+    def _handle(self, message: QueueMessage):
+        try:
+            self.handler(json.loads(message.body))
+        except Exception:
+            if message.attempts < self.max_attempts:
+                logging.exception(f'Unable to process message {message.message_id} (attempt {message.attempts}), '
+                                  f'returning it to the queue')
+                self.queue.release(message)
+                self._count('retried_count')
+            else:
+                logging.exception(f'Unable to process message {message.message_id} after {message.attempts} '
+                                  f'attempts, dropping it')
+                self.queue.acknowledge(message)
+                self._count('dropped_count')
+            return
+
+        self.queue.acknowledge(message)
+        self._count('processed_count')
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
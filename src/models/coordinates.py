@@ -1,18 +1,32 @@
 from dataclasses import dataclass
 import numpy as np
-from typing import Tuple
+from typing import Tuple, Union
 
 
 @dataclass
 class CoordinateSet:
     latitude: np.array
     longitude: np.array
+    altitude: Union[np.array, None] = None
 
     def __post_init__(self):
         self._validate_coordinates()
 
     def _validate_coordinates(self):
         assert len(self.latitude) == len(self.longitude)
+        if self.altitude is not None:
+            assert len(self.altitude) == len(self.latitude)
+
+    def select(self, mask: np.array) -> 'CoordinateSet':
+        """
+        Return the coordinates selected by a Boolean mask or an array of indices
+
+        :param mask: Boolean mask, or array of indices, of the coordinates to select
+        :return: CoordinateSet containing the selected coordinates only
+        """
+        return CoordinateSet(latitude=np.asarray(self.latitude)[mask],
+                             longitude=np.asarray(self.longitude)[mask],
+                             altitude=np.asarray(self.altitude)[mask] if self.altitude is not None else None)
 
     def index(self, index: int) -> Tuple:
         """
@@ -5,11 +5,21 @@ from typing import Dict, Union
 
 import boto3
 from botocore.exceptions import ClientError
+from lambda_helpers.idempotency import EventDeduplicator, create_event_deduplicator_from_env
+from lambda_helpers.message_queue import FileQueue
+from lambda_helpers.notifications import NotificationTopic
+from lambda_helpers.registered_athletes import get_registered_athlete_store
 from lambda_helpers.strava_client import create_strava_client_from_env
+from profiling.cpu import profile_handler
 
 logging.getLogger().setLevel(logging.INFO)
 
+# SNS topic shared by all invocations in this container, created on first use
+_sns_topic: Union[NotificationTopic, None] = None
+_deduplicator: Union[EventDeduplicator, None] = None
 
+
+@profile_handler('process_strava_webhook')
 def lambda_handler(event, context):
     # Respond immediately to the webhook subscription challenge if this endpoint is being registered with the Strava
     # webhook API for the first time
@@ -33,7 +43,14 @@ def lambda_handler(event, context):
 
     athlete_id = event_body.get('owner_id')
     activity_id = event_body.get('object_id')
-    topic = create_sns_topic_from_env()
+
+    deduplicator = get_deduplicator()
+    if not deduplicator.claim(athlete_id=athlete_id, activity_id=activity_id):
+        logging.info(f'Duplicate event for athlete {athlete_id}, activity {activity_id}, exiting early... '
+                     f'({deduplicator.suppressed_count} duplicates suppressed)')
+        return {'statusCode': 200}
+
+    topic = get_sns_topic()
     message = {'athlete_id': athlete_id,
                'activity_id': activity_id}
 
@@ -44,6 +61,13 @@ def lambda_handler(event, context):
         logging.info(f'Successfully published message with ID: {message_id}')
     except ClientError:
         logging.info('Unable to publish message.')
+        deduplicator.release(athlete_id=athlete_id, activity_id=activity_id)
+    except Exception:
+        # Release the claim on any other failure too, so that Strava's retry of the event is not suppressed
+        deduplicator.release(athlete_id=athlete_id, activity_id=activity_id)
+        raise
+    else:
+        deduplicator.complete(athlete_id=athlete_id, activity_id=activity_id)
 
     return {'statusCode': 200}
 
@@ -53,9 +77,53 @@ def deregister_athlete(event_body: Dict):
     logging.info(f'Unsubscribing athlete {athlete_id}')
     strava_client = create_strava_client_from_env()
     strava_client.authorisation.token_cache.delete_authorisation_token(athlete_id=athlete_id)
+    registered_athlete_store = get_registered_athlete_store()
+    if registered_athlete_store is not None:
+        registered_athlete_store.deregister(athlete_id)
+
+
+def get_sns_topic() -> NotificationTopic:
+    """
+    Return the SNS topic used to publish new activity events. The topic is created from the environment the first time
+    it is needed, and reused by subsequent invocations of the same container.
+    """
+    global _sns_topic
+    if _sns_topic is None:
+        _sns_topic = create_sns_topic_from_env()
+    return _sns_topic
+
+
+def set_sns_topic(topic: Union[NotificationTopic, None]):
+    """
+    Replace the topic used to publish new activity events, e.g. with a LocalTopic stand-in. Passing None resets the
+    handler to lazily create an SNS topic from the environment.
+    """
+    global _sns_topic
+    _sns_topic = topic
+
+
+def get_deduplicator() -> EventDeduplicator:
+    """
+    Return the EventDeduplicator used to drop repeated webhook deliveries, creating it from the environment on first
+    use.
+    """
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = create_event_deduplicator_from_env(namespace='webhook')
+    return _deduplicator
+
+
+def set_deduplicator(deduplicator: Union[EventDeduplicator, None]):
+    global _deduplicator
+    _deduplicator = deduplicator
 
 
 def create_sns_topic_from_env():
+    # Self-hosted deployments publish to a directory consumed by queue_worker.py instead of SNS
+    queue_directory = os.environ.get('message_queue_directory')
+    if queue_directory is not None:
+        return FileQueue(queue_directory)
+
     region_name = os.environ.get('region_name')
     aws_access_key_id = os.environ.get('aws_access_key_id')
     aws_secret_access_key = os.environ.get('aws_secret_access_key')
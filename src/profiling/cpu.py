@@ -0,0 +1,133 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Union
+
+DEFAULT_TOP_FUNCTIONS = 25
+
+
+@dataclass
+class ProfilerConfiguration:
+    """
+    :param sample_rate: fraction of invocations profiled, between 0 and 1
+    :param output_directory: if given, the full profile of each profiled invocation is written to this directory, to
+    be inspected with pstats or a viewer such as snakeviz
+    :param top_functions: number of functions logged, by cumulative time
+    """
+    sample_rate: float = 1.
+    output_directory: Union[str, None] = None
+    top_functions: int = DEFAULT_TOP_FUNCTIONS
+
+
+def create_profiler_configuration_from_env() -> Union[ProfilerConfiguration, None]:
+    """
+    Create a profiler configuration from the environment. Profiling is enabled by setting 'profiling_sample_rate' to
+    the fraction of invocations to profile, e.g. 1 to profile every invocation. Full profiles are written to
+    'profiling_output_directory' if it is set, and 'profiling_top_functions' sets the number of functions logged.
+
+    :return: profiler configuration, or None if profiling is disabled
+    """
+    sample_rate = float(os.environ.get('profiling_sample_rate', 0.))
+    if sample_rate <= 0.:
+        return None
+    return ProfilerConfiguration(sample_rate=min(sample_rate, 1.),
+                                 output_directory=os.environ.get('profiling_output_directory'),
+                                 top_functions=int(os.environ.get('profiling_top_functions', DEFAULT_TOP_FUNCTIONS)))
+
+
+# Profiler configuration of this container, created from the environment on first use
+_profiler_configuration: Union[ProfilerConfiguration, None] = None
+_profiler_configured = False
+# cProfile cannot profile overlapping invocations on several threads, so at most one invocation is profiled at a time
+_profiling_lock = threading.Lock()
+
+
+def get_profiler_configuration() -> Union[ProfilerConfiguration, None]:
+    global _profiler_configuration, _profiler_configured
+    if not _profiler_configured:
+        _profiler_configuration = create_profiler_configuration_from_env()
+        _profiler_configured = True
+    return _profiler_configuration
+
+
+def set_profiler_configuration(configuration: Union[ProfilerConfiguration, None]):
+    """
+    Replace the profiler configuration, e.g. to profile every invocation in a test. Set to None to configure profiling
+    from the environment on next use.
+    """
+    global _profiler_configuration, _profiler_configured
+    _profiler_configuration = configuration
+    _profiler_configured = configuration is not None
+
+
+def profile_handler(name: str) -> Callable:
+    """
+    Decorator profiling a sampled fraction of the invocations of a Lambda handler, when profiling is enabled by the
+    environment (see create_profiler_configuration_from_env). The functions with the highest cumulative time are
+    logged after each profiled invocation. When profiling is disabled, the handler is called directly.
+
+    :param name: name of the handler, used in the log and in the filenames of written profiles
+    """
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def profiled_handler(event, context):
+            configuration = get_profiler_configuration()
+            if configuration is None or random.random() >= configuration.sample_rate:
+                return handler(event, context)
+            if not _profiling_lock.acquire(blocking=False):
+                return handler(event, context)
+            try:
+                return _run_profiled(name, configuration, handler, event, context)
+            finally:
+                _profiling_lock.release()
+        return profiled_handler
+    return decorator
+
+
+def _run_profiled(name: str, configuration: ProfilerConfiguration, handler: Callable, event, context):
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return handler(event, context)
+    finally:
+        profile.disable()
+        # Profiling is opt-in diagnostics, so a failure to log or write the profile must not change the handler's
+        # result, or replace the exception it raised
+        try:
+            log_profile(name, profile, top_functions=configuration.top_functions)
+            if configuration.output_directory is not None:
+                filepath = write_profile(name, profile, configuration.output_directory,
+                                         request_id=getattr(context, 'aws_request_id', None))
+                logging.info(f'Wrote profile of {name} to {filepath}')
+        except Exception:
+            logging.exception(f'Unable to record the profile of {name}')
+
+
+def log_profile(name: str, profile: cProfile.Profile, top_functions: int = DEFAULT_TOP_FUNCTIONS):
+    """
+    Log the functions of a profile with the highest cumulative time.
+    """
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_functions)
+    logging.info(f'Profile of {name}:\n{stream.getvalue()}')
+
+
+def write_profile(name: str, profile: cProfile.Profile, output_directory: str,
+                  request_id: Union[str, None] = None) -> str:
+    """
+    Write a profile in the pstats format.
+
+    :return: path of the written profile
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    filename = f'{name}-{time.time_ns()}' + (f'-{request_id}' if request_id is not None else '') + '.prof'
+    filepath = os.path.join(output_directory, filename)
+    profile.dump_stats(filepath)
+    return filepath
@@ -0,0 +1,225 @@
+import logging
+import os
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Union
+
+DEFAULT_RSS_SAMPLE_INTERVAL = 0.01
+
+# tracemalloc.reset_peak is available from Python 3.9. Without it, each stage's peak is measured from the start of
+# tracing, which overestimates the peak of stages that follow a larger one.
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of the current process in bytes. Where /proc is unavailable, the peak resident set size is
+    returned instead.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class StageMemory:
+    calls: int = 0
+    peak_allocated_bytes: int = 0
+    rss_high_water_bytes: int = 0
+
+
+@dataclass
+class _ActiveStage:
+    name: str
+    start_bytes: int
+    peak_bytes: int
+    rss_high_water_bytes: int
+
+
+class MemoryProfiler:
+    """
+    Records the peak memory of named stages of processing. For each stage, the peak Python allocation above the
+    allocation at the start of the stage is traced with tracemalloc, and the resident set size is sampled on a
+    background thread, which also accounts for memory not allocated through Python, e.g. by native libraries. Stages may
+    be nested, in which case the peak of the outer stage includes that of the inner stage.
+
+    Allocations are traced for the whole process, so stages should not run concurrently on several threads while
+    profiling. Tracing also slows down every allocation, so latencies measured while profiling are not representative.
+
+    :param rss_sample_interval: interval in seconds at which the resident set size is sampled
+    """
+
+    def __init__(self, rss_sample_interval: float = DEFAULT_RSS_SAMPLE_INTERVAL):
+        self.rss_sample_interval = rss_sample_interval
+        self.stages: Dict[str, StageMemory] = {}
+        self._active: List[_ActiveStage] = []
+        self._started_tracing = False
+        self._stop_event = threading.Event()
+        self._sampler: Union[threading.Thread, None] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None
+
+    def start(self):
+        """
+        Start tracing allocations and sampling the resident set size.
+        """
+        if self.running:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_rss, name='memory-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """
+        Stop sampling, and stop tracing allocations if tracing was started by this profiler.
+        """
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._sampler.join()
+        self._sampler = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager recording the peak memory of the enclosed code as the named stage. Has no effect unless the
+        profiler is running.
+        """
+        if not self.running:
+            yield
+            return
+
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        rss_bytes = current_rss_bytes()
+        with self._lock:
+            # The traced peak is about to be reset, so record it against the enclosing stages first
+            self._update_active_peaks(peak_bytes, rss_bytes)
+            if _reset_peak is not None:
+                _reset_peak()
+            active_stage = _ActiveStage(name=name, start_bytes=current_bytes, peak_bytes=current_bytes,
+                                        rss_high_water_bytes=rss_bytes)
+            self._active.append(active_stage)
+        try:
+            yield
+        finally:
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            rss_bytes = current_rss_bytes()
+            with self._lock:
+                self._update_active_peaks(peak_bytes, rss_bytes)
+                self._active.remove(active_stage)
+                stage_memory = self.stages.setdefault(name, StageMemory())
+                stage_memory.calls += 1
+                stage_memory.peak_allocated_bytes = max(stage_memory.peak_allocated_bytes,
+                                                        active_stage.peak_bytes - active_stage.start_bytes)
+                stage_memory.rss_high_water_bytes = max(stage_memory.rss_high_water_bytes,
+                                                        active_stage.rss_high_water_bytes)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarise the recorded stages.
+
+        :return: dictionary keyed by stage name, with the number of calls, the peak allocation of any call in megabytes,
+        and the resident set size high-water mark in megabytes
+        """
+        with self._lock:
+            return {name: {'calls': stage.calls,
+                           'peak_allocated_mb': stage.peak_allocated_bytes / 2 ** 20,
+                           'rss_high_water_mb': stage.rss_high_water_bytes / 2 ** 20}
+                    for name, stage in self.stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _update_active_peaks(self, peak_bytes: Union[int, None], rss_bytes: int):
+        for active_stage in self._active:
+            if peak_bytes is not None:
+                active_stage.peak_bytes = max(active_stage.peak_bytes, peak_bytes)
+            active_stage.rss_high_water_bytes = max(active_stage.rss_high_water_bytes, rss_bytes)
+
+    def _sample_rss(self):
+        while not self._stop_event.wait(self.rss_sample_interval):
+            rss_bytes = current_rss_bytes()
+            with self._lock:
+                self._update_active_peaks(None, rss_bytes)
+
+
+# Memory profiler of this process, created from the environment on first use
+_memory_profiler: Union[MemoryProfiler, None] = None
+_memory_profiler_configured = False
+_memory_profiler_lock = threading.Lock()
+
+
+def get_memory_profiler() -> Union[MemoryProfiler, None]:
+    """
+    Return the memory profiler of this process, or None if memory profiling is disabled. Memory profiling is enabled
+    by setting the memory_profiling environment variable to 'true'.
+    """
+    global _memory_profiler, _memory_profiler_configured
+    if _memory_profiler_configured:
+        return _memory_profiler
+    with _memory_profiler_lock:
+        if not _memory_profiler_configured:
+            if os.environ.get('memory_profiling', '').lower() in ('1', 'true', 'yes'):
+                _memory_profiler = MemoryProfiler()
+                _memory_profiler.start()
+            _memory_profiler_configured = True
+        return _memory_profiler
+
+
+def set_memory_profiler(memory_profiler: Union[MemoryProfiler, None]):
+    """
+    Replace the memory profiler of this process, e.g. with one started by a test. Set to None to configure profiling
+    from the environment on next use.
+    """
+    global _memory_profiler, _memory_profiler_configured
+    with _memory_profiler_lock:
+        _memory_profiler = memory_profiler
+        _memory_profiler_configured = memory_profiler is not None
+
+
+@contextmanager
+def profile_memory(stage: str):
+    """
+    Context manager recording the peak memory of the enclosed code as the named stage, if memory profiling is enabled.
+    """
+    memory_profiler = get_memory_profiler()
+    if memory_profiler is None:
+        yield
+        return
+    with memory_profiler.stage(stage):
+        yield
+
+
+def log_memory_profile():
+    """
+    Log the peak memory of each stage recorded so far, if memory profiling is enabled.
+    """
+    memory_profiler = get_memory_profiler()
+    if memory_profiler is None:
+        return
+    for stage, stage_summary in memory_profiler.summary().items():
+        logging.info(f"Memory profile of {stage}: {stage_summary['calls']} calls, "
+                     f"peak allocation {stage_summary['peak_allocated_mb']:.1f} MB, "
+                     f"RSS high-water mark {stage_summary['rss_high_water_mb']:.1f} MB")
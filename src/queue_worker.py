@@ -0,0 +1,96 @@
+"""
+Long-running alternative to the update_strava_description Lambda function, for self-hosted deployments. Consumes the
+messages published by process_strava_webhook from a directory-backed queue (set the 'message_queue_directory'
+environment variable of the webhook handler to the same directory), keeping the summit database, timezone resolver and
+API clients loaded between activities. For example, from the src directory:
+
+    python queue_worker.py /var/lib/strava-summit-reports/queue --concurrency 4
+"""
+import argparse
+import logging
+import os
+import signal
+
+import update_strava_description
+from data_sources.summits import open_summit_reference
+from lambda_helpers.message_queue import FileQueue, MessageQueue
+from lambda_helpers.strava_client import create_strava_client_from_env
+from lambda_helpers.worker import DEFAULT_CONCURRENCY, DEFAULT_MAX_ATTEMPTS, DEFAULT_POLL_INTERVAL, QueueWorker
+from summits.report_configuration import REPORT_CONFIG
+from weather.report import get_weather_retriever
+from weather.timezones import get_timezone_resolver
+
+logging.getLogger().setLevel(logging.INFO)
+
+
+def warm_up():
+    """
+    Load the state shared by all activities before the first message arrives: the summit database, the timezone
+    resolver, the weather retriever and the Strava client.
+
+    :return: StravaClient to be reused for every message
+    """
+    try:
+        summit_reference = open_summit_reference(update_strava_description.DATABASE_FILEPATH,
+                                                 classification_codes=REPORT_CONFIG.classification_codes)
+        summit_reference.warm()
+    except Exception:
+        logging.exception('Unable to load the summit database')
+    get_timezone_resolver()
+    get_weather_retriever(os.environ.get('weather_api_key'))
+    return create_strava_client_from_env()
+
+
+def create_worker(queue: MessageQueue,
+                  concurrency: int = DEFAULT_CONCURRENCY,
+                  poll_interval: float = DEFAULT_POLL_INTERVAL,
+                  max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> QueueWorker:
+    """
+    Create a QueueWorker that updates activity descriptions for the messages in the queue, with warm shared state.
+    """
+    strava_client = warm_up()
+
+    def handle_message(message):
+        update_strava_description.process_activity_message(message, strava_client=strava_client)
+
+    return QueueWorker(queue=queue,
+                       handler=handle_message,
+                       concurrency=concurrency,
+                       poll_interval=poll_interval,
+                       max_attempts=max_attempts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update Strava activity descriptions from a message queue.')
+    parser.add_argument('queue_directory', help='directory of the message queue')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='number of activities processed concurrently')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='interval in seconds at which the queue is checked for new messages')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help='maximum number of attempts to process each message')
+    parser.add_argument('--recover', action='store_true',
+                        help='return messages left in progress by a previous worker to the queue on start')
+    args = parser.parse_args()
+
+    queue = FileQueue(args.queue_directory)
+    if args.recover:
+        logging.info(f'Returned {queue.recover()} in-progress messages to the queue')
+
+    worker = create_worker(queue, concurrency=args.concurrency, poll_interval=args.poll_interval,
+                           max_attempts=args.max_attempts)
+
+    def shutdown(signum, frame):
+        logging.info(f'Received signal {signum}, finishing in-progress messages...')
+        worker.stop(timeout=0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logging.info(f'Processing messages from {args.queue_directory} with {worker.concurrency} workers')
+    worker.run()
+    logging.info(f'Stopped after processing {worker.processed_count} messages')
+
+
+if __name__ == '__main__':
+    main()
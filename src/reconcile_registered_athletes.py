@@ -0,0 +1,24 @@
+import json
+import logging
+
+from lambda_helpers.registered_athletes import get_registered_athlete_store, reconcile_registered_athlete_count
+from lambda_helpers.strava_client import create_strava_client_from_env
+
+logging.getLogger().setLevel(logging.INFO)
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled job correcting the maintained count of registered athletes, used by register_new_user, from the
+    authorisation token cache.
+    """
+    registered_athlete_store = get_registered_athlete_store()
+    if registered_athlete_store is None:
+        logging.info('No registered athlete store is configured, nothing to reconcile.')
+        return {'statusCode': 200}
+
+    strava_client = create_strava_client_from_env()
+    drift = reconcile_registered_athlete_count(registered_athlete_store, strava_client.authorisation.token_cache)
+    logging.info(f'Reconciled registered athlete count, corrected by {drift}.')
+    return {'statusCode': 200,
+            'body': json.dumps({'registered_athletes': registered_athlete_store.count(), 'corrected_by': drift})}
@@ -1,6 +1,8 @@
 import logging
 import json
+from lambda_helpers.registered_athletes import count_registered_athletes, get_registered_athlete_store
 from lambda_helpers.strava_client import create_strava_client_from_env
+from profiling.cpu import profile_handler
 from typing import Dict, Union
 
 logging.getLogger().setLevel(logging.INFO)
@@ -8,10 +10,11 @@ logging.getLogger().setLevel(logging.INFO)
 MAX_REGISTERED_USERS = 5
 
 
+@profile_handler('register_new_user')
 def lambda_handler(event, context):
     strava_client = create_strava_client_from_env()
 
-    total_registered_users = strava_client.authorisation.token_cache.total_tokens
+    total_registered_users = count_registered_athletes(strava_client.authorisation.token_cache)
     logging.info(f'{total_registered_users} users are currently registered.')
     if total_registered_users >= MAX_REGISTERED_USERS:
         return {'statusCode': 400,
@@ -29,13 +32,22 @@ def lambda_handler(event, context):
     else:
         try:
             athlete_id = strava_client.authorisation.post_athlete_auth_code(authorisation_code)
-            return {'statusCode': 200,
-                    'body': json.dumps(f'Successfully registered athlete with ID {athlete_id}')}
         except Exception:
             logging.exception('Unable to authorise athlete')
             return {'statusCode': 400,
                     'body': json.dumps('Unable to register athlete.')}
 
+        # The athlete's token is already stored, so they are registered even if the count cannot be updated; the
+        # reconciliation job records the registration instead
+        try:
+            registered_athlete_store = get_registered_athlete_store()
+            if registered_athlete_store is not None:
+                registered_athlete_store.register(athlete_id)
+        except Exception:
+            logging.exception(f'Unable to record the registration of athlete {athlete_id}')
+        return {'statusCode': 200,
+                'body': json.dumps(f'Successfully registered athlete with ID {athlete_id}')}
+
 
 def parse_code_from_query_string(event: Dict) -> Union[int, None]:
     queryStringParameters = event.get('queryStringParameters')
@@ -0,0 +1,43 @@
+"""
+Replay a stream of Strava webhook events through the local pipeline simulator, e.g. from the src directory:
+
+    python -m simulation ../tests/data/activity_update_event.json --rate 5 --concurrency 2
+"""
+import argparse
+import json
+import logging
+
+from simulation.pipeline import LocalPipeline, format_report, read_webhook_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay Strava webhook events through a local pipeline simulator.')
+    parser.add_argument('events', help='JSON file containing a list of webhook events, or one event per line')
+    parser.add_argument('--rate', type=float, default=None, help='delivery rate in events per second')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of concurrent description updates')
+    parser.add_argument('--database', default=None, help='path to the summit database')
+    parser.add_argument('--strava-latency', type=float, default=0., help='simulated Strava API latency in seconds')
+    parser.add_argument('--weather-latency', type=float, default=0., help='simulated WeatherAPI latency in seconds')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    events = read_webhook_events(args.events)
+    athlete_ids = sorted({e['owner_id'] for e in events if 'owner_id' in e})
+
+    pipeline_options = {'strava_latency': args.strava_latency,
+                        'weather_latency': args.weather_latency,
+                        'max_registered_users': len(athlete_ids)}
+    if args.database is not None:
+        pipeline_options['database_filepath'] = args.database
+
+    with LocalPipeline(**pipeline_options) as pipeline:
+        logging.getLogger().setLevel(logging.WARNING)
+        for athlete_id in athlete_ids:
+            pipeline.register_athlete(athlete_id)
+        report = pipeline.replay(events, rate=args.rate, concurrency=args.concurrency)
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import copy
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Union
+
+import pandas as pd
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'tests', 'data')
+
+
+class UnauthorisedAthleteError(Exception):
+    pass
+
+
+class QueueTopic:
+    """
+    Stand-in for an SNS Topic, which places published messages on an in-memory queue for a consumer to process.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def publish(self, Message: str) -> Dict:
+        message_id = str(uuid.uuid4())
+        self.queue.put(Message)
+        return {'MessageId': message_id}
+
+
+class FakeTokenCache:
+    """
+    Stand-in for the DynamoDB authorisation token cache, holding one token per registered athlete in memory.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return len(self._tokens)
+
+    def save_authorisation_token(self, athlete_id: int, token: Dict):
+        with self._lock:
+            self._tokens[athlete_id] = token
+
+    def delete_authorisation_token(self, athlete_id: int):
+        with self._lock:
+            self._tokens.pop(athlete_id, None)
+
+    def is_registered(self, athlete_id: int) -> bool:
+        return athlete_id in self._tokens
+
+
+class FakeAuthorisation:
+    """
+    Stand-in for the Strava OAuth handler. Authorisation codes are the athlete ID as a string.
+    """
+
+    def __init__(self, token_cache: FakeTokenCache):
+        self.token_cache = token_cache
+
+    def generate_authorisation_url(self, scope: str, redirect_uri: str) -> str:
+        return f'https://www.strava.com/oauth/authorize?scope={scope}&redirect_uri={redirect_uri}'
+
+    def post_athlete_auth_code(self, authorisation_code: str) -> int:
+        athlete_id = int(authorisation_code)
+        self.token_cache.save_authorisation_token(athlete_id, {'access_token': str(uuid.uuid4())})
+        return athlete_id
+
+
+class FakeStravaClient:
+    """
+    Stand-in for the Strava API client, serving every activity from the same activity and stream set fixtures. Activity
+    descriptions written with update_activity are retained, and the number of calls to each endpoint is counted. An
+    optional fixed latency is added to every call to approximate network round trips.
+    """
+
+    def __init__(self,
+                 token_cache: FakeTokenCache,
+                 activity_filepath: str = os.path.join(FIXTURE_DIRECTORY, 'activity.json'),
+                 streamset_filepath: str = os.path.join(FIXTURE_DIRECTORY, 'example_streamset.json'),
+                 latency: float = 0.):
+        self.authorisation = FakeAuthorisation(token_cache)
+        self.latency = latency
+        self.call_counts = Counter()
+        self.descriptions: Dict[int, str] = {}
+
+        with open(activity_filepath, 'r') as file:
+            self._activity = json.load(file)
+        with open(streamset_filepath, 'r') as file:
+            self._streamset = json.load(file)
+
+    def get_activity(self, athlete_id: int, activity_id: int) -> Dict:
+        self._call('get_activity', athlete_id)
+        activity = copy.deepcopy(self._activity)
+        activity['id'] = activity_id
+        activity['athlete'] = {'id': athlete_id, 'resource_state': 1}
+        activity['description'] = self.descriptions.get(activity_id)
+        return activity
+
+    def get_activity_stream_set(self, athlete_id: int, activity_id: int, streams: List[str],
+                                as_df: bool = False) -> Union[Dict, pd.DataFrame]:
+        self._call('get_activity_stream_set', athlete_id)
+        streamset = {k: v for k, v in self._streamset.items() if k in streams}
+        if not as_df:
+            return copy.deepcopy(streamset)
+
+        df = pd.DataFrame({k: v['data'] for k, v in streamset.items() if k != 'latlng'})
+        if 'latlng' in streamset:
+            latlng = pd.DataFrame(streamset['latlng']['data'], columns=['lat', 'lng'])
+            df = pd.concat([df, latlng], axis=1)
+        return df
+
+    def update_activity(self, athlete_id: int, activity_id: int, updatable_activity) -> Dict:
+        self._call('update_activity', athlete_id)
+        self.descriptions[activity_id] = updatable_activity.description
+        return {'id': activity_id, 'description': updatable_activity.description}
+
+    def _call(self, endpoint: str, athlete_id: int):
+        if not self.authorisation.token_cache.is_registered(athlete_id):
+            raise UnauthorisedAthleteError(f'Athlete {athlete_id} is not registered')
+        self.call_counts[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeWeatherAPI:
+    """
+    Stand-in for weatherapi.get_weather_history, returning the same hourly weather fixture for every request.
+    """
+
+    def __init__(self, filepath: str = os.path.join(FIXTURE_DIRECTORY, 'weather.csv'), latency: float = 0.):
+        self.latency = latency
+        self.call_count = 0
+
+        df = pd.read_csv(filepath)
+        df['time'] = pd.to_datetime(df['time'])
+        df.set_index('time', inplace=True)
+        df['condition'] = df['condition'].apply(lambda x: json.loads(x.replace('\'', '"')))
+        self._weather = df
+
+    def __call__(self, api_key: str, latitude: float, longitude: float, start_time, end_time) -> pd.DataFrame:
+        self.call_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._weather.copy()
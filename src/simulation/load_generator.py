@@ -0,0 +1,131 @@
+"""
+Generate synthetic Strava webhook traffic for a number of simulated athletes, and drive it through the local pipeline
+simulator, e.g. from the src directory:
+
+    python -m simulation.load_generator --athletes 50 --activities-per-athlete 4 --rate 20 --concurrency 4
+"""
+import argparse
+import json
+import logging
+import random
+from typing import Dict, List
+
+from simulation.pipeline import LocalPipeline, format_report
+
+FIRST_ATHLETE_ID = 100000
+FIRST_ACTIVITY_ID = 7000000000
+SUBSCRIPTION_ID = 120475
+ACTIVITY_UPDATES = [{'title': 'Morning Hike'}, {'type': 'Hike'}, {'private': 'true'}, {'title': 'A view from Macdui'}]
+
+
+def generate_webhook_events(athletes: int,
+                            activities_per_athlete: int,
+                            update_probability: float = 0.3,
+                            duplicate_probability: float = 0.1,
+                            deauthorisation_probability: float = 0.05,
+                            duration: int = 3600,
+                            start_time: int = 1657779634,
+                            seed: int = 0) -> List[Dict]:
+    """
+    Generate a time-ordered stream of webhook event bodies, in the format sent by the Strava webhook events API, for a
+    number of simulated athletes. Each athlete creates activities at random times. Some creations are redelivered, as
+    when Strava retries a delivery, some activities are later updated, and some athletes deauthorise the app after
+    their last event.
+
+    :param athletes: number of simulated athletes
+    :param activities_per_athlete: number of activities created by each athlete
+    :param update_probability: probability that an activity is subsequently updated
+    :param duplicate_probability: probability that an activity creation event is delivered twice
+    :param deauthorisation_probability: probability that an athlete deauthorises the app after their last event
+    :param duration: period in seconds over which activity creation events are spread
+    :param start_time: epoch time of the start of the period
+    :param seed: random seed
+    :return: list of webhook event bodies, sorted by event_time
+    """
+    rng = random.Random(seed)
+    events = []
+    activity_id = FIRST_ACTIVITY_ID
+
+    for athlete_index in range(athletes):
+        athlete_id = FIRST_ATHLETE_ID + athlete_index
+        last_event_time = start_time
+
+        for _ in range(activities_per_athlete):
+            activity_id += 1
+            created = start_time + rng.randrange(duration)
+            events.append(_activity_event('create', athlete_id, activity_id, created))
+            last_event_time = max(last_event_time, created)
+
+            if rng.random() < duplicate_probability:
+                redelivered = created + rng.randint(1, 30)
+                events.append(_activity_event('create', athlete_id, activity_id, redelivered))
+                last_event_time = max(last_event_time, redelivered)
+
+            if rng.random() < update_probability:
+                updated = created + rng.randint(60, 600)
+                events.append(_activity_event('update', athlete_id, activity_id, updated,
+                                              updates=rng.choice(ACTIVITY_UPDATES)))
+                last_event_time = max(last_event_time, updated)
+
+        if rng.random() < deauthorisation_probability:
+            events.append({'aspect_type': 'update',
+                           'event_time': last_event_time + 1,
+                           'object_id': athlete_id,
+                           'object_type': 'athlete',
+                           'owner_id': athlete_id,
+                           'subscription_id': SUBSCRIPTION_ID,
+                           'updates': {'authorized': 'false'}})
+
+    return sorted(events, key=lambda e: e['event_time'])
+
+
+def _activity_event(aspect_type: str, athlete_id: int, activity_id: int, event_time: int,
+                    updates: Dict = None) -> Dict:
+    return {'aspect_type': aspect_type,
+            'event_time': event_time,
+            'object_id': activity_id,
+            'object_type': 'activity',
+            'owner_id': athlete_id,
+            'subscription_id': SUBSCRIPTION_ID,
+            'updates': updates if updates is not None else {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive synthetic webhook traffic through a local pipeline simulator.')
+    parser.add_argument('--athletes', type=int, default=10, help='number of simulated athletes')
+    parser.add_argument('--activities-per-athlete', type=int, default=3, help='activities created by each athlete')
+    parser.add_argument('--rate', type=float, default=None, help='delivery rate in events per second')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of concurrent description updates')
+    parser.add_argument('--database', default=None, help='path to the summit database')
+    parser.add_argument('--strava-latency', type=float, default=0., help='simulated Strava API latency in seconds')
+    parser.add_argument('--weather-latency', type=float, default=0., help='simulated WeatherAPI latency in seconds')
+    parser.add_argument('--trace-memory', action='store_true', help='report peak traced allocation with tracemalloc')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', default=None, help='also write the generated events to this file, one per line')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    events = generate_webhook_events(athletes=args.athletes,
+                                     activities_per_athlete=args.activities_per_athlete,
+                                     seed=args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            file.writelines(json.dumps(e) + '\n' for e in events)
+
+    pipeline_options = {'strava_latency': args.strava_latency,
+                        'weather_latency': args.weather_latency,
+                        'max_registered_users': args.athletes}
+    if args.database is not None:
+        pipeline_options['database_filepath'] = args.database
+
+    with LocalPipeline(**pipeline_options) as pipeline:
+        logging.getLogger().setLevel(logging.WARNING)
+        for athlete_index in range(args.athletes):
+            pipeline.register_athlete(FIRST_ATHLETE_ID + athlete_index)
+        report = pipeline.replay(events, rate=args.rate, concurrency=args.concurrency, trace_memory=args.trace_memory)
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+
+class LatencyRecorder:
+    """
+    Thread-safe record of per-stage latencies, failures and memory high-water marks, summarised as percentiles.
+    """
+
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._rss_high_water: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._latencies[stage].append(seconds)
+
+    def record_failure(self, stage: str):
+        with self._lock:
+            self._failures[stage] += 1
+
+    def record_memory(self, stage: str, rss_bytes: int):
+        with self._lock:
+            self._rss_high_water[stage] = max(self._rss_high_water[stage], rss_bytes)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarise the recorded latencies for each stage.
+
+        :return: dictionary keyed by stage name, with the number of successful and failed calls, the mean, p50, p95
+        and p99 latencies in milliseconds, and the resident set size high-water mark in megabytes, if recorded
+        """
+        summary = {}
+        for stage in sorted(set(self._latencies) | set(self._failures)):
+            latencies_ms = np.array(self._latencies.get(stage, []), dtype=float) * 1000.
+            stage_summary = {'count': len(latencies_ms), 'failures': self._failures.get(stage, 0)}
+            if len(latencies_ms):
+                p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+                stage_summary.update({'mean_ms': float(latencies_ms.mean()),
+                                      'p50_ms': float(p50),
+                                      'p95_ms': float(p95),
+                                      'p99_ms': float(p99)})
+            if stage in self._rss_high_water:
+                stage_summary['rss_high_water_mb'] = self._rss_high_water[stage] / 2 ** 20
+            summary[stage] = stage_summary
+        return summary
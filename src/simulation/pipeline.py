@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Union
+from unittest import mock
+
+import process_strava_webhook
+import register_new_user
+import update_strava_description
+import weather.report
+import weather.timezones
+from data_sources.report_store import InMemoryReportStore
+from data_sources.summit_log import SQLiteSummitLog
+from lambda_helpers.idempotency import EventDeduplicator, InMemoryIdempotencyStore
+from lambda_helpers.rate_limit import StravaRateLimiter, set_rate_limiter
+from lambda_helpers.registered_athletes import InMemoryRegisteredAthleteStore, set_registered_athlete_store
+from profiling.memory import current_rss_bytes
+from simulation.fakes import FakeStravaClient, FakeTokenCache, FakeWeatherAPI, QueueTopic
+from simulation.metrics import LatencyRecorder
+from summits.report_configuration import REPORT_CONFIG
+
+_STOP = object()
+
+
+class LocalPipeline:
+    """
+    Runs the register_new_user, process_strava_webhook and update_strava_description handlers in-process, against
+    in-memory stand-ins for SNS, the DynamoDB token cache, the Strava API and WeatherAPI. Use as a context manager:
+    the stand-ins are installed into the handler modules on entry and removed on exit.
+    """
+
+    def __init__(self,
+                 database_filepath: str = update_strava_description.DATABASE_FILEPATH,
+                 strava_latency: float = 0.,
+                 weather_latency: float = 0.,
+                 max_registered_users: int = register_new_user.MAX_REGISTERED_USERS,
+                 strava_rate_limiter: Union[StravaRateLimiter, None] = None):
+        self.database_filepath = database_filepath
+        self.max_registered_users = max_registered_users
+        self.token_cache = FakeTokenCache()
+        self.registered_athletes = InMemoryRegisteredAthleteStore()
+        self.summit_log = SQLiteSummitLog(classification_codes=REPORT_CONFIG.classification_codes)
+        self.strava_client = FakeStravaClient(self.token_cache, latency=strava_latency)
+        self.weather_api = FakeWeatherAPI(latency=weather_latency)
+        # Unless a rate limiter is given, simulated load is not limited by the Strava API quotas
+        self.strava_rate_limiter = (strava_rate_limiter if strava_rate_limiter is not None
+                                    else StravaRateLimiter(short_term_limit=10 ** 9, daily_limit=10 ** 9))
+        self.topic = QueueTopic()
+        self.metrics = LatencyRecorder()
+        self._arrival_times: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._exit_stack = None
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        for handler in (process_strava_webhook, register_new_user, update_strava_description):
+            self._exit_stack.enter_context(mock.patch.object(handler, 'create_strava_client_from_env',
+                                                             return_value=self.strava_client))
+        self._exit_stack.enter_context(mock.patch.object(update_strava_description, 'DATABASE_FILEPATH',
+                                                         self.database_filepath))
+        self._exit_stack.enter_context(mock.patch.object(register_new_user, 'MAX_REGISTERED_USERS',
+                                                         self.max_registered_users))
+        self._exit_stack.enter_context(mock.patch.object(weather.report, 'get_weather_history', self.weather_api))
+
+        self.webhook_deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='webhook')
+        self.update_deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='update_description')
+        process_strava_webhook.set_sns_topic(self.topic)
+        process_strava_webhook.set_deduplicator(self.webhook_deduplicator)
+        update_strava_description.set_deduplicator(self.update_deduplicator)
+        update_strava_description.set_report_store(InMemoryReportStore())
+        update_strava_description.set_summit_log(self.summit_log)
+        set_rate_limiter(self.strava_rate_limiter)
+        set_registered_athlete_store(self.registered_athletes)
+        self._initial_skipped_stream_count = update_strava_description.get_skipped_stream_count()
+        self._initial_timezone_fallback_count = weather.timezones.get_timezone_fallback_count()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        process_strava_webhook.set_sns_topic(None)
+        process_strava_webhook.set_deduplicator(None)
+        update_strava_description.set_deduplicator(None)
+        update_strava_description.set_report_store(None)
+        update_strava_description.set_summit_log(None)
+        set_rate_limiter(None)
+        set_registered_athlete_store(None)
+        self._exit_stack.close()
+
+    def register_athlete(self, athlete_id: int) -> Dict:
+        """
+        Register an athlete through the register_new_user handler, as if returning from the Strava authorisation page.
+        """
+        event = {'headers': {'host': 'localhost'},
+                 'queryStringParameters': {'code': str(athlete_id)}}
+        return self._timed('register_new_user', register_new_user.lambda_handler, event)
+
+    def replay(self,
+               webhook_events: Iterable[Dict],
+               rate: Union[float, None] = None,
+               concurrency: int = 1,
+               trace_memory: bool = False) -> Dict:
+        """
+        Deliver a stream of webhook event bodies to the process_strava_webhook handler at a fixed rate, while
+        concurrency worker threads consume the published messages with the update_strava_description handler.
+
+        :param webhook_events: webhook event bodies, as sent by the Strava webhook events API
+        :param rate: delivery rate in events per second. If None, events are delivered as fast as possible.
+        :param concurrency: number of concurrent update_strava_description consumers
+        :param trace_memory: if True, trace Python allocations with tracemalloc and report the peak. This slows down
+        every stage, so latencies from a traced run should not be compared with untraced runs.
+        :return: dictionary summarising throughput and per-stage latency percentiles
+        """
+        if trace_memory:
+            tracemalloc.start()
+
+        consumers = [threading.Thread(target=self._consume) for _ in range(concurrency)]
+        for consumer in consumers:
+            consumer.start()
+
+        start_time = time.perf_counter()
+        event_count = 0
+        for event_body in webhook_events:
+            if rate is not None:
+                delay = start_time + event_count / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.deliver_webhook_event(event_body)
+            event_count += 1
+
+        for _ in consumers:
+            self.topic.queue.put(_STOP)
+        for consumer in consumers:
+            consumer.join()
+        duration = time.perf_counter() - start_time
+
+        report = {'events': event_count,
+                  'duration_s': duration,
+                  'throughput_events_per_s': event_count / duration if duration else 0.,
+                  'duplicates_suppressed': (self.webhook_deduplicator.suppressed_count +
+                                            self.update_deduplicator.suppressed_count),
+                  'strava_calls': dict(self.strava_client.call_counts),
+                  'strava_calls_delayed': self.strava_rate_limiter.delayed_count,
+                  'weather_calls': self.weather_api.call_count,
+                  'streams_skipped': (update_strava_description.get_skipped_stream_count() -
+                                      self._initial_skipped_stream_count),
+                  'timezone_fallbacks': (weather.timezones.get_timezone_fallback_count() -
+                                         self._initial_timezone_fallback_count),
+                  'stages': self.metrics.summary()}
+
+        if trace_memory:
+            report['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        return report
+
+    def deliver_webhook_event(self, event_body: Dict) -> Dict:
+        if event_body.get('object_type') == 'activity':
+            key = (event_body.get('owner_id'), event_body.get('object_id'))
+            with self._lock:
+                self._arrival_times.setdefault(key, time.perf_counter())
+        event = {'body': json.dumps(event_body)}
+        return self._timed('process_strava_webhook', process_strava_webhook.lambda_handler, event)
+
+    def _consume(self):
+        while True:
+            message = self.topic.queue.get()
+            if message is _STOP:
+                return
+
+            event = {'Records': [{'Sns': {'Message': message}}]}
+            response = self._timed('update_strava_description', update_strava_description.lambda_handler, event)
+
+            body = json.loads(message)
+            with self._lock:
+                arrival_time = self._arrival_times.pop((body['athlete_id'], body['activity_id']), None)
+            if response is not None and arrival_time is not None:
+                self.metrics.record('end_to_end', time.perf_counter() - arrival_time)
+
+    def _timed(self, stage: str, handler, event: Dict) -> Union[Dict, None]:
+        start = time.perf_counter()
+        try:
+            response = handler(event, None)
+        except Exception:
+            self.metrics.record_failure(stage)
+            return None
+        finally:
+            self.metrics.record_memory(stage, current_rss_bytes())
+        self.metrics.record(stage, time.perf_counter() - start)
+        return response
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"Events: {report['events']} in {report['duration_s']:.2f} s "
+             f"({report['throughput_events_per_s']:.2f} events/s)",
+             f"Duplicates suppressed: {report['duplicates_suppressed']}",
+             f"Strava API calls: {report['strava_calls']}",
+             f"Strava API calls delayed by rate limits: {report['strava_calls_delayed']}",
+             f"Weather API calls: {report['weather_calls']}",
+             f"Activity streams skipped: {report['streams_skipped']}",
+             f"Timezone lookups: {report['timezone_fallbacks']}"]
+    for stage, stats in report['stages'].items():
+        line = f"{stage}: {stats['count']} ok, {stats['failures']} failed"
+        if stats['count']:
+            line += (f", p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+                     f"p99 {stats['p99_ms']:.1f} ms")
+        if 'rss_high_water_mb' in stats:
+            line += f", RSS high-water {stats['rss_high_water_mb']:.1f} MB"
+        lines.append(line)
+    if 'traced_peak_mb' in report:
+        lines.append(f"Peak traced allocation: {report['traced_peak_mb']:.1f} MB")
+    return '\n'.join(lines)
+
+
+def read_webhook_events(filepath: str) -> List[Dict]:
+    """
+    Read webhook event bodies from a JSON file containing a single event or a list of events, or from a file with one
+    event per line.
+    """
+    with open(filepath, 'r') as file:
+        content = file.read()
+    try:
+        events = json.loads(content)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    return events if isinstance(events, list) else [events]
@@ -1,28 +1,131 @@
 import numpy as np
 import os
+from typing import List, Tuple, Union
 
-from data_sources.summits import LocalFileSummitReference
+from data_sources.report_store import ReportStore, hash_arrays, hash_strings
+from data_sources.summit_log import SummitVisit, summit_visits
+from data_sources.summits import open_summit_reference
 from models.coordinates import CoordinateSet
+from profiling.memory import profile_memory
 from summits.report_configuration import ReportConfiguration, REPORT_CONFIG
 from summits.summit_report import generate_summit_report
-from summits.visited_summits import find_visited_summits
+from summits.visited_summits import find_summits_near_polyline, find_visited_summits
 
 MODULE_PATH = os.path.realpath(__file__)
+# Widened radius in metres of the coarse summit search against a simplified route
+DEFAULT_POLYLINE_SEARCH_RADIUS = 250.
 
 
 def report_visited_summits(lat: np.array,
                            lng: np.array,
-                           database_filepath) -> str:
+                           database_filepath,
+                           workers: Union[int, None] = 1,
+                           report_store: Union[ReportStore, None] = None,
+                           altitude: Union[np.array, None] = None,
+                           elev_high: Union[float, None] = None,
+                           elevation_tolerance: Union[float, None] = None) -> str:
     """
     Generate a summary report of summits visited
 
     :param lat: array of latitude coordinates
     :param lng: array of longitude coordinates
-    :param database_filepath: path at which the hills database.pkl file is located
+    :param database_filepath: path at which the hills database.pkl file, or the directory of a tiled summit database,
+    is located
+    :param workers: number of worker processes used for the summit search. If None, one worker is used per CPU.
+    :param report_store: optional store of previously generated reports. If the same trail has already been reported
+    against the same database and configuration, the stored report is returned without searching for summits.
+    :param altitude: optional array of trail altitudes in metres, used for elevation pruning
+    :param elev_high: optional highest altitude of the activity in metres, used for elevation pruning
+    :param elevation_tolerance: if given, summits above the activity's highest point, and trail points below the lowest
+    candidate summit, by more than this many metres are excluded from the summit search
     :return: string visited summit report
     """
-    reference_data_source = LocalFileSummitReference(filepath=database_filepath)
-    gpx_trail = CoordinateSet(latitude=lat, longitude=lng)
+    report, _ = report_summit_visits(lat=lat, lng=lng, database_filepath=database_filepath, workers=workers,
+                                     report_store=report_store, altitude=altitude, elev_high=elev_high,
+                                     elevation_tolerance=elevation_tolerance)
+    return report
+
+
+@profile_memory('report_visited_summits')
+def report_summit_visits(lat: np.array,
+                         lng: np.array,
+                         database_filepath,
+                         workers: Union[int, None] = 1,
+                         report_store: Union[ReportStore, None] = None,
+                         altitude: Union[np.array, None] = None,
+                         elev_high: Union[float, None] = None,
+                         elevation_tolerance: Union[float, None] = None) -> Tuple[str, List[SummitVisit]]:
+    """
+    As report_visited_summits, also returning the visited summits, e.g. to record in a SummitLog. Stored reports hold
+    the visited summits too; reports stored without them are generated again.
+
+    :return: tuple of the string visited summit report, and the visits to summits with an ID in the summit database,
+    with classification bitmasks in the bit layout of REPORT_CONFIG
+    """
+    reference_data_source = open_summit_reference(database_filepath,
+                                                  classification_codes=REPORT_CONFIG.classification_codes)
+    gpx_trail = CoordinateSet(latitude=lat, longitude=lng, altitude=altitude)
+
+    if report_store is not None:
+        key = summit_report_key(gpx_trail, database_version=reference_data_source.version, config=REPORT_CONFIG,
+                                elev_high=elev_high, elevation_tolerance=elevation_tolerance)
+        stored_report = report_store.get(key)
+        if stored_report is not None and 'summits' in stored_report:
+            return stored_report['report'], [SummitVisit(summit_id=summit_id, classification_mask=mask)
+                                             for summit_id, mask in stored_report['summits']]
+
     visited_summit_data = find_visited_summits(summit_reference_data=reference_data_source,
-                                               gpx_trail=gpx_trail)
-    return generate_summit_report(summits=visited_summit_data, config=REPORT_CONFIG)
+                                               gpx_trail=gpx_trail,
+                                               workers=workers,
+                                               elev_high=elev_high,
+                                               elevation_tolerance=elevation_tolerance)
+    report = generate_summit_report(summits=visited_summit_data, config=REPORT_CONFIG)
+    visits = summit_visits(visited_summit_data)
+
+    if report_store is not None:
+        report_store.put(key, {'report': report,
+                               'summits': [[visit.summit_id, visit.classification_mask] for visit in visits]})
+    return report, visits
+
+
+def route_may_visit_summits(polyline: CoordinateSet,
+                            database_filepath,
+                            search_radius: float = DEFAULT_POLYLINE_SEARCH_RADIUS) -> bool:
+    """
+    Coarse check of whether an activity could have visited any summits, using a simplified route such as the decoded
+    map.summary_polyline of a Strava activity. If this returns False, the full GPS trail does not need to be searched.
+
+    :param polyline: CoordinateSet of the simplified route vertices, in order
+    :param database_filepath: path at which the hills database.pkl file, or the directory of a tiled summit database,
+    is located
+    :param search_radius: distance in metres from the simplified route within which summits are possible candidates.
+    This should be wider than the visit proximity, to allow for the simplification of the route.
+    :return: True if any summit is within search_radius of the simplified route
+    """
+    if not polyline.length:
+        return False
+    # Opened with the classification layout of report_summit_visits, so that both share the cached summit table
+    reference_data_source = open_summit_reference(database_filepath,
+                                                  classification_codes=REPORT_CONFIG.classification_codes)
+    possible_summits = find_summits_near_polyline(summit_reference_data=reference_data_source,
+                                                  polyline=polyline,
+                                                  search_radius=search_radius)
+    return len(possible_summits) > 0
+
+
+def summit_report_key(gpx_trail: CoordinateSet,
+                      database_version: str,
+                      config: ReportConfiguration,
+                      elev_high: Union[float, None] = None,
+                      elevation_tolerance: Union[float, None] = None) -> str:
+    """
+    Key identifying a summit report by its inputs: the GPS trail, the summit database version and the report
+    configuration, and the elevation pruning inputs if elevation pruning is used.
+    """
+    trail_hash = hash_arrays(gpx_trail.latitude, gpx_trail.longitude)
+    if elevation_tolerance is None:
+        return 'summits-' + hash_strings(trail_hash, database_version, config.fingerprint)
+
+    altitude_hash = hash_arrays(gpx_trail.altitude) if gpx_trail.altitude is not None else ''
+    return 'summits-' + hash_strings(trail_hash, database_version, config.fingerprint,
+                                     altitude_hash, repr(elev_high), repr(elevation_tolerance))
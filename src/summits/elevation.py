@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+# Allowance for the combined error of GPS or barometric activity altitudes and surveyed summit heights, in metres
+DEFAULT_ELEVATION_TOLERANCE = 50.
+
+
+def prune_candidate_summits(candidate_summits: pd.DataFrame,
+                            altitude_column: str,
+                            elev_high: float,
+                            tolerance: float = DEFAULT_ELEVATION_TOLERANCE) -> pd.DataFrame:
+    """
+    Remove candidate summits that are higher than the highest point of the activity, by more than the tolerance. Such
+    summits cannot have been visited.
+
+    :param candidate_summits: pd.DataFrame of candidate summits
+    :param altitude_column: name of the column of summit heights in metres
+    :param elev_high: highest altitude of the activity in metres, e.g. the elev_high property of a Strava activity
+    :param tolerance: allowance in metres for errors in the activity altitude
+    :return: pd.DataFrame of the remaining candidate summits, with their original index
+    """
+    return candidate_summits.loc[candidate_summits[altitude_column].values <= elev_high + tolerance]
+
+
+def high_ground_mask(trail_altitude: np.array,
+                     lowest_summit_height: float,
+                     tolerance: float = DEFAULT_ELEVATION_TOLERANCE) -> np.array:
+    """
+    Identify the trail points that are high enough to be at one of the candidate summits, i.e. not lower than the lowest
+    candidate summit by more than the tolerance. Points without an altitude are retained.
+
+    :param trail_altitude: array of trail point altitudes in metres
+    :param lowest_summit_height: height of the lowest candidate summit in metres
+    :param tolerance: allowance in metres for errors in the trail altitudes
+    :return: Boolean array, True for the trail points to be searched
+    """
+    altitude = np.asarray(trail_altitude, dtype=np.float64)
+    return ~(altitude < lowest_summit_height - tolerance)
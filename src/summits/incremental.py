@@ -0,0 +1,131 @@
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data_sources.summits import SummitReference
+from models.coordinates import CoordinateSet
+from summits.report_configuration import ReportConfiguration, REPORT_CONFIG
+from summits.summit_report import generate_summit_report
+from summits.visited_summits import search_visited_summits
+
+
+class IncrementalSummitDetector:
+    """
+    Finds the summits visited by a trail that is received in chunks, e.g. from live tracking or a chunked upload,
+    without searching the whole trail again as each chunk arrives. Only the points of each new chunk are searched. The
+    candidate summits must include those within search_window_width of the bounding box of the trail received so far.
+    They are loaded with a further window_margin around the bounding box, and are only loaded again when a chunk
+    extends the bounding box beyond this margin.
+
+    Each point is searched against every summit within search_window_width of it, so as long as search_window_width is
+    wider than distance_proximity, the summits found after the last chunk are those that find_visited_summits (without
+    elevation pruning) finds for the whole trail, in the same order.
+
+    :param summit_reference_data: Reference data source defining the summit information
+    :param distance_proximity: maximum approach distance in metres required to qualify a visit to a summit
+    :param search_window_width: margin in decimal degrees applied around the extent of the trail to select the candidate
+    summits. If None, the whole of the reference dataset is searched.
+    :param window_margin: margin in decimal degrees loaded beyond search_window_width, so that the candidate summits
+    are not loaded again for every small extension of the trail. Defaults to search_window_width.
+    :param workers: number of worker processes used for the nearest-neighbour search of each chunk
+    :param search_dtype: floating point type of the nearest-neighbour search
+    """
+
+    def __init__(self,
+                 summit_reference_data: SummitReference,
+                 distance_proximity: float = 20,
+                 search_window_width: Union[float, None] = 0.1,
+                 window_margin: Union[float, None] = None,
+                 workers: Union[int, None] = 1,
+                 search_dtype: type = np.float64):
+        self.summit_reference_data = summit_reference_data
+        self.distance_proximity = distance_proximity
+        self.search_window_width = search_window_width
+        self.window_margin = window_margin if window_margin is not None else search_window_width
+        self.workers = workers
+        self.search_dtype = search_dtype
+        self.point_count = 0
+        self.window_load_count = 0
+        self.candidate_summits: Union[pd.DataFrame, None] = None
+        self._latitude_extent: Union[Tuple[float, float], None] = None
+        self._longitude_extent: Union[Tuple[float, float], None] = None
+        self._latitude_window: Union[Tuple[float, float], None] = None
+        self._longitude_window: Union[Tuple[float, float], None] = None
+        self._visited_summits: Union[pd.DataFrame, None] = None
+
+    def add_chunk(self, chunk: CoordinateSet) -> pd.DataFrame:
+        """
+        Search the next chunk of the trail for visited summits.
+
+        :param chunk: CoordinateSet of the trail points that follow those of the previous chunk
+        :return: pd.DataFrame of the summits first visited in this chunk
+        """
+        if not chunk.length:
+            return self.visited_summits.iloc[:0]
+
+        self._update_candidate_summits(chunk)
+        chunk_summits = search_visited_summits(candidate_summits=self.candidate_summits,
+                                               summit_reference_data=self.summit_reference_data,
+                                               gpx_trail=chunk,
+                                               distance_proximity=self.distance_proximity,
+                                               workers=self.workers,
+                                               search_dtype=self.search_dtype)
+        self.point_count += chunk.length
+
+        if self._visited_summits is None:
+            self._visited_summits = chunk_summits
+            return chunk_summits
+
+        # As in find_visited_summits, summits are distinct rows of the reference data, in order of their first visit
+        previous_count = len(self._visited_summits)
+        self._visited_summits = pd.concat([self._visited_summits, chunk_summits]).drop_duplicates()
+        return self._visited_summits.iloc[previous_count:]
+
+    @property
+    def visited_summits(self) -> pd.DataFrame:
+        """
+        Summits visited by the trail received so far, in the order in which they were first visited.
+        """
+        if self._visited_summits is None:
+            return pd.DataFrame()
+        return self._visited_summits
+
+    def report(self, config: ReportConfiguration = REPORT_CONFIG) -> Union[str, None]:
+        """
+        Summit report of the trail received so far, as generated by generate_summit_report.
+        """
+        if not len(self.visited_summits):
+            return None
+        return generate_summit_report(summits=self.visited_summits, config=config)
+
+    def _update_candidate_summits(self, chunk: CoordinateSet):
+        if self.search_window_width is None:
+            if self.candidate_summits is None:
+                self.candidate_summits = self.summit_reference_data.load()
+                self.window_load_count += 1
+            return
+
+        self._latitude_extent = _extend(self._latitude_extent, chunk.latitude)
+        self._longitude_extent = _extend(self._longitude_extent, chunk.longitude)
+        if (_contains(self._latitude_window, self._latitude_extent, self.search_window_width) and
+                _contains(self._longitude_window, self._longitude_extent, self.search_window_width)):
+            return
+
+        width = self.search_window_width + self.window_margin
+        self._latitude_window = self._latitude_extent[0] - width, self._latitude_extent[1] + width
+        self._longitude_window = self._longitude_extent[0] - width, self._longitude_extent[1] + width
+        self.candidate_summits = self.summit_reference_data.load(latitude_window=self._latitude_window,
+                                                                 longitude_window=self._longitude_window)
+        self.window_load_count += 1
+
+
+def _extend(extent: Union[Tuple[float, float], None], values: np.array) -> Tuple[float, float]:
+    low, high = float(np.amin(values)), float(np.amax(values))
+    if extent is None:
+        return low, high
+    return min(extent[0], low), max(extent[1], high)
+
+
+def _contains(window: Union[Tuple[float, float], None], extent: Tuple[float, float], width: float) -> bool:
+    return window is not None and window[0] <= extent[0] - width and extent[1] + width <= window[1]
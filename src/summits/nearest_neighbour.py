@@ -4,6 +4,8 @@ from typing import Union, Tuple
 from models.coordinates import CoordinateSet
 
 EARTH_RADIUS = 6371.
+# Maximum number of elements in each work buffer of the blocked nearest-neighbour search, 2 MB of float64 values
+DEFAULT_BLOCK_SIZE = 1 << 18
 
 
 def haversine_distance(lon1: Union[np.array, float],
@@ -27,29 +29,90 @@ def haversine_distance(lon1: Union[np.array, float],
     return c * EARTH_RADIUS * 1000.
 
 
-def nearest_neighbour_search(coordinates: CoordinateSet, reference_points: CoordinateSet) -> Tuple[np.array, np.array]:
+def nearest_neighbour_search(coordinates: CoordinateSet,
+                             reference_points: CoordinateSet,
+                             dtype: type = np.float64) -> Tuple[np.array, np.array]:
     """
     For each coordinate in coordinates, find the closest coordinate from reference points.
 
     :param coordinates: CoordinateSet of input coordinates
     :param reference_points: CoordinateSet defining the search space for nearest neighbours to the coordinates argument
+    :param dtype: floating point type in which distances are compared. np.float32 halves the memory traffic of the
+    search, and is accurate to within a metre, but may select a different one of two reference points at almost the
+    same distance.
     :return: tuple containing the distances to the nearest neighbours, and the indices of the nearest neighbours
     """
-    coords_rad = CoordinateSet(latitude=np.radians(coordinates.latitude),
-                               longitude=np.radians(coordinates.longitude))
+    return nearest_neighbour_search_radians(to_radians(coordinates), to_radians(reference_points), dtype=dtype)
 
-    refs_rad = CoordinateSet(latitude=np.radians(reference_points.latitude),
-                             longitude=np.radians(reference_points.longitude))
 
-    coord_latitude, ref_latitude = np.meshgrid(coords_rad.latitude, refs_rad.latitude, sparse=True)
-    coord_longitude, ref_longitude = np.meshgrid(coords_rad.longitude, refs_rad.longitude, sparse=True)
-
-    distance_matrix = haversine_distance(ref_longitude, ref_latitude, coord_longitude, coord_latitude)
+def to_radians(coordinates: CoordinateSet) -> CoordinateSet:
+    """
+    Convert a CoordinateSet from decimal degrees to radians, in the floating point type of the coordinates. Every
+    nearest-neighbour search converts its inputs with this function, before casting them to the search dtype, so that
+    the sequential and parallel searches compare exactly the same values.
+    """
+    return CoordinateSet(latitude=np.radians(coordinates.latitude), longitude=np.radians(coordinates.longitude))
 
-    minimum_indices = np.argmin(distance_matrix, axis=0)
-    distances = distance_matrix[minimum_indices, range(coordinates.length)]
 
+def nearest_neighbour_search_radians(coords_rad: CoordinateSet,
+                                     refs_rad: CoordinateSet,
+                                     dtype: type = np.float64,
+                                     block_size: int = DEFAULT_BLOCK_SIZE) -> Tuple[np.array, np.array]:
+    """
+    As nearest_neighbour_search, for coordinates that have already been converted to radians.
+
+    The coordinates are searched in blocks, so that the full matrix of distances is never held in memory: each block
+    is compared with every reference point using two work buffers of at most block_size elements, which are allocated
+    once and reused for every block. Within a block, reference points are compared by the haversine term
+    a = sin^2(dlat / 2) + cos(lat1) cos(lat2) sin^2(dlon / 2), which increases monotonically with distance, so the
+    arcsine and square root are only evaluated for the nearest reference point of each coordinate.
+
+    :param coords_rad: CoordinateSet of input coordinates, in radians
+    :param refs_rad: CoordinateSet defining the search space for nearest neighbours, in radians
+    :param dtype: floating point type in which distances are compared
+    :param block_size: maximum number of elements in each work buffer
+    :return: tuple containing the distances to the nearest neighbours, and the indices of the nearest neighbours
+    """
+    coord_latitude = np.asarray(coords_rad.latitude, dtype=dtype)
+    coord_longitude = np.asarray(coords_rad.longitude, dtype=dtype)
+    ref_latitude = np.asarray(refs_rad.latitude, dtype=dtype)
+    ref_longitude = np.asarray(refs_rad.longitude, dtype=dtype)
+    n_coords, n_refs = len(coord_latitude), len(ref_latitude)
+    if not n_refs:
+        raise ValueError('Cannot search for nearest neighbours among no reference points')
+
+    coord_cos_latitude = np.cos(coord_latitude)
+    ref_cos_latitude = np.cos(ref_latitude)
+    half = dtype(0.5)
+
+    rows = max(min(block_size // n_refs, n_coords), 1)
+    latitude_term = np.empty((rows, n_refs), dtype=dtype)
+    longitude_term = np.empty((rows, n_refs), dtype=dtype)
+
+    haversine_terms = np.empty(n_coords, dtype=np.float64)
+    minimum_indices = np.empty(n_coords, dtype=np.intp)
+    for start in range(0, n_coords, rows):
+        stop = min(start + rows, n_coords)
+        lat_term, lon_term = latitude_term[:stop - start], longitude_term[:stop - start]
+
+        # sin^2(dlat / 2)
+        np.subtract(coord_latitude[start:stop, np.newaxis], ref_latitude, out=lat_term)
+        np.multiply(lat_term, half, out=lat_term)
+        np.sin(lat_term, out=lat_term)
+        np.square(lat_term, out=lat_term)
+
+        # cos(lat1) cos(lat2) sin^2(dlon / 2)
+        np.subtract(coord_longitude[start:stop, np.newaxis], ref_longitude, out=lon_term)
+        np.multiply(lon_term, half, out=lon_term)
+        np.sin(lon_term, out=lon_term)
+        np.square(lon_term, out=lon_term)
+        np.multiply(lon_term, ref_cos_latitude, out=lon_term)
+        np.multiply(lon_term, coord_cos_latitude[start:stop, np.newaxis], out=lon_term)
+
+        np.add(lat_term, lon_term, out=lat_term)
+        block_indices = np.argmin(lat_term, axis=1)
+        minimum_indices[start:stop] = block_indices
+        haversine_terms[start:stop] = lat_term[np.arange(stop - start), block_indices]
+
+    distances = 2 * np.arcsin(np.sqrt(np.clip(haversine_terms, 0., 1.))) * EARTH_RADIUS * 1000.
     return distances, minimum_indices
-
-
-
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Tuple, Union
+
+import numpy as np
+
+from models.coordinates import CoordinateSet
+from profiling.memory import profile_memory
+from summits.nearest_neighbour import nearest_neighbour_search, nearest_neighbour_search_radians, to_radians
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Reference points attached to by each worker process, set by the pool initialiser
+_worker_shared_memory = None
+_worker_reference_points = None
+
+
+class SharedReferencePoints:
+    """
+    A set of reference points, converted to radians and copied once into a named shared memory block. Worker processes
+    attach to the block by name, so the reference data is never pickled when tasks are submitted.
+    """
+
+    def __init__(self, reference_points: CoordinateSet):
+        # Radians are computed in the native type of the reference points, as in the sequential search, and stored as
+        # float64, which holds any float32 value exactly
+        refs_rad = to_radians(reference_points)
+        refs_rad = np.vstack([np.asarray(refs_rad.latitude, dtype=np.float64),
+                              np.asarray(refs_rad.longitude, dtype=np.float64)])
+        self.shape = refs_rad.shape
+        self._shared_memory = shared_memory.SharedMemory(create=True, size=max(refs_rad.nbytes, 1))
+        np.ndarray(self.shape, dtype=np.float64, buffer=self._shared_memory.buf)[:] = refs_rad
+
+    @property
+    def name(self) -> str:
+        return self._shared_memory.name
+
+    def close(self):
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def resolve_worker_count(workers: Union[int, None]) -> int:
+    """
+    Resolve the number of worker processes to use. If workers is None, one worker is used per available CPU.
+
+    :param workers: requested number of worker processes, or None
+    :return: number of worker processes, at least 1
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+@profile_memory('nearest_neighbour_search')
+def parallel_nearest_neighbour_search(coordinates: CoordinateSet,
+                                      reference_points: CoordinateSet,
+                                      workers: Union[int, None] = None,
+                                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                      dtype: type = np.float64) -> Tuple[np.array, np.array]:
+    """
+    Process-pool equivalent of nearest_neighbour_search. The reference points are placed in shared memory once, and
+    the coordinates are split into chunks which are searched in parallel. Each coordinate's nearest neighbour does not
+    depend on any other coordinate, so the results are identical to a sequential search. If only one worker is
+    requested, or the coordinates fit within a single chunk, the search falls back to nearest_neighbour_search.
+
+    :param coordinates: CoordinateSet of input coordinates
+    :param reference_points: CoordinateSet defining the search space for nearest neighbours to the coordinates argument
+    :param workers: number of worker processes. If None, one worker is used per available CPU.
+    :param chunk_size: number of coordinates searched per task
+    :param dtype: floating point type in which distances are compared, see nearest_neighbour_search
+    :return: tuple containing the distances to the nearest neighbours, and the indices of the nearest neighbours
+    """
+    workers = resolve_worker_count(workers)
+    if workers == 1 or coordinates.length <= chunk_size:
+        return nearest_neighbour_search(coordinates=coordinates, reference_points=reference_points, dtype=dtype)
+
+    coords_rad = to_radians(coordinates)
+    latitude, longitude = np.asarray(coords_rad.latitude), np.asarray(coords_rad.longitude)
+    chunk_starts = range(0, coordinates.length, chunk_size)
+
+    with SharedReferencePoints(reference_points) as shared_reference:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunk_starts)),
+                                 initializer=_attach_shared_reference_points,
+                                 initargs=(shared_reference.name, shared_reference.shape)) as executor:
+            results = list(executor.map(_search_chunk,
+                                        [latitude[start:start + chunk_size] for start in chunk_starts],
+                                        [longitude[start:start + chunk_size] for start in chunk_starts],
+                                        [dtype] * len(chunk_starts)))
+
+    distances = np.concatenate([r[0] for r in results])
+    indices = np.concatenate([r[1] for r in results])
+    return distances, indices
+
+
+def _attach_shared_reference_points(name: str, shape: Tuple[int, int]):
+    global _worker_shared_memory, _worker_reference_points
+    _worker_shared_memory = shared_memory.SharedMemory(name=name)
+    _worker_reference_points = np.ndarray(shape, dtype=np.float64, buffer=_worker_shared_memory.buf)
+
+
+def _search_chunk(latitude: np.array, longitude: np.array, dtype: type) -> Tuple[np.array, np.array]:
+    coords_rad = CoordinateSet(latitude=latitude, longitude=longitude)
+    refs_rad = CoordinateSet(latitude=_worker_reference_points[0], longitude=_worker_reference_points[1])
+    return nearest_neighbour_search_radians(coords_rad, refs_rad, dtype=dtype)
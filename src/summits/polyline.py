@@ -0,0 +1,59 @@
+import numpy as np
+
+from models.coordinates import CoordinateSet
+from summits.nearest_neighbour import EARTH_RADIUS
+
+POLYLINE_PRECISION = 5
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> CoordinateSet:
+    """
+    Decode an encoded polyline, such as the map.summary_polyline property of a Strava activity. See here for details
+    of the format: https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+
+    :param encoded: encoded polyline string
+    :param precision: number of decimal places encoded in the polyline coordinates
+    :return: CoordinateSet of the polyline vertices
+    """
+    values = []
+    value, shift = 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    deltas = np.array(values[:len(values) // 2 * 2], dtype=np.int64).reshape(-1, 2)
+    coordinates = np.cumsum(deltas, axis=0) / 10 ** precision
+    return CoordinateSet(latitude=coordinates[:, 0], longitude=coordinates[:, 1])
+
+
+def distance_to_polyline(points: CoordinateSet, polyline: CoordinateSet) -> np.array:
+    """
+    Calculate the distance from each point to the nearest segment of a polyline, in metres. Coordinates are projected
+    onto a plane tangent at the polyline's mean latitude, which is accurate to well within a percent over the extent of
+    an activity.
+
+    :param points: CoordinateSet of the points
+    :param polyline: CoordinateSet of the polyline vertices, in order
+    :return: array of distances in metres, one per point
+    """
+    scale = EARTH_RADIUS * 1000. * np.pi / 180.
+    cos_latitude = np.cos(np.radians(np.mean(polyline.latitude)))
+    vertex_x = np.asarray(polyline.longitude, dtype=np.float64) * scale * cos_latitude
+    vertex_y = np.asarray(polyline.latitude, dtype=np.float64) * scale
+    point_x = np.asarray(points.longitude, dtype=np.float64)[:, np.newaxis] * scale * cos_latitude
+    point_y = np.asarray(points.latitude, dtype=np.float64)[:, np.newaxis] * scale
+
+    if polyline.length == 1:
+        return np.hypot(point_x - vertex_x, point_y - vertex_y)[:, 0]
+
+    start_x, start_y = vertex_x[:-1], vertex_y[:-1]
+    dx, dy = np.diff(vertex_x), np.diff(vertex_y)
+    length_squared = dx * dx + dy * dy
+    t = ((point_x - start_x) * dx + (point_y - start_y) * dy) / np.where(length_squared > 0, length_squared, 1.)
+    t = np.clip(t, 0., 1.)
+    distances = np.hypot(point_x - (start_x + t * dx), point_y - (start_y + t * dy))
+    return distances.min(axis=1)
@@ -1,8 +1,12 @@
+import hashlib
 from dataclasses import dataclass
-from typing import List, Union
+from typing import Iterable, List, Union
 
+import numpy as np
 import pandas as pd
 
+from data_sources.summit_database import classification_bitmask_dtype, encode_classification_bitmask
+
 
 @dataclass
 class ReportedSummit:
@@ -41,6 +45,62 @@ class ReportConfiguration:
     def code_mapping(self):
         return {c.code: c.name for c in self.classes}
 
+    @property
+    def classification_codes(self) -> List[str]:
+        """
+        Classification codes in bit order: bit i of a classification bitmask denotes membership of the i-th configured
+        summit class.
+        """
+        return [c.code for c in self.classes]
+
+    @property
+    def classification_names(self) -> List[str]:
+        return [c.name for c in self.classes]
+
+    @property
+    def bitmask_dtype(self) -> type:
+        return classification_bitmask_dtype(len(self.classes))
+
+    def classification_mask(self, class_names: Iterable[str]) -> int:
+        """
+        Bitmask with the bits of the named summit classes set, e.g. classification_mask(['Munro', 'Wainwright']).
+        """
+        class_names = set(class_names)
+        return sum(1 << bit for bit, c in enumerate(self.classes) if c.name in class_names)
+
+    @property
+    def primary_mask(self) -> int:
+        return self.classification_mask(self.primary_classifications)
+
+    @property
+    def primary_top_mask(self) -> int:
+        return self.classification_mask(self.primary_top_classifications)
+
+    @property
+    def secondary_mask(self) -> int:
+        return self.classification_mask([c.name for c in self.classes if not c.is_primary])
+
+    def encode_classifications(self, summits: pd.DataFrame) -> np.array:
+        """
+        Encode the classification flag columns of a table of summits as one bitmask per summit, in this configuration's
+        bit layout.
+        """
+        return encode_classification_bitmask(summits, self.classification_codes)
+
+    def decode_classifications(self, mask: int) -> List[str]:
+        """
+        Names of the summit classes set in a bitmask, in configuration order.
+        """
+        mask = int(mask)
+        return [c.name for bit, c in enumerate(self.classes) if mask >> bit & 1]
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash of the configured summit classes and their order, used to key any cached reports.
+        """
+        return hashlib.sha256(repr(self.classes).encode()).hexdigest()
+
 
 REPORT_CONFIG = ReportConfiguration([
     # Primary classifications -always report, even if duplicated
@@ -1,19 +1,63 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Union, Any
+from typing import Dict, Iterable, List, Tuple, Union, Any
 
+from data_sources.summit_database import CLASSIFICATION_COLUMN
+from profiling.memory import profile_memory
 from summits.report_configuration import ReportConfiguration
 
 
-def generate_summit_report(summits: pd.DataFrame, config: ReportConfiguration) -> str:
-    classification_codes = config.code_mapping
-    summit_classifications = get_summit_classifications(summits=summits,
-                                                        classification_columns=list(classification_codes.keys()))
-    summit_classifications = convert_classification_codes_to_names(summit_classifications, mapping=classification_codes)
-    reduced_classifications = reduce_classification_list(summit_classifications=summit_classifications,
-                                                         report_configuration=config)
+@profile_memory('generate_summit_report')
+def generate_summit_report(summits: pd.DataFrame,
+                           config: ReportConfiguration,
+                           report_classifications: Union[Iterable[str], None] = None) -> str:
+    """
+    Generate a summary report of the given summits, by classification.
+
+    :param summits: pd.DataFrame of visited summits, including 'Name' and 'Metres' columns, and either a classification
+    bitmask column in the configuration's bit layout, or a flag column per classification code
+    :param config: ReportConfiguration object defining the reported summit classifications, and their reporting order
+    :param report_classifications: optional names of the only summit classifications to report, e.g. ['Munro',
+    'Wainwright']. If None, all configured classifications are reported.
+    :return: string summary report for the summits
+    """
+    masks = reduce_classification_masks(get_summit_classification_masks(summits, config), config)
+    if report_classifications is not None:
+        masks = masks & config.classification_mask(report_classifications)
 
-    return generate_visited_summit_report(summits, reduced_classifications, config=config)
+    return render_summit_report(names=np.asarray(summits['Name']),
+                                heights=np.asarray(summits['Metres']),
+                                masks=masks,
+                                config=config)
+
+
+def get_summit_classification_masks(summits: pd.DataFrame, config: ReportConfiguration) -> np.array:
+    """
+    Return the classification bitmask of each summit, in the configuration's bit layout. The bitmask column is used if
+    present (as loaded by a SummitReference constructed with the configuration's classification codes); otherwise the
+    bitmasks are encoded from the classification flag columns.
+    """
+    if CLASSIFICATION_COLUMN in summits.columns:
+        return summits[CLASSIFICATION_COLUMN].values.astype(config.bitmask_dtype)
+    return config.encode_classifications(summits)
+
+
+def reduce_classification_masks(masks: np.array, config: ReportConfiguration) -> np.array:
+    """
+    Bitwise equivalent of reduce_classification_list: summits in any primary classification are reported in all of
+    their primary classifications, other summits in any primary top classification are reported in all of those, and
+    the remaining summits are reported in their highest-ranked secondary classification only. The highest-ranked
+    secondary classification is the first configured, which is the lowest set secondary bit.
+
+    :param masks: array of classification bitmasks, in the configuration's bit layout
+    :param config: ReportConfiguration object defining how summit classes are prioritised for reporting
+    :return: array of reduced classification bitmasks
+    """
+    primary = masks & config.primary_mask
+    primary_top = masks & config.primary_top_mask
+    secondary = masks & config.secondary_mask
+    highest_secondary = secondary & (~secondary + 1)
+    return np.where(primary != 0, primary, np.where(primary_top != 0, primary_top, highest_secondary)).astype(masks.dtype)
 
 
 def get_summit_classifications(summits: pd.DataFrame,
@@ -115,8 +159,8 @@ def reduce_classification_list(summit_classifications: Dict[str, List[str]],
 
 
 def generate_visited_summit_report(summits_database_table: pd.DataFrame,
-                                   visited_summit_classifications: Dict[str, List[str]],
-                                   config: ReportConfiguration) -> str:
+                                   visited_summit_classifications: Dict[Any, List[str]],
+                                   config: ReportConfiguration) -> Union[str, None]:
     """
     Given a reference database table of summits, including 'Name' and 'Height' columns, and dictionary of visited
     summits and the corresponding classifications they are to be reported under, and a ReportConfiguration object
@@ -129,14 +173,59 @@ def generate_visited_summit_report(summits_database_table: pd.DataFrame,
     :param config: ReportConfig object defining the reported summit classifications, and their reporting order.
     :return: string summary report for the visited summits
     """
-    report_strings_by_classification = get_summit_descriptions_by_classification(summits_database_table,
-                                                                                 visited_summit_classifications,
-                                                                                 config)
-    return generate_report_from_classification_descriptions(report_strings_by_classification)
+    names, heights, masks = _reported_summit_arrays(summits_database_table, visited_summit_classifications, config)
+    return render_summit_report(names=names, heights=heights, masks=masks, config=config)
+
+
+def render_summit_report(names: np.array,
+                         heights: np.array,
+                         masks: np.array,
+                         config: ReportConfiguration) -> Union[str, None]:
+    """
+    Render the summary report of visited summits in a single pass. Summits are grouped by classification, in
+    configuration order, by testing each classification's bit of the reduced bitmasks, and each summit's description is
+    formatted at most once. The output is identical to generate_report_from_classification_descriptions applied to
+    get_summit_descriptions_by_classification.
+
+    :param names: array of summit names
+    :param heights: array of summit heights in metres
+    :param masks: array of reduced classification bitmasks, in the configuration's bit layout
+    :param config: ReportConfiguration object defining the reported summit classifications, and their reporting order
+    :return: string summary report, or None if no summits are reported
+    """
+    descriptions = {}
+    sections = []
+    for classification, members in group_summits_by_classification(masks, config).items():
+        for i in members:
+            if i not in descriptions:
+                descriptions[i] = format_summit_description(names[i], heights[i])
+        sections.append(classification + 's: ' + ', '.join([descriptions[i] for i in members]))
+
+    if not sections:
+        return None
+    return 'Summits visited:\n' + '\n\n'.join(sections)
+
+
+def group_summits_by_classification(masks: np.array, config: ReportConfiguration) -> Dict[str, np.array]:
+    """
+    Group summits by the classifications set in their bitmasks.
+
+    :param masks: array of classification bitmasks, in the configuration's bit layout
+    :param config: ReportConfiguration object defining the summit classifications, and their reporting order
+    :return: dictionary mapping each classification with at least one summit, in configuration order, to the positions
+    of its summits in masks
+    """
+    masks = np.asarray(masks)
+    groups = {}
+    for bit, summit_class in enumerate(config.classes):
+        members = np.flatnonzero((masks >> bit) & 1)
+        if len(members):
+            groups[summit_class.name] = members
+    return groups
 
 
 def get_summit_descriptions_by_classification(hill_report_data: pd.DataFrame,
-                                              reported_classifications: Dict[str, List[str]],
+                                              reported_classifications: Dict[Any, List[str]],
                                               config: ReportConfiguration) -> Dict[str, str]:
     """
     Given a table of summit information (including 'Name' and 'Height' columns), and a dictionary mapping summit names
@@ -151,21 +240,27 @@ def get_summit_descriptions_by_classification(hill_report_data: pd.DataFrame,
     order
     :return: Dictionary of summit classifications and their corresponding summit descriptions.
     """
-    # Make a table of Boolean flags denoting whether a summit belongs to each classification in the report
-    summit_classes = pd.DataFrame(columns=config.code_mapping.values())
-    for summit_name, reported_classes in reported_classifications.items():
-        summit_classes.loc[summit_name, :] = False
-        summit_classes.loc[summit_name, reported_classes] = True
+    names, heights, masks = _reported_summit_arrays(hill_report_data, reported_classifications, config)
+    return {classification + 's': ', '.join([format_summit_description(names[i], heights[i]) for i in members])
+            for classification, members in group_summits_by_classification(masks, config).items()}
+
+
+def _reported_summit_arrays(summits_database_table: pd.DataFrame,
+                            reported_classifications: Dict[Any, List[str]],
+                            config: ReportConfiguration) -> Tuple[np.array, np.array, np.array]:
+    """
+    Return the names, heights and classification bitmasks of the reported summits, in the order of the dictionary.
+    """
+    positions = summits_database_table.index.get_indexer(list(reported_classifications.keys()))
+    if (positions < 0).any():
+        missing = [s for s, p in zip(reported_classifications.keys(), positions) if p < 0]
+        raise KeyError(f'Summits not found in the summit table: {missing}')
 
-    summit_descriptions = {}
-    for classification in summit_classes.columns:
-        summits_of_class = summit_classes.loc[summit_classes[classification]].index
-        if summits_of_class.any():
-            descriptions_for_class = []
-            for summit in summits_of_class:
-                descriptions_for_class.append(generate_summit_description(summit, hill_report_data))
-            summit_descriptions.update({str(classification) + 's': ', '.join(descriptions_for_class)})
-    return summit_descriptions
+    masks = np.array([config.classification_mask(c) for c in reported_classifications.values()],
+                     dtype=config.bitmask_dtype)
+    return (np.asarray(summits_database_table['Name'])[positions],
+            np.asarray(summits_database_table['Metres'])[positions],
+            masks)
 
 
 def generate_report_from_classification_descriptions(classification_reports: Dict[str, str]) -> Union[str, None]:
@@ -188,15 +283,8 @@ def generate_report_from_classification_descriptions(classification_reports: Dic
     return report[:-2]
 
 
-def generate_summit_description(hill_id: int, hill_data: pd.DataFrame) -> str:
+def format_summit_description(name: str, height: float) -> str:
     """
-    Given a pd.DataFrame containing 'Name' and 'Metres' columns, and an index value, create a short summary string
-    describing the summit at that index. The string should be formatted as '<name> <height> m'.
-
-    :param hill_id: index of the targeted database entry
-    :param hill_data: database of summit data, including 'Name' and 'Height' columns
-    :return: a string describing the summit corresponding to the chosen index.
+    Create a short summary string describing a summit, formatted as '<name> (<height> m)'.
     """
-    name = hill_data.loc[hill_id, 'Name']
-    height = hill_data.loc[hill_id, 'Metres']
     return f'{name} ({height} m)'
@@ -1,15 +1,23 @@
 import numpy as np
 import pandas as pd
-from typing import Union
-from summits.nearest_neighbour import nearest_neighbour_search
+from typing import Tuple, Union
+from summits.elevation import high_ground_mask, prune_candidate_summits
+from summits.parallel import parallel_nearest_neighbour_search
+from summits.polyline import distance_to_polyline
 from data_sources.summits import SummitReference
 from models.coordinates import CoordinateSet
+from profiling.memory import profile_memory
 
 
+@profile_memory('find_visited_summits')
 def find_visited_summits(summit_reference_data: SummitReference,
                          gpx_trail: CoordinateSet,
                          distance_proximity: float = 20,
-                         search_window_width: Union[float, None] = 0.1) -> pd.DataFrame:
+                         search_window_width: Union[float, None] = 0.1,
+                         workers: Union[int, None] = 1,
+                         elev_high: Union[float, None] = None,
+                         elevation_tolerance: Union[float, None] = None,
+                         search_dtype: type = np.float64) -> pd.DataFrame:
     """
     Given a GPX trail, extract from the reference data source all entries corresponding to summits that were visited,
     where a visit is an approach within distance_proximity of the summit location.
@@ -19,20 +27,63 @@ def find_visited_summits(summit_reference_data: SummitReference,
     :param distance_proximity: maximum approach distance in metres required to qualify a visit to a summit
     :param search_window_width: A margin in decimal degrees applied around the extent of the gpx_trail coordinates, used
     to reduce the summit search area. If None, the whole of the reference dataset is searched for visited summits.
+    :param workers: number of worker processes used for the nearest-neighbour search. Defaults to a sequential search in
+    the current process. If None, one worker is used per available CPU.
+    :param elev_high: highest altitude of the activity in metres. Defaults to the highest point of gpx_trail.altitude,
+    if present.
+    :param elevation_tolerance: if given, prune the search by elevation, with this allowance in metres for altitude
+    errors: candidate summits more than elevation_tolerance above elev_high are dropped, and trail points more than
+    elevation_tolerance below the lowest remaining candidate are not searched.
+    :param search_dtype: floating point type of the nearest-neighbour search. np.float32 is faster and accurate to
+    within a metre, but a trail point almost equidistant from two summits may be matched to either.
     :return: pd.DataFrame loaded from summit reference, corresponding to the visited summits only.
     """
 
     candidate_summits = trim_search_area(summit_reference_data=summit_reference_data,
                                          gpx_trail=gpx_trail,
                                          search_window_width=search_window_width)
-    if not len(candidate_summits):
-        return candidate_summits
+    if elevation_tolerance is not None and len(candidate_summits):
+        candidate_summits, gpx_trail = prune_by_elevation(candidate_summits=candidate_summits,
+                                                          altitude_column=summit_reference_data.altitude_column,
+                                                          gpx_trail=gpx_trail,
+                                                          elev_high=elev_high,
+                                                          tolerance=elevation_tolerance)
+    return search_visited_summits(candidate_summits=candidate_summits,
+                                  summit_reference_data=summit_reference_data,
+                                  gpx_trail=gpx_trail,
+                                  distance_proximity=distance_proximity,
+                                  workers=workers,
+                                  search_dtype=search_dtype)
+
+
+def search_visited_summits(candidate_summits: pd.DataFrame,
+                           summit_reference_data: SummitReference,
+                           gpx_trail: CoordinateSet,
+                           distance_proximity: float = 20,
+                           workers: Union[int, None] = 1,
+                           search_dtype: type = np.float64) -> pd.DataFrame:
+    """
+    Nearest-neighbour search of find_visited_summits, against an already selected set of candidate summits.
+
+    :param candidate_summits: pd.DataFrame of candidate summits, loaded from summit_reference_data
+    :param summit_reference_data: Reference data source of the candidate summits, defining the coordinate columns
+    :param gpx_trail: CoordinateSet of the trail points to search
+    :param distance_proximity: maximum approach distance in metres required to qualify a visit to a summit
+    :param workers: number of worker processes used for the nearest-neighbour search
+    :param search_dtype: floating point type of the nearest-neighbour search
+    :return: pd.DataFrame of the visited candidate summits, in the order in which they were first visited
+    """
+    if not len(candidate_summits) or not gpx_trail.length:
+        return candidate_summits.iloc[:0]
 
     candidate_summit_coords = CoordinateSet(longitude=candidate_summits[summit_reference_data.longitude_column],
                                             latitude=candidate_summits[summit_reference_data.latitude_column])
 
-    nearest_hill_distance, nearest_hill_index = nearest_neighbour_search(coordinates=gpx_trail,
-                                                                         reference_points=candidate_summit_coords)
+    nearest_hill_distance, nearest_hill_index = parallel_nearest_neighbour_search(
+        coordinates=gpx_trail,
+        reference_points=candidate_summit_coords,
+        workers=workers,
+        dtype=search_dtype)
     gpx_data = pd.DataFrame({'Latitude': gpx_trail.latitude,
                              'Longitude': gpx_trail.longitude})
 
@@ -42,6 +93,35 @@ def find_visited_summits(summit_reference_data: SummitReference,
     return candidate_summits.iloc[gpx_data['nearest_hill_index']].drop_duplicates()
 
 
+def find_summits_near_polyline(summit_reference_data: SummitReference,
+                               polyline: CoordinateSet,
+                               search_radius: float,
+                               search_window_width: float = 0.1) -> pd.DataFrame:
+    """
+    Coarse summit search against a simplified route, such as a decoded Strava summary polyline. Summits are compared
+    with the polyline segments rather than its vertices, so that the widened search radius only needs to cover the
+    simplification error of the polyline, not the distance between its vertices.
+
+    :param summit_reference_data: Reference data source defining the summit information
+    :param polyline: CoordinateSet of the simplified route vertices, in order
+    :param search_radius: maximum distance in metres between a summit and the polyline for the summit to be retained
+    :param search_window_width: margin in decimal degrees applied around the extent of the polyline to reduce the
+    summit search area
+    :return: pd.DataFrame loaded from summit reference, corresponding to the summits near the polyline only
+    """
+    candidate_summits = trim_search_area(summit_reference_data=summit_reference_data,
+                                         gpx_trail=polyline,
+                                         search_window_width=search_window_width)
+    if not len(candidate_summits):
+        return candidate_summits
+
+    candidate_summit_coords = CoordinateSet(latitude=candidate_summits[summit_reference_data.latitude_column].values,
+                                            longitude=candidate_summits[summit_reference_data.longitude_column].values)
+    distances = distance_to_polyline(candidate_summit_coords, polyline)
+    return candidate_summits.loc[distances <= search_radius]
+
+
+@profile_memory('trim_search_area')
 def trim_search_area(summit_reference_data: SummitReference,
                      gpx_trail: CoordinateSet,
                      search_window_width: Union[float, None]) -> pd.DataFrame:
@@ -61,3 +141,30 @@ def trim_search_area(summit_reference_data: SummitReference,
     candidate_summits = summit_reference_data.load(latitude_window=lat_window,
                                                    longitude_window=lng_window)
     return candidate_summits
+
+
+def prune_by_elevation(candidate_summits: pd.DataFrame,
+                       altitude_column: str,
+                       gpx_trail: CoordinateSet,
+                       elev_high: Union[float, None],
+                       tolerance: float) -> Tuple[pd.DataFrame, CoordinateSet]:
+    """
+    Reduce the search to candidate summits that are not above the activity's highest point, and trail points on ground
+    high enough to reach one of them, allowing for altitude errors of up to the tolerance.
+
+    :param candidate_summits: pd.DataFrame of candidate summits
+    :param altitude_column: name of the column of summit heights in metres
+    :param gpx_trail: CoordinateSet corresponding to a GPX trail, optionally with altitudes
+    :param elev_high: highest altitude of the activity in metres. If None, the highest trail altitude is used, if any.
+    :param tolerance: allowance in metres for altitude errors
+    :return: tuple of the remaining candidate summits, and the remaining trail points
+    """
+    if elev_high is None and gpx_trail.altitude is not None and np.isfinite(gpx_trail.altitude).any():
+        elev_high = np.nanmax(gpx_trail.altitude)
+    if elev_high is not None:
+        candidate_summits = prune_candidate_summits(candidate_summits, altitude_column, elev_high, tolerance)
+
+    if gpx_trail.altitude is not None and len(candidate_summits):
+        lowest_summit_height = candidate_summits[altitude_column].min()
+        gpx_trail = gpx_trail.select(high_ground_mask(gpx_trail.altitude, lowest_summit_height, tolerance))
+    return candidate_summits, gpx_trail
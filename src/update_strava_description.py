@@ -1,45 +1,183 @@
 import json
 import logging
 import os
-from typing import List, Union
+import threading
+from typing import Dict, List, Union
 
-from summits import report_visited_summits
+from data_sources.report_store import DEFAULT_MAX_REPORTS, InMemoryReportStore, LocalFileReportStore, ReportStore
+from data_sources.summit_log import SummitLog, SummitVisit, activity_date, create_summit_log_from_env
+from summits import DEFAULT_POLYLINE_SEARCH_RADIUS, report_summit_visits, route_may_visit_summits
+from summits.report_configuration import REPORT_CONFIG
+from summits.polyline import decode_polyline
+from lambda_helpers.idempotency import EventDeduplicator, create_event_deduplicator_from_env
+from lambda_helpers.rate_limit import Priority, RateLimitedStravaClient, RateLimitExceeded, get_rate_limiter
 from lambda_helpers.strava_client import create_strava_client_from_env
+from models.coordinates import CoordinateSet
+from profiling.cpu import profile_handler
+from profiling.memory import log_memory_profile, profile_memory
 from stravaclient.models.activity import UpdatableActivity
-from weather.report import generate_weather_report_for_activity
+from weather.report import generate_weather_report_for_activity, weather_report_key
 
 logging.getLogger().setLevel(logging.INFO)
-DATABASE_FILEPATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data_sources', 'database.pkl')
+DATABASE_FILEPATH = os.environ.get('summit_database_path',
+                                   os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data_sources',
+                                                'database.pkl'))
 
+# Deduplicator shared by all invocations in this container, created on first use
+_deduplicator: Union[EventDeduplicator, None] = None
+_report_store: Union[ReportStore, None] = None
+_summit_log: Union[SummitLog, None] = None
+_summit_log_configured = False
+# Number of activity stream downloads skipped because the summary polyline passed no summits
+_skipped_stream_count = 0
+_skipped_stream_lock = threading.Lock()
 
+
+@profile_handler('update_strava_description')
 def lambda_handler(event, context):
     message = json.loads(event['Records'][0]['Sns']['Message'])
     logging.info("Event received from SNS:")
     logging.info(message)
 
-    strava_client = create_strava_client_from_env()
-    weather_api_key = os.environ.get('weather_api_key')
+    process_activity_message(message)
+    return {'statusCode': 200}
+
 
+def process_activity_message(message: Dict, strava_client=None):
+    """
+    Update the description of the activity identified in a message published by process_strava_webhook, unless the
+    message has already been processed. Backfill messages deliberately reprocess activities that may already have been
+    updated, e.g. after the summit database changes, so they are never suppressed as duplicates.
+
+    :param message: dictionary containing 'athlete_id' and 'activity_id', and optionally the 'priority' of the update,
+    e.g. 'backfill' for reprocessing past activities. Messages without a priority are treated as live activities.
+    :param strava_client: optional StravaClient to reuse. If None, a client is created from the environment.
+    """
     # Parse athlete ID and activity ID
     athlete_id = message.get('athlete_id')
     activity_id = message.get('activity_id')
-    activity_data = strava_client.get_activity(athlete_id=athlete_id, activity_id=activity_id)
+    priority = Priority.from_name(message.get('priority'))
+
+    if priority == Priority.BACKFILL:
+        try:
+            update_activity_description(athlete_id, activity_id, strava_client=strava_client, priority=priority)
+        finally:
+            log_memory_profile()
+        return
+
+    deduplicator = get_deduplicator()
+    if not deduplicator.claim(athlete_id=athlete_id, activity_id=activity_id):
+        logging.info(f'Activity {activity_id} has already been processed, exiting early... '
+                     f'({deduplicator.suppressed_count} duplicates suppressed)')
+        return
+
+    try:
+        update_activity_description(athlete_id, activity_id, strava_client=strava_client, priority=priority)
+    except Exception:
+        deduplicator.release(athlete_id=athlete_id, activity_id=activity_id)
+        raise
+    else:
+        deduplicator.complete(athlete_id=athlete_id, activity_id=activity_id)
+    finally:
+        log_memory_profile()
+
+
+@profile_memory('update_strava_description')
+def update_activity_description(athlete_id, activity_id, strava_client=None, priority: Priority = Priority.LIVE):
+    if strava_client is None:
+        strava_client = create_strava_client_from_env()
+    strava_client = RateLimitedStravaClient(strava_client, get_rate_limiter(), priority=priority)
+    weather_api_key = os.environ.get('weather_api_key')
+    weather_route_samples = int(os.environ.get('weather_route_samples', 0))
+    elevation_tolerance = get_elevation_tolerance()
+
+    with profile_memory('get_activity'):
+        activity_data = strava_client.get_activity(athlete_id=athlete_id, activity_id=activity_id)
     activity = UpdatableActivity.from_activity(activity_data)
 
-    weather_report = get_weather_report(activity_data, weather_api_key)
-    summit_report = get_summit_report(activity_id, athlete_id, strava_client)
+    report_store = get_report_store()
+    summary_route = get_summary_route(activity_data)
+    if summary_route is not None and not summary_route_may_visit_summits(summary_route):
+        route = None
+        logging.info(f'No summits near the summary route of activity {activity_id}, skipping the stream download '
+                     f'({record_skipped_stream()} streams skipped)')
+    else:
+        route = get_route(activity_id, athlete_id, strava_client, include_altitude=elevation_tolerance is not None)
+
+    weather_report = get_weather_report(activity_data, weather_api_key, report_store=report_store,
+                                        route=route if route is not None else summary_route,
+                                        route_samples=weather_route_samples)
+    summit_report = get_summit_report(route, report_store=report_store, elev_high=activity_data.get('elev_high'),
+                                      elevation_tolerance=elevation_tolerance, summit_log=get_summit_log(),
+                                      athlete_id=athlete_id, activity_data=activity_data)
     strava_report = create_strava_description([summit_report, weather_report])
 
     logging.info('Generated Strava Report')
     logging.info(strava_report)
 
-    if strava_report is not None:
+    if strava_report is not None and strava_report == activity_data.get('description'):
+        logging.info('Activity description is already up to date. Exiting...')
+    elif strava_report is not None:
         activity.description = strava_report
-        strava_client.update_activity(athlete_id=athlete_id, activity_id=activity_id, updatable_activity=activity)
+        with profile_memory('update_activity'):
+            strava_client.update_activity(athlete_id=athlete_id, activity_id=activity_id, updatable_activity=activity)
     else:
         logging.info('No data to report. Exiting...')
 
-    return {'statusCode': 200}
+
+def get_deduplicator() -> EventDeduplicator:
+    """
+    Return the EventDeduplicator used to skip repeated SNS deliveries, creating it from the environment on first use.
+    """
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = create_event_deduplicator_from_env(namespace='update_description')
+    return _deduplicator
+
+
+def set_deduplicator(deduplicator: Union[EventDeduplicator, None]):
+    global _deduplicator
+    _deduplicator = deduplicator
+
+
+def get_report_store() -> ReportStore:
+    """
+    Return the store of previously generated reports, creating it on first use. Reports are stored in the directory
+    given by the 'report_store_directory' environment variable if set, or otherwise in memory, holding at most the
+    number of reports given by 'report_store_max_reports'.
+    """
+    global _report_store
+    if _report_store is None:
+        directory = os.environ.get('report_store_directory')
+        if directory is not None:
+            _report_store = LocalFileReportStore(directory)
+        else:
+            _report_store = InMemoryReportStore(max_reports=int(os.environ.get('report_store_max_reports',
+                                                                               DEFAULT_MAX_REPORTS)))
+    return _report_store
+
+
+def set_report_store(report_store: Union[ReportStore, None]):
+    global _report_store
+    _report_store = report_store
+
+
+def get_summit_log() -> Union[SummitLog, None]:
+    """
+    Return the log of each athlete's visited summits, creating it from the environment on first use. Returns None if
+    no summit log is configured, in which case visited summits are only reported.
+    """
+    global _summit_log, _summit_log_configured
+    if not _summit_log_configured:
+        _summit_log = create_summit_log_from_env(REPORT_CONFIG.classification_codes)
+        _summit_log_configured = True
+    return _summit_log
+
+
+def set_summit_log(summit_log: Union[SummitLog, None]):
+    global _summit_log, _summit_log_configured
+    _summit_log = summit_log
+    _summit_log_configured = summit_log is not None
 
 
 def create_strava_description(reports: List[Union[str, None]]) -> Union[str, None]:
@@ -59,27 +197,135 @@ def create_strava_description(reports: List[Union[str, None]]) -> Union[str, Non
     return final_report
 
 
-def get_summit_report(activity_id, athlete_id, strava_client):
+def get_summary_route(activity_data) -> Union[CoordinateSet, None]:
+    """
+    Decode the simplified route in the map.summary_polyline property of the activity, if present.
+    """
+    summary_polyline = (activity_data.get('map') or {}).get('summary_polyline')
+    if not summary_polyline:
+        return None
+    try:
+        return decode_polyline(summary_polyline)
+    except:
+        logging.exception('Unable to decode activity summary polyline')
+        return None
+
+
+@profile_memory('summary_route_may_visit_summits')
+def summary_route_may_visit_summits(summary_route: CoordinateSet) -> bool:
+    """
+    Coarse summit search against the summary route, within the radius given by the 'polyline_search_radius'
+    environment variable. If the search fails, the activity is assumed to pass summits, so that the full route is
+    searched. A RateLimitExceeded error is raised, so that the message is released and retried.
+    """
+    search_radius = float(os.environ.get('polyline_search_radius', DEFAULT_POLYLINE_SEARCH_RADIUS))
     try:
+        return route_may_visit_summits(summary_route, database_filepath=DATABASE_FILEPATH, search_radius=search_radius)
+    except RateLimitExceeded:
+        raise
+    except:
+        logging.exception('Unable to search the summary route for summits')
+        return True
+
+
+def record_skipped_stream() -> int:
+    global _skipped_stream_count
+    with _skipped_stream_lock:
+        _skipped_stream_count += 1
+        return _skipped_stream_count
+
+
+def get_skipped_stream_count() -> int:
+    return _skipped_stream_count
+
+
+def get_elevation_tolerance() -> Union[float, None]:
+    """
+    Return the altitude error allowance in metres used to prune the summit search by elevation, from the
+    'elevation_tolerance' environment variable. If unset, the summit search is not pruned by elevation.
+    """
+    tolerance = os.environ.get('elevation_tolerance')
+    return float(tolerance) if tolerance is not None else None
+
+
+@profile_memory('get_route')
+def get_route(activity_id, athlete_id, strava_client, include_altitude: bool = False) -> Union[CoordinateSet, None]:
+    """
+    Download the GPS trail of an activity, or return None if it cannot be retrieved. A RateLimitExceeded error is
+    raised instead, so that the message is released and retried rather than reported without summits.
+    """
+    try:
+        streams = ['latlng', 'altitude'] if include_altitude else ['latlng']
         route_data = strava_client.get_activity_stream_set(athlete_id=athlete_id,
                                                            activity_id=activity_id,
-                                                           streams=['latlng'],
+                                                           streams=streams,
                                                            as_df=True)
-        summit_report = report_visited_summits(lat=route_data['lat'].values,
-                                               lng=route_data['lng'].values,
-                                               database_filepath=DATABASE_FILEPATH)
+        altitude = route_data['altitude'].values if 'altitude' in route_data.columns else None
+        return CoordinateSet(latitude=route_data['lat'].values, longitude=route_data['lng'].values, altitude=altitude)
+    except RateLimitExceeded:
+        raise
+    except:
+        logging.exception('Unable to retrieve activity route')
+        return None
+
+
+@profile_memory('get_summit_report')
+def get_summit_report(route: Union[CoordinateSet, None], report_store: Union[ReportStore, None] = None,
+                      elev_high: Union[float, None] = None, elevation_tolerance: Union[float, None] = None,
+                      summit_log: Union[SummitLog, None] = None, athlete_id=None, activity_data=None):
+    if route is None:
+        return None
+
+    try:
+        summit_report, visits = report_summit_visits(lat=route.latitude,
+                                                     lng=route.longitude,
+                                                     database_filepath=DATABASE_FILEPATH,
+                                                     report_store=report_store,
+                                                     altitude=route.altitude,
+                                                     elev_high=elev_high,
+                                                     elevation_tolerance=elevation_tolerance)
         logging.info('Generated visited summit report:')
         logging.info(summit_report)
-        return summit_report
     except:
         logging.exception('Unable to generate visited summits report')
         return None
 
+    if summit_log is not None:
+        record_summit_visits(summit_log, athlete_id, activity_data, visits)
+    return summit_report
+
 
-def get_weather_report(activity_data, weather_api_key):
+def record_summit_visits(summit_log: SummitLog, athlete_id, activity_data, visits: List[SummitVisit]):
+    """
+    Record the summits visited by an activity in the athlete's summit log. Failures are logged, so that the activity
+    description is still updated.
+    """
     try:
-        weather_report = generate_weather_report_for_activity(strava_activity=activity_data,
-                                                              api_key=weather_api_key)
+        recorded_activity = summit_log.record_activity(athlete_id=athlete_id,
+                                                       activity_id=activity_data['id'],
+                                                       activity_date=activity_date(activity_data),
+                                                       visits=visits)
+        logging.info(f'Recorded {len(recorded_activity.summit_ids)} summits of activity {activity_data["id"]}, '
+                     f'{len(recorded_activity.new_summit_ids)} of them new to athlete {athlete_id}')
+    except:
+        logging.exception('Unable to record visited summits')
+
+
+@profile_memory('get_weather_report')
+def get_weather_report(activity_data, weather_api_key, report_store: Union[ReportStore, None] = None,
+                       route: Union[CoordinateSet, None] = None, route_samples: int = 0):
+    try:
+        key = weather_report_key(activity_data, route=route, route_samples=route_samples)
+        stored_report = report_store.get(key) if report_store is not None else None
+        if stored_report is not None:
+            weather_report = stored_report['report']
+        else:
+            weather_report = generate_weather_report_for_activity(strava_activity=activity_data,
+                                                                  api_key=weather_api_key,
+                                                                  route=route,
+                                                                  route_samples=route_samples)
+            if report_store is not None:
+                report_store.put(key, {'report': weather_report})
         logging.info('Generated weather report:')
         logging.info(weather_report)
         return weather_report
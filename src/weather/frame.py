@@ -0,0 +1,116 @@
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+HOUR = np.timedelta64(1, 'h')
+
+
+@dataclass
+class WeatherFrame:
+    """
+    Columnar representation of hourly weather data. Each column is a primitive array sorted by time. Weather conditions
+    are stored as integer codes into a categorical lookup of condition descriptions.
+    """
+    time: np.array
+    temp_c: np.array
+    feelslike_c: np.array
+    wind_mph: np.array
+    gust_mph: np.array
+    condition_code: np.array
+    condition_text: np.array
+
+    def __post_init__(self):
+        self._validate_columns()
+
+    def _validate_columns(self):
+        columns = [self.time, self.temp_c, self.feelslike_c, self.wind_mph, self.gust_mph, self.condition_code]
+        assert all(len(c) == len(self.time) for c in columns)
+
+    @property
+    def length(self):
+        return len(self.time)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'WeatherFrame':
+        """
+        Create a WeatherFrame from an hourly weather history table, as returned by weatherapi.get_weather_history, with
+        a datetime index and a 'condition' column of WeatherAPI condition objects.
+        """
+        return cls._from_columns(time=df.index.values,
+                                 temp_c=df['temp_c'].values,
+                                 feelslike_c=df['feelslike_c'].values,
+                                 wind_mph=df['wind_mph'].values,
+                                 gust_mph=df['gust_mph'].values,
+                                 condition_text=[c['text'] for c in df['condition']])
+
+    @classmethod
+    def from_hourly_records(cls, hours: List[Dict]) -> 'WeatherFrame':
+        """
+        Create a WeatherFrame from the list of hourly records in a WeatherAPI history response
+        (forecast.forecastday[].hour).
+        """
+        return cls._from_columns(time=[h['time'] for h in hours],
+                                 temp_c=[h['temp_c'] for h in hours],
+                                 feelslike_c=[h['feelslike_c'] for h in hours],
+                                 wind_mph=[h['wind_mph'] for h in hours],
+                                 gust_mph=[h['gust_mph'] for h in hours],
+                                 condition_text=[h['condition']['text'] for h in hours])
+
+    @classmethod
+    def _from_columns(cls, time, temp_c, feelslike_c, wind_mph, gust_mph, condition_text) -> 'WeatherFrame':
+        time = np.asarray(time, dtype='datetime64[ns]')
+        order = np.argsort(time, kind='stable')
+        categories, codes = np.unique(np.asarray(condition_text, dtype=str), return_inverse=True)
+        return cls(time=time[order],
+                   temp_c=np.asarray(temp_c, dtype=np.float64)[order],
+                   feelslike_c=np.asarray(feelslike_c, dtype=np.float64)[order],
+                   wind_mph=np.asarray(wind_mph, dtype=np.float64)[order],
+                   gust_mph=np.asarray(gust_mph, dtype=np.float64)[order],
+                   condition_code=codes.astype(np.int32)[order],
+                   condition_text=categories)
+
+    def window(self, start_time: dt.datetime, end_time: dt.datetime) -> 'WeatherFrame':
+        """
+        Select the hours between start_time, rounded down to the hour, and end_time, rounded up to the hour, inclusive.
+        The bounds are found by binary search over the sorted time column.
+        """
+        start = np.datetime64(start_time, 'ns').astype('datetime64[h]')
+        end = np.datetime64(end_time, 'ns')
+        end_hour = end.astype('datetime64[h]')
+        if end_hour < end:
+            end_hour += HOUR
+
+        first = np.searchsorted(self.time, start.astype('datetime64[ns]'), side='left')
+        last = np.searchsorted(self.time, end_hour.astype('datetime64[ns]'), side='right')
+        return WeatherFrame(time=self.time[first:last],
+                            temp_c=self.temp_c[first:last],
+                            feelslike_c=self.feelslike_c[first:last],
+                            wind_mph=self.wind_mph[first:last],
+                            gust_mph=self.gust_mph[first:last],
+                            condition_code=self.condition_code[first:last],
+                            condition_text=self.condition_text)
+
+    def most_common_condition(self) -> str:
+        """
+        Return the most frequent condition description. Ties are resolved in favour of the condition seen first.
+        """
+        codes, first_seen, counts = np.unique(self.condition_code, return_index=True, return_counts=True)
+        candidates = np.flatnonzero(counts == counts.max())
+        mode = codes[candidates[np.argmin(first_seen[candidates])]]
+        return str(self.condition_text[mode])
+
+    @classmethod
+    def concat(cls, frames: List['WeatherFrame']) -> 'WeatherFrame':
+        """
+        Join several WeatherFrames into one, sorted by time, with a merged condition lookup.
+        """
+        return cls._from_columns(time=np.concatenate([f.time for f in frames]),
+                                 temp_c=np.concatenate([f.temp_c for f in frames]),
+                                 feelslike_c=np.concatenate([f.feelslike_c for f in frames]),
+                                 wind_mph=np.concatenate([f.wind_mph for f in frames]),
+                                 gust_mph=np.concatenate([f.gust_mph for f in frames]),
+                                 condition_text=np.concatenate([f.condition_text[f.condition_code]
+                                                                for f in frames]))
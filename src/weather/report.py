@@ -1,29 +1,75 @@
 import logging
-from typing import Dict, Tuple
+import threading
+from typing import Dict, Tuple, Union
+import numpy as np
 import pandas as pd
 import datetime as dt
-import pytz
-from tzwhere import tzwhere
 
+from data_sources.report_store import hash_strings
+from models.coordinates import CoordinateSet
+from weather.frame import WeatherFrame
+from weather.retrieval import WeatherRetriever
+from weather.route import sample_route_weather_cells
+from weather.timezones import get_timezone_resolver
 from weatherapi import get_weather_history
 
-
-def generate_weather_report_for_activity(strava_activity: Dict, api_key: str) -> str:
+# Weather retriever shared by all activities processed in this process, created on first use
+_weather_retriever: Union[WeatherRetriever, None] = None
+_weather_retriever_lock = threading.Lock()
+
+
+def generate_weather_report_for_activity(strava_activity: Dict,
+                                         api_key: str,
+                                         route: Union[CoordinateSet, None] = None,
+                                         route_samples: int = 0) -> str:
+    """
+    Generate a weather report for an activity. By default, the weather at the activity start point is reported. If a
+    route and a number of route samples are given, the weather is instead aggregated over the weather grid cells
+    visited along the route.
+
+    :param strava_activity: Strava activity metadata
+    :param api_key: WeatherAPI key
+    :param route: optional CoordinateSet of the activity GPS trail
+    :param route_samples: number of points sampled along the route. If 0, only the start point is used.
+    :return: string weather report
+    """
     start_time_local, end_time_local = get_start_end_time_local(strava_activity)
-    weather_data = download_weather_data_for_activity(strava_activity=strava_activity, api_key=api_key)
+    if route is not None and route_samples > 0:
+        weather_data = download_weather_data_along_route(route=route,
+                                                         route_samples=route_samples,
+                                                         start_time=start_time_local,
+                                                         end_time=end_time_local,
+                                                         api_key=api_key)
+    else:
+        weather_data = download_weather_data_for_activity(strava_activity=strava_activity, api_key=api_key)
     return generate_weather_report_from_weather_data(weather_data, start_time=start_time_local, end_time=end_time_local)
 
 
-def generate_weather_report_from_weather_data(df: pd.DataFrame, start_time: dt.datetime, end_time: dt.datetime) -> str:
-    start = pd.to_datetime(start_time).floor('1H')
-    end = pd.to_datetime(end_time).ceil('1H')
-    data = df.loc[(df.index >= start) & (df.index <= end)]
+def weather_report_key(strava_activity: Dict,
+                       route: Union[CoordinateSet, None] = None,
+                       route_samples: int = 0) -> str:
+    """
+    Key identifying a weather report by its inputs: the activity start location, start time and duration, and the
+    weather grid cells sampled along the route, if any.
+    """
+    cells = sample_route_weather_cells(route, route_samples) if route is not None and route_samples > 0 else []
+    return 'weather-' + hash_strings(str(strava_activity['start_latlng']),
+                                     str(strava_activity['start_date']),
+                                     str(strava_activity['elapsed_time']),
+                                     str(cells))
+
+
+def generate_weather_report_from_weather_data(df: Union[pd.DataFrame, WeatherFrame],
+                                              start_time: dt.datetime,
+                                              end_time: dt.datetime) -> str:
+    weather = df if isinstance(df, WeatherFrame) else WeatherFrame.from_dataframe(df)
+    data = weather.window(start_time, end_time)
     degree_symbol = u'\N{DEGREE SIGN}'
-    condition = data['condition'].mode().iloc[0]['text']
-    temperature = data['temp_c'].mean()
-    feels_like = data['feelslike_c'].min()
-    windspeed = data['wind_mph'].mean()
-    gust = data['gust_mph'].max()
+    condition = data.most_common_condition()
+    temperature = np.nanmean(data.temp_c)
+    feels_like = np.nanmin(data.feelslike_c)
+    windspeed = np.nanmean(data.wind_mph)
+    gust = np.nanmax(data.gust_mph)
 
     summary = (f"Weather: {condition}\n"
                f"Temperature: {temperature:.1f} {degree_symbol}C (feels like {feels_like:.1f} {degree_symbol}C)\n"
@@ -32,29 +78,61 @@ def generate_weather_report_from_weather_data(df: pd.DataFrame, start_time: dt.d
     return summary
 
 
-def download_weather_data_for_activity(strava_activity: Dict, api_key: str):
+def download_weather_data_for_activity(strava_activity: Dict, api_key: str) -> Union[WeatherFrame, None]:
     start_lat = strava_activity['start_latlng'][0]
     start_lng = strava_activity['start_latlng'][1]
     start_time_local, end_time_local = get_start_end_time_local(strava_activity)
 
     try:
-        weather_df = get_weather_history(api_key=api_key,
-                                         latitude=start_lat,
-                                         longitude=start_lng,
-                                         start_time=start_time_local,
-                                         end_time=end_time_local)
+        weather_data = get_weather_retriever(api_key).get_weather(latitude=start_lat,
+                                                                  longitude=start_lng,
+                                                                  start_time=start_time_local,
+                                                                  end_time=end_time_local)
         logging.info(f'Retrieving weather data for {start_time_local}')
     except:
         logging.info('Unable to retrieve data from WeatherAPI')
-        weather_df = None
+        weather_data = None
+
+    return weather_data
+
+
+def download_weather_data_along_route(route: CoordinateSet,
+                                      route_samples: int,
+                                      start_time: dt.datetime,
+                                      end_time: dt.datetime,
+                                      api_key: str) -> Union[WeatherFrame, None]:
+    """
+    Retrieve the hourly weather for each distinct weather grid cell visited along a route, combined into one frame.
+    """
+    cells = sample_route_weather_cells(route, samples=route_samples)
+    try:
+        logging.info(f'Retrieving weather data for {len(cells)} locations along the route')
+        return get_weather_retriever(api_key).get_weather_at_locations(cells, start_time=start_time, end_time=end_time)
+    except:
+        logging.info('Unable to retrieve data from WeatherAPI')
+        return None
+
+
+def get_weather_retriever(api_key: str) -> WeatherRetriever:
+    """
+    Return the WeatherRetriever shared by all activities processed in this process, so that concurrent requests for the
+    same location and day are coalesced.
+    """
+    global _weather_retriever
+    with _weather_retriever_lock:
+        if _weather_retriever is None or _weather_retriever.api_key != api_key:
+            if _weather_retriever is not None:
+                _weather_retriever.shutdown(wait=False)
+            _weather_retriever = WeatherRetriever(fetch_history=_fetch_weather_history, api_key=api_key)
+        return _weather_retriever
 
-    return weather_df
+
+def _fetch_weather_history(**kwargs):
+    return get_weather_history(**kwargs)
 
 
 def get_start_end_time_local(strava_activity: Dict) -> Tuple[dt.datetime, dt.datetime]:
-    start_lat = strava_activity['start_latlng'][0]
-    start_lng = strava_activity['start_latlng'][1]
-    activity_timezone = get_timezone_at_location(start_lat, start_lng)
+    activity_timezone = get_timezone_resolver().resolve(strava_activity)
     start_time = pd.to_datetime(strava_activity['start_date']).to_pydatetime()
     start_time_local = convert_utc_to_timezone_at_location(start_time, activity_timezone)
     start_time_local = start_time_local.replace(tzinfo=None)
@@ -64,9 +142,7 @@ def get_start_end_time_local(strava_activity: Dict) -> Tuple[dt.datetime, dt.dat
 
 
 def get_timezone_at_location(latitude: float, longitude: float) -> dt.tzinfo:
-    timezone_locator = tzwhere.tzwhere(forceTZ=True)
-    timezone_at_location = timezone_locator.tzNameAt(latitude=latitude, longitude=longitude, forceTZ=True)
-    return pytz.timezone(timezone_at_location)
+    return get_timezone_resolver().timezone_at_location(latitude, longitude)
 
 
 def convert_utc_to_timezone_at_location(timestamp_utc: dt.datetime, target_timezone: dt.tzinfo) -> dt.datetime:
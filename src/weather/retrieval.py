@@ -0,0 +1,171 @@
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from weather.frame import WeatherFrame
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_CACHE_SIZE = 128
+# Largest offset of local time behind UTC. A local calendar day has ended everywhere once this long has passed since
+# midnight UTC at its end.
+LATEST_DAY_END_UTC_OFFSET = dt.timedelta(hours=12)
+
+
+@dataclass(frozen=True)
+class DayRequest:
+    latitude: float
+    longitude: float
+    date: dt.date
+
+    @property
+    def start_time(self) -> dt.datetime:
+        return dt.datetime.combine(self.date, dt.time(0))
+
+    @property
+    def end_time(self) -> dt.datetime:
+        return dt.datetime.combine(self.date, dt.time(23))
+
+    def is_complete(self, now: float) -> bool:
+        """
+        Whether the requested day has ended in every timezone, so that its hourly weather history is complete.
+
+        :param now: current time, as a POSIX timestamp
+        """
+        day_end = dt.datetime.combine(self.date + dt.timedelta(days=1), dt.time(0), tzinfo=dt.timezone.utc)
+        return now >= (day_end + LATEST_DAY_END_UTC_OFFSET).timestamp()
+
+
+def plan_day_requests(latitude: float,
+                      longitude: float,
+                      start_time: dt.datetime,
+                      end_time: dt.datetime) -> List[DayRequest]:
+    """
+    Split a weather history request into one request per calendar day covered by the time range.
+
+    :param latitude: latitude of the requested location
+    :param longitude: longitude of the requested location
+    :param start_time: start of the requested time range, in local time
+    :param end_time: end of the requested time range, in local time
+    :return: list of DayRequests, in date order
+    """
+    days = (end_time.date() - start_time.date()).days + 1
+    return [DayRequest(latitude=latitude, longitude=longitude, date=start_time.date() + dt.timedelta(days=d))
+            for d in range(max(days, 1))]
+
+
+class WeatherRetriever:
+    """
+    Retrieves hourly weather history one day at a time. The days covered by a request are fetched concurrently, and
+    identical day requests that are in flight at the same time (e.g. from concurrently processed activities) share a
+    single call to the weather API. Fetched days are kept in a bounded least-recently-used cache, once the day has
+    ended; the history of a day that is still in progress is incomplete, so it is fetched again by later requests.
+
+    :param fetch_history: function with the signature of weatherapi.get_weather_history
+    :param api_key: WeatherAPI key
+    :param max_workers: maximum number of concurrent calls to the weather API
+    :param cache_size: maximum number of completed days retained in the cache
+    :param clock: function returning the current time as a POSIX timestamp
+    """
+
+    def __init__(self,
+                 fetch_history: Callable[..., pd.DataFrame],
+                 api_key: str,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 clock: Callable[[], float] = time.time):
+        self.fetch_history = fetch_history
+        self.api_key = api_key
+        self.cache_size = cache_size
+        self.clock = clock
+        self.fetch_count = 0
+        self.coalesced_count = 0
+        self.cache_hit_count = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight: Dict[DayRequest, Future] = {}
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_weather(self,
+                    latitude: float,
+                    longitude: float,
+                    start_time: dt.datetime,
+                    end_time: dt.datetime) -> WeatherFrame:
+        """
+        Retrieve the hourly weather at a location for every day covered by a time range, stitched into one frame.
+        """
+        return self.get_weather_at_locations([(latitude, longitude)], start_time, end_time)
+
+    def get_weather_at_locations(self,
+                                 locations: List[Tuple[float, float]],
+                                 start_time: dt.datetime,
+                                 end_time: dt.datetime) -> WeatherFrame:
+        """
+        Retrieve the hourly weather at several locations for every day covered by a time range. All of the location and
+        day requests are fetched concurrently, and the results are combined into one frame containing every location's
+        hourly records.
+
+        :param locations: list of (latitude, longitude) tuples
+        :param start_time: start of the requested time range, in local time
+        :param end_time: end of the requested time range, in local time
+        :return: WeatherFrame of the hourly weather at all locations, sorted by time
+        """
+        futures = [self.fetch_day(request)
+                   for latitude, longitude in locations
+                   for request in plan_day_requests(latitude, longitude, start_time, end_time)]
+        return WeatherFrame.concat([future.result() for future in futures])
+
+    def fetch_day(self, request: DayRequest) -> Future:
+        """
+        Return a future for the weather on the requested day, served from the cache if possible, or otherwise joining an
+        identical request if one is in flight.
+        """
+        with self._lock:
+            cached = self._cache.get(request)
+            if cached is not None:
+                self._cache.move_to_end(request)
+                self.cache_hit_count += 1
+                future = Future()
+                future.set_result(cached)
+                return future
+
+            future = self._in_flight.get(request)
+            if future is not None and not future.done():
+                self.coalesced_count += 1
+                return future
+
+            future = self._executor.submit(self._fetch, request)
+            self._in_flight[request] = future
+            self.fetch_count += 1
+
+        future.add_done_callback(lambda f: self._complete(request, f))
+        return future
+
+    def shutdown(self, wait: bool = True):
+        """
+        Shut down the worker threads. Requests that are already in flight are completed.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _fetch(self, request: DayRequest) -> WeatherFrame:
+        weather_df = self.fetch_history(api_key=self.api_key,
+                                        latitude=request.latitude,
+                                        longitude=request.longitude,
+                                        start_time=request.start_time,
+                                        end_time=request.end_time)
+        return WeatherFrame.from_dataframe(weather_df)
+
+    def _complete(self, request: DayRequest, future: Future):
+        with self._lock:
+            if self._in_flight.get(request) is future:
+                del self._in_flight[request]
+            if self.cache_size > 0 and future.exception() is None and request.is_complete(self.clock()):
+                self._cache[request] = future.result()
+                self._cache.move_to_end(request)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
@@ -0,0 +1,37 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from models.coordinates import CoordinateSet
+
+DEFAULT_CELL_SIZE = 0.1
+
+
+def sample_route_weather_cells(route: CoordinateSet,
+                               samples: int,
+                               cell_size: float = DEFAULT_CELL_SIZE) -> List[Tuple[float, float]]:
+    """
+    Sample evenly spaced points along a route, and map each point to the centre of the weather grid cell that contains
+    it. Points falling in the same cell are merged, so the number of cells returned depends on the area covered by the
+    route, not on the number of samples.
+
+    :param route: CoordinateSet of the route, in order
+    :param samples: number of points to sample along the route
+    :param cell_size: width of a weather grid cell, in decimal degrees
+    :return: list of distinct (latitude, longitude) cell centres, in the order they are first visited
+    """
+    if route.length == 0 or samples < 1:
+        return []
+
+    indices = np.unique(np.linspace(0, route.length - 1, samples).round().astype(int))
+    latitude = np.asarray(route.latitude, dtype=np.float64)[indices]
+    longitude = np.asarray(route.longitude, dtype=np.float64)[indices]
+
+    cell_latitude = np.round((np.floor(latitude / cell_size) + 0.5) * cell_size, 6)
+    cell_longitude = np.round((np.floor(longitude / cell_size) + 0.5) * cell_size, 6)
+
+    cells = []
+    for cell in zip(cell_latitude.tolist(), cell_longitude.tolist()):
+        if cell not in cells:
+            cells.append(cell)
+    return cells
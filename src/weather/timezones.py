@@ -0,0 +1,119 @@
+import datetime as dt
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Union
+
+import pandas as pd
+import pytz
+from tzwhere import tzwhere
+
+DEFAULT_CACHE_SIZE = 1024
+# Decimal places to which locations are rounded for the geospatial cache, approx. 110 m
+LOCATION_PRECISION = 3
+
+# Strava activity timezones are formatted as '(GMT+00:00) Europe/London'
+STRAVA_TIMEZONE_PATTERN = re.compile(r'^\(GMT[+-]\d{2}:\d{2}\)\s+(?P<name>\S+)$')
+
+
+def parse_strava_timezone(timezone: Union[str, None]) -> Union[dt.tzinfo, None]:
+    """
+    Parse the timezone property of a Strava activity, e.g. '(GMT+00:00) Europe/London'.
+
+    :param timezone: Strava activity timezone string
+    :return: the named timezone, or None if the string is missing or does not name a known timezone
+    """
+    if not isinstance(timezone, str):
+        return None
+    match = STRAVA_TIMEZONE_PATTERN.match(timezone.strip())
+    name = match.group('name') if match is not None else timezone.strip()
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return None
+
+
+class TimezoneResolver:
+    """
+    Resolves the timezone of a Strava activity. The timezone named in the activity payload is used if present and
+    consistent with the payload's utc_offset; otherwise the fixed utc_offset is used if present. Only if neither is
+    available is the timezone looked up from the start location, with a geospatial timezone locator that is loaded once
+    and a bounded cache of looked-up locations.
+
+    :param cache_size: maximum number of locations retained in the geospatial lookup cache
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.fallback_count = 0
+        self.cache_hit_count = 0
+        self._locator = None
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, strava_activity: Dict) -> dt.tzinfo:
+        """
+        Return the timezone in which the activity took place.
+        """
+        start_time = pd.to_datetime(strava_activity['start_date']).to_pydatetime()
+        utc_offset = strava_activity.get('utc_offset')
+
+        timezone = parse_strava_timezone(strava_activity.get('timezone'))
+        if timezone is not None and (utc_offset is None or _offset_at(timezone, start_time) == utc_offset):
+            return timezone
+        if utc_offset is not None:
+            return dt.timezone(dt.timedelta(seconds=utc_offset))
+
+        latitude, longitude = strava_activity['start_latlng'][0], strava_activity['start_latlng'][1]
+        logging.info(f'Activity timezone not available, looking up timezone at {latitude}, {longitude}')
+        return self.timezone_at_location(latitude, longitude)
+
+    def timezone_at_location(self, latitude: float, longitude: float) -> dt.tzinfo:
+        """
+        Look up the timezone at a location, counted as a fallback.
+        """
+        key = (round(latitude, LOCATION_PRECISION), round(longitude, LOCATION_PRECISION))
+        with self._lock:
+            self.fallback_count += 1
+            timezone = self._cache.get(key)
+            if timezone is not None:
+                self._cache.move_to_end(key)
+                self.cache_hit_count += 1
+                return timezone
+
+            if self._locator is None:
+                self._locator = tzwhere.tzwhere(forceTZ=True)
+            name = self._locator.tzNameAt(latitude=latitude, longitude=longitude, forceTZ=True)
+            timezone = pytz.timezone(name)
+
+            self._cache[key] = timezone
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return timezone
+
+
+def _offset_at(timezone: dt.tzinfo, timestamp_utc: dt.datetime) -> float:
+    if timestamp_utc.tzinfo is None:
+        timestamp_utc = timestamp_utc.replace(tzinfo=dt.timezone.utc)
+    return timestamp_utc.astimezone(timezone).utcoffset().total_seconds()
+
+
+# Resolver shared by all activities processed in this process, created on first use
+_timezone_resolver: Union[TimezoneResolver, None] = None
+_timezone_resolver_lock = threading.Lock()
+
+
+def get_timezone_resolver() -> TimezoneResolver:
+    global _timezone_resolver
+    with _timezone_resolver_lock:
+        if _timezone_resolver is None:
+            _timezone_resolver = TimezoneResolver()
+        return _timezone_resolver
+
+
+def get_timezone_fallback_count() -> int:
+    """
+    Number of activities whose timezone was looked up from their location, because the payload did not include it.
+    """
+    return get_timezone_resolver().fallback_count
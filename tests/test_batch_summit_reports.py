@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from src.batch_summit_reports import batch_summit_reports, find_activity_files, format_summary, summarise_batch
+from tests.test_data_sources.test_activity_files import write_gpx
+
+
+@pytest.fixture
+def database_filepath(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Latitude': [57.1, 57.3], 'Longitude': [-3.6, -3.8], 'Name': ['A', 'B'], 'Metres': [1000., 1200.],
+                  'M': [1, 1]}).to_pickle(filepath)
+    return filepath
+
+
+@pytest.fixture
+def activity_files(tmp_path):
+    directory = tmp_path / 'activities'
+    (directory / '2022').mkdir(parents=True)
+    (directory / 'notes.txt').write_text('')
+    (directory / 'broken.gpx').write_text('<gpx>')
+    write_gpx(directory / '2022' / 'b.gpx', [(57.3, -3.8), (57.31, -3.81)])
+    write_gpx(directory / 'a.gpx', [(57.1, -3.6), (57.2, -3.7), (57.3, -3.8)])
+    write_gpx(directory / 'c.gpx', [(50., 0.)])
+    return str(directory)
+
+
+def test_find_activity_files(activity_files, tmp_path):
+    single_file = write_gpx(tmp_path / 'single.gpx', [])
+
+    assert [p[len(activity_files) + 1:] for p in find_activity_files([activity_files])] == \
+           ['a.gpx', 'broken.gpx', 'c.gpx', '2022/b.gpx']
+    assert find_activity_files([single_file]) == [single_file]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_summit_reports(activity_files, database_filepath, workers):
+    filepaths = find_activity_files([activity_files])
+
+    file_reports = list(batch_summit_reports(filepaths, database_filepath=database_filepath, workers=workers))
+
+    assert [r.filepath for r in file_reports] == filepaths
+    reports = {r.filepath[len(activity_files) + 1:]: r for r in file_reports}
+    assert reports['a.gpx'].report == 'Summits visited:\nMunros: A (1000.0 m), B (1200.0 m)'
+    assert (reports['a.gpx'].points, reports['a.gpx'].summits) == (3, 2)
+    assert reports['2022/b.gpx'].report == 'Summits visited:\nMunros: B (1200.0 m)'
+    assert reports['c.gpx'].report is None and reports['c.gpx'].error is None
+    assert reports['broken.gpx'].error.startswith('ActivityFileError')
+
+
+def test_batch_summit_reports_reports_files_without_track_points(tmp_path, database_filepath):
+    filepath = write_gpx(tmp_path / 'empty.gpx', [])
+
+    file_report, = batch_summit_reports([filepath], database_filepath=database_filepath, workers=1)
+
+    assert (file_report.points, file_report.summits, file_report.report) == (0, 0, None)
+    assert file_report.error == 'The file contains no track points'
+
+
+def test_summarise_batch(activity_files, database_filepath):
+    file_reports = list(batch_summit_reports(find_activity_files([activity_files]), database_filepath=database_filepath,
+                                             workers=1))
+
+    summary = summarise_batch(file_reports, seconds=2.)
+
+    assert summary == {'files': 4, 'failed': 1, 'points': 6, 'summits': 3, 'seconds': 2., 'files_per_second': 2.,
+                       'points_per_second': 3.}
+    assert format_summary(summary).startswith('Processed 4 files (1 failed), 6 points and 3 summit visits')
@@ -1,4 +1,18 @@
-from src.update_strava_description import create_strava_description
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src import update_strava_description
+from src.lambda_helpers.idempotency import EventDeduplicator, InMemoryIdempotencyStore
+from src.update_strava_description import RateLimitExceeded, create_strava_description, get_route
+
+
+class MockClock:
+    def __init__(self):
+        self.time = 1000.
+
+    def __call__(self):
+        return self.time
 
 
 def test_create_strava_description_all_reports_populated():
@@ -20,3 +34,64 @@ def test_create_strava_description_all_reports_null():
     expected_result = None
     calculated_result = create_strava_description(input_data)
     assert calculated_result == expected_result
+
+
+def test_get_route_raises_rate_limit_errors():
+    strava_client = MagicMock()
+    strava_client.get_activity_stream_set.side_effect = RateLimitExceeded('Rate limit exceeded')
+
+    with pytest.raises(RateLimitExceeded):
+        get_route(activity_id=1, athlete_id=2, strava_client=strava_client)
+
+
+def test_get_route_returns_none_on_other_errors():
+    strava_client = MagicMock()
+    strava_client.get_activity_stream_set.side_effect = KeyError('latlng')
+
+    assert get_route(activity_id=1, athlete_id=2, strava_client=strava_client) is None
+
+
+def test_process_activity_message_reclaims_activity_after_crash():
+    clock = MockClock()
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(clock=clock), namespace='update_description', ttl=3600,
+                                     lease=60)
+    update_strava_description.set_deduplicator(deduplicator)
+    message = {'athlete_id': 1, 'activity_id': 2}
+    try:
+        # The handler is killed between claiming the activity and completing it, so the claim is never released
+        with patch('src.update_strava_description.update_activity_description', side_effect=SystemExit):
+            with pytest.raises(SystemExit):
+                update_strava_description.process_activity_message(message)
+
+        with patch('src.update_strava_description.update_activity_description') as update_activity:
+            update_strava_description.process_activity_message(message)
+            assert update_activity.call_count == 0
+
+            clock.time += 61
+            update_strava_description.process_activity_message(message)
+            assert update_activity.call_count == 1
+
+            # Once complete, the activity is held for the full time-to-live rather than the lease
+            clock.time += 61
+            update_strava_description.process_activity_message(message)
+            assert update_activity.call_count == 1
+    finally:
+        update_strava_description.set_deduplicator(None)
+
+
+def test_process_activity_message_does_not_deduplicate_backfill():
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='update_description')
+    update_strava_description.set_deduplicator(deduplicator)
+    live_message = {'athlete_id': 1, 'activity_id': 2}
+    backfill_message = {'athlete_id': 1, 'activity_id': 2, 'priority': 'backfill'}
+    try:
+        with patch('src.update_strava_description.update_activity_description') as update_activity:
+            update_strava_description.process_activity_message(live_message)
+            update_strava_description.process_activity_message(backfill_message)
+            update_strava_description.process_activity_message(backfill_message)
+            update_strava_description.process_activity_message(live_message)
+
+        assert update_activity.call_count == 3
+        assert deduplicator.suppressed_count == 1
+    finally:
+        update_strava_description.set_deduplicator(None)
@@ -0,0 +1,163 @@
+import struct
+import xml.etree.ElementTree as ElementTree
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from src.data_sources.activity_files import ActivityFileError, iter_gpx_points, read_activity_file
+
+GPX_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata><name>Club event</name></metadata>
+  <trk><name>Route</name>
+    <trkseg>{segment_1}</trkseg>
+    <trkseg>{segment_2}</trkseg>
+  </trk>
+</gpx>
+"""
+
+
+def track_point(latitude, longitude, elevation=None):
+    elevation = f'<ele>{elevation}</ele>' if elevation is not None else ''
+    return f'<trkpt lat="{latitude}" lon="{longitude}">{elevation}<time>2022-07-10T09:54:39Z</time></trkpt>'
+
+
+def write_gpx(filepath, points_1, points_2=()):
+    filepath.write_text(GPX_TEMPLATE.format(segment_1=''.join(track_point(*p) for p in points_1),
+                                            segment_2=''.join(track_point(*p) for p in points_2)))
+    return str(filepath)
+
+
+def fit_definition(local_message_type, global_message_number, fields, big_endian=False, developer_fields=()):
+    byte_order = '>' if big_endian else '<'
+    header = 0x40 | local_message_type | (0x20 if developer_fields else 0)
+    message = struct.pack(byte_order + 'BBBHB', header, 0, int(big_endian), global_message_number, len(fields))
+    message += b''.join(struct.pack('BBB', *field) for field in fields)
+    if developer_fields:
+        message += struct.pack('B', len(developer_fields)) + b''.join(struct.pack('BBB', *f) for f in developer_fields)
+    return message
+
+
+def fit_file(messages):
+    data = b''.join(messages)
+    header = struct.pack('<BBHI4sH', 14, 0x20, 2132, len(data), b'.FIT', 0)
+    return header + data + b'\x00\x00'
+
+
+def semicircles(degrees):
+    return int(round(degrees * 2 ** 31 / 180.))
+
+
+RECORD_FIELDS = [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (2, 2, 0x84)]
+
+
+def fit_record(local_message_type, latitude, longitude, altitude, byte_order='<', header=None):
+    header = header if header is not None else local_message_type
+    lat = semicircles(latitude) if latitude is not None else 0x7FFFFFFF
+    lng = semicircles(longitude) if longitude is not None else 0x7FFFFFFF
+    return struct.pack(byte_order + 'BIiiH', header, 1000, lat, lng, int((altitude + 500.) * 5))
+
+
+def test_read_gpx_file(tmp_path):
+    filepath = write_gpx(tmp_path / 'activity.gpx', [(57.1, -3.6, 1000.), (57.2, -3.7, 1100.5)], [(57.3, -3.8, 1200)])
+
+    trail = read_activity_file(filepath)
+
+    np.testing.assert_array_equal(trail.latitude, [57.1, 57.2, 57.3])
+    np.testing.assert_array_equal(trail.longitude, [-3.6, -3.7, -3.8])
+    np.testing.assert_array_equal(trail.altitude, [1000., 1100.5, 1200.])
+
+
+def test_read_gpx_file_without_every_elevation(tmp_path):
+    filepath = write_gpx(tmp_path / 'activity.GPX', [(57.1, -3.6, 1000.), (57.2, -3.7)])
+
+    trail = read_activity_file(filepath)
+
+    assert trail.length == 2
+    assert trail.altitude is None
+
+
+def test_read_empty_gpx_file(tmp_path):
+    trail = read_activity_file(write_gpx(tmp_path / 'activity.gpx', []))
+    assert trail.length == 0
+
+
+def test_read_gpx_file_discards_points_as_they_are_read(tmp_path):
+    filepath = write_gpx(tmp_path / 'activity.gpx', [(57. + i * 1e-4, -3.) for i in range(5000)])
+    parsed_elements = []
+    original_iterparse = ElementTree.iterparse
+
+    def iterparse(*args, **kwargs):
+        for event, element in original_iterparse(*args, **kwargs):
+            parsed_elements.append(element)
+            yield event, element
+
+    with mock.patch.object(ElementTree, 'iterparse', side_effect=iterparse):
+        points = iter_gpx_points(filepath)
+        for _ in range(4000):
+            next(points)
+        segment = next(element for element in parsed_elements if element.tag.endswith('trkseg'))
+
+        # Only the points parsed ahead of the iterator, from the file's last read buffer, remain in the segment
+        assert len(segment) < 1000
+        assert len(list(points)) == 1000
+
+
+def test_read_invalid_gpx_file(tmp_path):
+    filepath = tmp_path / 'activity.gpx'
+    filepath.write_text('<gpx><trk><trkseg><trkpt lat="57.1"></trkpt>')
+
+    with pytest.raises(ActivityFileError):
+        read_activity_file(str(filepath))
+
+
+def test_read_unsupported_activity_file(tmp_path):
+    filepath = tmp_path / 'activity.tcx'
+    filepath.write_text('')
+
+    with pytest.raises(ActivityFileError):
+        read_activity_file(str(filepath))
+
+
+def test_read_fit_file(tmp_path):
+    filepath = tmp_path / 'activity.fit'
+    filepath.write_bytes(fit_file([
+        # file_id message, which is skipped
+        fit_definition(0, 0, [(0, 1, 0x00), (4, 4, 0x86)]),
+        struct.pack('<BBI', 0, 4, 123456),
+        fit_definition(1, 20, RECORD_FIELDS),
+        # Record before a GPS fix, without a position
+        fit_record(1, None, None, 300.),
+        fit_record(1, 57.1, -3.6, 1000.),
+        # Compressed timestamp header for local message type 1
+        fit_record(1, 57.2, -3.7, 1100.4, header=0x80 | (1 << 5) | 3),
+        fit_definition(2, 20, RECORD_FIELDS, big_endian=True, developer_fields=[(0, 2, 0)]),
+        fit_record(2, 57.3, -3.8, 1200., byte_order='>') + b'\x00\x00',
+    ]))
+
+    trail = read_activity_file(str(filepath))
+
+    np.testing.assert_allclose(trail.latitude, [57.1, 57.2, 57.3], atol=1e-7)
+    np.testing.assert_allclose(trail.longitude, [-3.6, -3.7, -3.8], atol=1e-7)
+    np.testing.assert_allclose(trail.altitude, [1000., 1100.4, 1200.])
+
+
+def test_read_chained_fit_file(tmp_path):
+    filepath = tmp_path / 'activity.fit'
+    filepath.write_bytes(fit_file([fit_definition(0, 20, RECORD_FIELDS), fit_record(0, 57.1, -3.6, 1000.)]) +
+                         fit_file([fit_definition(0, 20, RECORD_FIELDS), fit_record(0, 57.2, -3.7, 1100.)]))
+
+    trail = read_activity_file(str(filepath))
+
+    np.testing.assert_allclose(trail.latitude, [57.1, 57.2], atol=1e-7)
+
+
+@pytest.mark.parametrize('content', [b'not a FIT file', fit_file([fit_record(0, 57.1, -3.6, 1000.)]),
+                                     fit_file([fit_definition(0, 20, RECORD_FIELDS)]) + b'\x00\x01'])
+def test_read_invalid_fit_file(tmp_path, content):
+    filepath = tmp_path / 'activity.fit'
+    filepath.write_bytes(content)
+
+    with pytest.raises(ActivityFileError):
+        read_activity_file(str(filepath))
@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.data_sources.report_store import InMemoryReportStore, LocalFileReportStore, hash_arrays, hash_strings
+
+
+def test_in_memory_report_store_returns_none_for_missing_key():
+    store = InMemoryReportStore()
+    assert store.get('missing') is None
+
+
+def test_in_memory_report_store_round_trip():
+    store = InMemoryReportStore()
+    store.put('key', {'report': None})
+    assert store.get('key') == {'report': None}
+
+
+def test_in_memory_report_store_discards_least_recently_used_reports():
+    store = InMemoryReportStore(max_reports=2)
+    store.put('a', {'report': 'A'})
+    store.put('b', {'report': 'B'})
+    store.get('a')
+    store.put('c', {'report': 'C'})
+
+    assert len(store) == 2
+    assert store.get('b') is None
+    assert store.get('a') == {'report': 'A'} and store.get('c') == {'report': 'C'}
+
+
+def test_local_file_report_store_persists_reports_between_instances(tmp_path):
+    LocalFileReportStore(str(tmp_path)).put('key', {'report': 'Summits visited'})
+    assert LocalFileReportStore(str(tmp_path)).get('key') == {'report': 'Summits visited'}
+    assert LocalFileReportStore(str(tmp_path)).get('other_key') is None
+
+
+def test_hash_arrays_depends_on_values_and_order():
+    lat, lng = np.array([1., 2.]), np.array([3., 4.])
+    assert hash_arrays(lat, lng) == hash_arrays(lat.copy(), lng.copy())
+    assert hash_arrays(lat, lng) != hash_arrays(lng, lat)
+    assert hash_arrays(lat, lng) != hash_arrays(lat, np.array([3., 4.000001]))
+
+
+def test_hash_strings_does_not_collide_on_concatenation():
+    assert hash_strings('ab', 'c') != hash_strings('a', 'bc')
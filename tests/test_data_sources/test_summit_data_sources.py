@@ -1,7 +1,9 @@
+import hashlib
+
 import pandas as pd
 
 from src.data_sources.summits import LocalFileSummitReference
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 
 def test_local_file_summit_reference_returns_full_dataset_when_no_filter():
@@ -27,3 +29,17 @@ def test_local_file_summit_reference_filters_dataset():
     actual_result = data_source.load(latitude_window=(2, 4))
 
     pd.testing.assert_frame_equal(expected_result, actual_result)
+
+
+def test_local_file_summit_reference_hashes_pickled_dataframe_once_per_file_version(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Latitude': [1.], 'Longitude': [2.]}).to_pickle(filepath)
+
+    with patch('data_sources.summits.hashlib.sha256', wraps=hashlib.sha256) as mock_sha256:
+        first_version = LocalFileSummitReference(filepath).version
+        assert LocalFileSummitReference(filepath).version == first_version
+        assert mock_sha256.call_count == 1
+
+        pd.DataFrame({'Latitude': [1., 3.], 'Longitude': [2., 4.]}).to_pickle(filepath)
+        assert LocalFileSummitReference(filepath).version != first_version
+        assert mock_sha256.call_count == 2
@@ -0,0 +1,242 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.build_summit_database import build_summit_database
+from src.data_sources.summit_database import (SummitDatabaseError, encode_classification_bitmask, hilbert_index,
+                                              is_summit_database_artifact, optimise_summit_table, read_summit_database,
+                                              read_summit_database_header, remap_classification_bitmask,
+                                              write_summit_database)
+from src.data_sources.summits import LocalFileSummitReference
+from src.summits import report_visited_summits
+from src.summits.report_configuration import REPORT_CONFIG
+
+
+def mock_raw_table():
+    return pd.DataFrame({'Number': [1, 2, 3, 4],
+                         'Name': ['Ben Macdui', 'Cairn Gorm', 'Scafell Pike', 'Ben Nevis'],
+                         'Metres': [1309.0, 1244.8, 978.07, 1345.0],
+                         'Latitude': [57.070368, 57.116678, 54.454222, 56.796891],
+                         'Longitude': [-3.669059, -3.643902, -3.211528, -5.003675],
+                         'Feet': [4295, 4084, 3209, 4413],
+                         'M': [1, 1, 0, 1],
+                         'Ma': [1, 1, 1, 1],
+                         'Hew': [0, 0, 1, 0]})
+
+
+def write_mock_artifact(filepath, raw, classification_codes):
+    table = optimise_summit_table(raw, classification_columns=classification_codes)
+    return write_summit_database(table, filepath, classification_codes=classification_codes)
+
+
+def test_hilbert_index_orders_nearby_points_together():
+    latitude = np.array([57.07, 54.45, 57.12, 54.46])
+    longitude = np.array([-3.67, -3.21, -3.64, -3.22])
+
+    order = np.argsort(hilbert_index(latitude, longitude))
+
+    assert {frozenset(order[:2]), frozenset(order[2:])} == {frozenset([0, 2]), frozenset([1, 3])}
+
+
+def test_hilbert_index_is_unique_per_cell():
+    n = 1 << 3
+    x, y = np.meshgrid(np.arange(n), np.arange(n))
+    longitude = (x.ravel() + 0.5) / n * 360. - 180.
+    latitude = (y.ravel() + 0.5) / n * 180. - 90.
+
+    curve = hilbert_index(latitude, longitude, order=3)
+
+    np.testing.assert_array_equal(np.sort(curve), np.arange(n * n))
+
+
+def test_optimise_summit_table_keeps_reported_columns_with_compact_types():
+    table = optimise_summit_table(mock_raw_table(), classification_columns=['M', 'Ma', 'Hew', 'Sim'])
+
+    assert list(table.columns) == ['Number', 'Name', 'Decimetres', 'Latitude', 'Longitude', 'Classification']
+    assert isinstance(table['Name'].dtype, pd.CategoricalDtype)
+    assert table['Decimetres'].dtype == np.int16
+    assert table['Latitude'].dtype == np.float32
+    assert table['Longitude'].dtype == np.float32
+    assert table['Classification'].dtype == np.uint8
+
+
+def test_optimise_summit_table_encodes_classifications_as_bitmask():
+    table = optimise_summit_table(mock_raw_table(), classification_columns=['M', 'Ma', 'Hew', 'Sim'])
+
+    masks = dict(zip(table['Name'], table['Classification']))
+    assert masks == {'Ben Macdui': 0b011, 'Cairn Gorm': 0b011, 'Scafell Pike': 0b110, 'Ben Nevis': 0b011}
+
+
+def test_encode_classification_bitmask_widens_type_with_classification_count():
+    masks = encode_classification_bitmask(mock_raw_table(), [f'class_{i}' for i in range(9)] + ['Hew'])
+
+    assert masks.dtype == np.uint16
+    np.testing.assert_array_equal(masks, [0, 0, 1 << 9, 0])
+
+
+def test_remap_classification_bitmask_translates_bit_layout():
+    masks = np.array([0b011, 0b110, 0b100], dtype=np.uint8)
+
+    remapped = remap_classification_bitmask(masks, from_codes=['M', 'Ma', 'Hew'], to_codes=['Hew', 'Sim', 'M'])
+
+    np.testing.assert_array_equal(remapped, [0b100, 0b001, 0b001])
+
+
+def test_optimise_summit_table_widens_heights_beyond_int16_range():
+    raw = mock_raw_table()
+    raw.loc[0, 'Metres'] = 8848.86
+
+    table = optimise_summit_table(raw, classification_columns=[])
+
+    assert table['Decimetres'].dtype == np.int32
+
+
+def test_optimise_summit_table_rejects_missing_columns():
+    with pytest.raises(SummitDatabaseError):
+        optimise_summit_table(mock_raw_table().drop(columns=['Latitude']), classification_columns=[])
+
+
+def test_summit_database_round_trip_preserves_reported_heights(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    version = write_mock_artifact(filepath, mock_raw_table(), ['M', 'Ma'])
+    header, loaded = read_summit_database(filepath)
+
+    assert header['version'] == version
+    assert header['rows'] == 4
+    assert header['classification_codes'] == ['M', 'Ma']
+    assert read_summit_database_header(filepath) == header
+    heights = dict(zip(loaded['Name'], loaded['Metres']))
+    assert [f'{heights[n]}' for n in ['Ben Macdui', 'Cairn Gorm', 'Scafell Pike']] == ['1309.0', '1244.8', '978.1']
+
+
+def test_summit_database_version_changes_with_content(tmp_path):
+    table = optimise_summit_table(mock_raw_table(), classification_columns=['M'])
+    first_version = write_summit_database(table, str(tmp_path / 'first.pkl'), ['M'])
+    second_version = write_summit_database(table.iloc[:3], str(tmp_path / 'second.pkl'), ['M'])
+    repeated_version = write_summit_database(table, str(tmp_path / 'repeated.pkl'), ['M'])
+
+    assert first_version != second_version
+    assert first_version == repeated_version
+
+
+def test_read_summit_database_rejects_corrupted_artifact(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    write_mock_artifact(filepath, mock_raw_table(), ['M'])
+    with open(filepath, 'r+b') as file:
+        file.seek(-1, 2)
+        last_byte = file.read(1)
+        file.seek(-1, 2)
+        file.write(bytes([last_byte[0] ^ 0xff]))
+
+    with pytest.raises(SummitDatabaseError):
+        read_summit_database(filepath)
+
+
+def test_read_summit_database_header_rejects_plain_dataframe_pickle(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    mock_raw_table().to_pickle(filepath)
+
+    with pytest.raises(SummitDatabaseError):
+        read_summit_database_header(filepath)
+
+
+def test_is_summit_database_artifact_reads_prefix_without_unpickling(tmp_path):
+    artifact_filepath = str(tmp_path / 'database.pkl')
+    legacy_filepath = str(tmp_path / 'legacy.pkl')
+    write_mock_artifact(artifact_filepath, mock_raw_table(), ['M'])
+    mock_raw_table().to_pickle(legacy_filepath)
+
+    with patch('pickle.load') as mock_load, patch('pickle.loads') as mock_loads:
+        assert is_summit_database_artifact(artifact_filepath)
+        assert not is_summit_database_artifact(legacy_filepath)
+    assert mock_load.call_count == 0
+    assert mock_loads.call_count == 0
+
+
+def test_read_summit_database_header_rejects_unsupported_format_version(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    write_mock_artifact(filepath, mock_raw_table(), ['M'])
+    with open(filepath, 'r+b') as file:
+        file.seek(len(b'SUMMITDB'))
+        file.write(b'\x00\x01')
+
+    assert is_summit_database_artifact(filepath)
+    with pytest.raises(SummitDatabaseError, match='format version: 1'):
+        read_summit_database_header(filepath)
+
+
+def test_local_file_summit_reference_detects_format_once(tmp_path):
+    filepath = str(tmp_path / 'legacy.pkl')
+    mock_raw_table().to_pickle(filepath)
+    data_source = LocalFileSummitReference(filepath)
+
+    with patch('src.data_sources.summits.is_summit_database_artifact', return_value=False) as mock_is_artifact:
+        version = data_source.version
+        data_source.load()
+        data_source.load()
+
+    assert mock_is_artifact.call_count == 1
+    assert version == data_source.version
+
+
+def test_local_file_summit_reference_loads_artifact_with_header_version(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    version = write_mock_artifact(filepath, mock_raw_table(), ['M'])
+
+    data_source = LocalFileSummitReference(filepath)
+    candidates = data_source.load(latitude_window=(57., 57.2), longitude_window=(-4., -3.))
+
+    assert data_source.version == version
+    assert sorted(candidates['Name']) == ['Ben Macdui', 'Cairn Gorm']
+
+
+def test_local_file_summit_reference_translates_artifact_classification_layout(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    write_mock_artifact(filepath, mock_raw_table(), ['M', 'Ma', 'Hew'])
+
+    summits = LocalFileSummitReference(filepath, classification_codes=['Hew', 'M']).load()
+
+    masks = dict(zip(summits['Name'], summits['Classification']))
+    assert masks == {'Ben Macdui': 0b10, 'Cairn Gorm': 0b10, 'Scafell Pike': 0b01, 'Ben Nevis': 0b10}
+
+
+def test_local_file_summit_reference_encodes_dataframe_classification_flags(tmp_path):
+    filepath = str(tmp_path / 'database.pkl')
+    mock_raw_table().to_pickle(filepath)
+
+    summits = LocalFileSummitReference(filepath, classification_codes=['Hew', 'M']).load()
+
+    np.testing.assert_array_equal(summits['Classification'], [0b10, 0b10, 0b01, 0b10])
+    assert 'M' in summits.columns
+
+
+def test_local_file_summit_reference_reports_match_legacy_pickle(tmp_path):
+    legacy_filepath = str(tmp_path / 'legacy.pkl')
+    artifact_filepath = str(tmp_path / 'artifact.pkl')
+    raw = mock_raw_table()
+    raw.to_pickle(legacy_filepath)
+    write_mock_artifact(artifact_filepath, raw, REPORT_CONFIG.classification_codes)
+    lat = np.array([57.070368, 57.09, 57.116678])
+    lng = np.array([-3.669059, -3.65, -3.643902])
+
+    legacy_report = report_visited_summits(lat=lat, lng=lng, database_filepath=legacy_filepath)
+    artifact_report = report_visited_summits(lat=lat, lng=lng, database_filepath=artifact_filepath)
+
+    assert 'Cairn Gorm (1244.8 m)' in artifact_report
+    assert artifact_report == legacy_report
+
+
+def test_build_summit_database_reads_hills_database_csv(tmp_path):
+    csv_filepath = str(tmp_path / 'hills.csv')
+    output_filepath = str(tmp_path / 'database.pkl')
+    mock_raw_table().to_csv(csv_filepath, index=False, encoding='latin-1')
+
+    version = build_summit_database(csv_filepath, output_filepath)
+    header, table = read_summit_database(output_filepath)
+
+    assert header['version'] == version
+    assert 'Feet' not in table.columns
+    assert header['classification_codes'] == REPORT_CONFIG.classification_codes
+    assert sorted(table['Number']) == [1, 2, 3, 4]
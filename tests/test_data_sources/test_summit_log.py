@@ -0,0 +1,197 @@
+import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+
+from src.data_sources.summit_log import DynamoDBSummitLog, SQLiteSummitLog, SummitVisit, activity_date, \
+    create_summit_log_from_env, summit_visits
+
+CLASSIFICATION_CODES = ['M', 'MT', 'W']
+MUNRO, MUNRO_TOP, WAINWRIGHT = 1, 2, 4
+
+
+@pytest.fixture(params=['memory', 'file'])
+def summit_log(request, tmp_path):
+    database = ':memory:' if request.param == 'memory' else str(tmp_path / 'summit_log.sqlite')
+    log = SQLiteSummitLog(database, classification_codes=CLASSIFICATION_CODES)
+    yield log
+    log.close()
+
+
+def test_record_activity_flags_first_ascents(summit_log):
+    first = summit_log.record_activity(1, 10, datetime.date(2022, 7, 10),
+                                       [SummitVisit(100, MUNRO), SummitVisit(101, MUNRO_TOP)])
+    second = summit_log.record_activity(1, 11, datetime.date(2022, 7, 14),
+                                        [SummitVisit(100, MUNRO), SummitVisit(102, MUNRO)])
+
+    assert first.new_summit_ids == [100, 101]
+    assert second.summit_ids == [100, 102]
+    assert second.new_summit_ids == [102]
+    assert not second.already_recorded
+
+
+def test_classification_totals_count_distinct_summits_per_period(summit_log):
+    summit_log.record_activity(1, 10, datetime.date(2021, 6, 1),
+                               [SummitVisit(100, MUNRO), SummitVisit(200, WAINWRIGHT)])
+    summit_log.record_activity(1, 11, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO), SummitVisit(101, MUNRO)])
+    summit_log.record_activity(1, 12, datetime.date(2022, 7, 14), [SummitVisit(101, MUNRO | MUNRO_TOP)])
+    summit_log.record_activity(2, 20, datetime.date(2022, 7, 14), [SummitVisit(100, MUNRO)])
+
+    assert summit_log.classification_totals(1) == {'M': 2, 'W': 1}
+    assert summit_log.classification_totals(1, year=2022) == {'M': 2}
+    assert summit_log.classification_totals(1, year=2021) == {'M': 1, 'W': 1}
+    assert summit_log.classification_totals(1, year=2020) == {}
+    assert summit_log.classification_totals(2) == {'M': 1}
+
+
+def test_visited_summit_ids_by_year_and_classification(summit_log):
+    summit_log.record_activity(1, 10, datetime.date(2021, 6, 1),
+                               [SummitVisit(100, MUNRO), SummitVisit(200, WAINWRIGHT)])
+    summit_log.record_activity(1, 11, datetime.date(2022, 7, 10),
+                               [SummitVisit(101, MUNRO), SummitVisit(201, WAINWRIGHT)])
+
+    assert summit_log.visited_summit_ids(1) == [100, 101, 200, 201]
+    assert summit_log.visited_summit_ids(1, year=2022, classification_code='M') == [101]
+    assert summit_log.visited_summit_ids(1, classification_code='W') == [200, 201]
+    assert summit_log.visited_summit_ids(2) == []
+
+
+def test_recording_an_activity_again_leaves_the_log_unchanged(summit_log):
+    summit_log.record_activity(1, 10, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO)])
+    repeated = summit_log.record_activity(1, 10, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO)])
+
+    assert repeated.already_recorded
+    assert repeated.summit_ids == [100] and repeated.new_summit_ids == [100]
+    assert summit_log.summit_ascents(1, [100])[100].ascents == 1
+    assert summit_log.classification_totals(1) == {'M': 1}
+
+
+def test_earlier_activity_recorded_later_becomes_first_ascent(summit_log):
+    summit_log.record_activity(1, 11, datetime.date(2022, 7, 14), [SummitVisit(100, MUNRO)])
+    backfilled = summit_log.record_activity(1, 10, datetime.date(2020, 5, 1), [SummitVisit(100, MUNRO)])
+    later = summit_log.record_activity(1, 12, datetime.date(2023, 1, 1), [SummitVisit(100, MUNRO)])
+
+    ascents = summit_log.summit_ascents(1, [100, 101])
+    assert backfilled.new_summit_ids == [100]
+    assert later.new_summit_ids == []
+    assert list(ascents) == [100]
+    assert ascents[100].first_activity_id == 10
+    assert ascents[100].first_ascent_date == datetime.date(2020, 5, 1)
+    assert ascents[100].ascents == 3
+
+
+def test_summit_log_file_persists_between_instances(tmp_path):
+    database = str(tmp_path / 'summit_log.sqlite')
+    SQLiteSummitLog(database, classification_codes=CLASSIFICATION_CODES).record_activity(
+        1, 10, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO)])
+
+    reopened = SQLiteSummitLog(database, classification_codes=CLASSIFICATION_CODES)
+    assert reopened.classification_totals(1) == {'M': 1}
+    assert reopened.record_activity(1, 11, datetime.date(2022, 7, 11), [SummitVisit(100, MUNRO)]).new_summit_ids == []
+
+
+def test_summit_visits_from_visited_summit_table():
+    summits = pd.DataFrame({'Number': np.array([100, 101], dtype=np.int32), 'Name': ['A', 'B'],
+                            'Classification': np.array([MUNRO, MUNRO_TOP], dtype=np.uint8)})
+
+    assert summit_visits(summits) == [SummitVisit(100, MUNRO), SummitVisit(101, MUNRO_TOP)]
+    assert summit_visits(summits.drop(columns='Number')) == []
+
+
+def test_activity_date_uses_local_start_date():
+    assert activity_date({'start_date': '2022-12-31T23:30:00Z',
+                          'start_date_local': '2023-01-01T00:30:00Z'}) == datetime.date(2023, 1, 1)
+    assert activity_date({'start_date': '2022-12-31T23:30:00Z'}) == datetime.date(2022, 12, 31)
+
+
+def mock_summit_log_table(items):
+    table = MagicMock()
+    table.name = 'summit_log'
+    table.get_item.side_effect = lambda Key, ConsistentRead: ({'Item': items[Key['item_key']]}
+                                                              if Key['item_key'] in items else {})
+    return table
+
+
+def test_dynamodb_summit_log_records_activity_with_conditional_writes():
+    table = mock_summit_log_table({'ascent:100': {'classification_mask': MUNRO, 'first_activity_id': 10,
+                                                  'first_ascent_date': '2022-07-10', 'activity_ids': {10}},
+                                   'ascent:101': {'classification_mask': MUNRO, 'first_activity_id': 9,
+                                                  'first_ascent_date': '2021-01-01', 'activity_ids': {9, 10}}})
+    summit_log = DynamoDBSummitLog(table, classification_codes=CLASSIFICATION_CODES)
+
+    recorded = summit_log.record_activity(1, 10, datetime.date(2022, 7, 10),
+                                          [SummitVisit(100, MUNRO), SummitVisit(101, MUNRO | MUNRO_TOP)])
+
+    assert recorded.summit_ids == [100, 101] and recorded.new_summit_ids == [100]
+    assert table.put_item.call_args.kwargs['Item'] == {'athlete_key': 'athlete:1', 'item_key': 'activity:10',
+                                                       'activity_date': '2022-07-10', 'summit_ids': [100, 101]}
+    ascent_updates = [c.kwargs for c in table.update_item.call_args_list if c.kwargs['Key']['item_key'] == 'ascent:101']
+    assert ascent_updates[0]['ConditionExpression'] == 'NOT contains(activity_ids, :activity_id)'
+    assert ascent_updates[1]['ExpressionAttributeValues'][':date'] == '2022-07-10'
+
+    # The summit is added to each period, all-time and 2022, with the period totals of each of its classifications
+    transactions = [c.kwargs['TransactItems'] for c in table.meta.client.transact_write_items.call_args_list]
+    assert [t[0]['Put']['Item']['item_key']['S'] for t in transactions] == [
+        'period:all:summit:100', 'period:2022:summit:100', 'period:all:summit:101', 'period:2022:summit:101']
+    assert [u['Update']['Key']['item_key']['S'] for u in transactions[3][1:]] == ['totals:2022:M', 'totals:2022:MT']
+    assert table.update_item.call_args.kwargs['ExpressionAttributeValues'] == {':complete': True}
+
+
+def test_dynamodb_summit_log_does_not_count_summit_twice():
+    table = mock_summit_log_table({'ascent:100': {'classification_mask': MUNRO, 'first_activity_id': 9,
+                                                  'first_ascent_date': '2022-01-01', 'activity_ids': {9, 10}}})
+    # The ascent has already been counted, and is not the first, and the summit is already in both periods, e.g. when
+    # a recording that failed part way through is resumed
+    condition_failed = ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+    table.update_item.side_effect = [condition_failed, condition_failed, {}]
+    table.meta.client.transact_write_items.side_effect = ClientError(
+        {'Error': {'Code': 'TransactionCanceledException'}}, 'TransactWriteItems')
+    summit_log = DynamoDBSummitLog(table, classification_codes=CLASSIFICATION_CODES)
+
+    recorded = summit_log.record_activity(1, 10, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO)])
+
+    assert recorded.new_summit_ids == [] and not recorded.already_recorded
+    assert table.meta.client.transact_write_items.call_count == 2
+
+
+def test_dynamodb_summit_log_leaves_completed_activity_unchanged():
+    table = mock_summit_log_table({'activity:10': {'activity_date': '2022-07-10', 'summit_ids': [100],
+                                                   'complete': True},
+                                   'ascent:100': {'classification_mask': MUNRO, 'first_activity_id': 10,
+                                                  'first_ascent_date': '2022-07-10', 'activity_ids': {10}}})
+    summit_log = DynamoDBSummitLog(table, classification_codes=CLASSIFICATION_CODES)
+
+    repeated = summit_log.record_activity(1, 10, datetime.date(2022, 7, 10), [SummitVisit(100, MUNRO)])
+
+    assert repeated.already_recorded and repeated.new_summit_ids == [100]
+    table.put_item.assert_not_called()
+    table.update_item.assert_not_called()
+    table.meta.client.transact_write_items.assert_not_called()
+
+
+def test_dynamodb_summit_log_reads_totals_and_visited_summits():
+    table = MagicMock()
+    table.query.side_effect = [{'Items': [{'item_key': 'totals:2022:M', 'summits': 2},
+                                          {'item_key': 'totals:2022:MT', 'summits': 0}]},
+                               {'Items': [{'summit_id': 101, 'classification_mask': MUNRO_TOP}],
+                                'LastEvaluatedKey': {'item_key': 'period:all:summit:101'}},
+                               {'Items': [{'summit_id': 100, 'classification_mask': MUNRO}]}]
+    summit_log = DynamoDBSummitLog(table, classification_codes=CLASSIFICATION_CODES)
+
+    assert summit_log.classification_totals(1, year=2022) == {'M': 2}
+    assert summit_log.visited_summit_ids(1, classification_code='M') == [100]
+    assert table.query.call_args.kwargs['ExclusiveStartKey'] == {'item_key': 'period:all:summit:101'}
+    assert table.query.call_args.kwargs['ExpressionAttributeValues'] == {':athlete': 'athlete:1',
+                                                                         ':prefix': 'period:all:summit:'}
+
+
+def test_sqlite_summit_log_is_not_created_on_lambda(monkeypatch, tmp_path):
+    monkeypatch.delenv('summit_log_table_name', raising=False)
+    monkeypatch.setenv('summit_log_filepath', str(tmp_path / 'summit_log.sqlite'))
+    assert isinstance(create_summit_log_from_env(CLASSIFICATION_CODES), SQLiteSummitLog)
+
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'update_strava_description')
+    assert create_summit_log_from_env(CLASSIFICATION_CODES) is None
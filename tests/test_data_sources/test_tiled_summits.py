@@ -0,0 +1,163 @@
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_sources.summit_database import optimise_summit_table, read_summit_database, write_summit_database
+from src.data_sources.summits import LocalFileSummitReference, open_summit_reference
+from src.data_sources.tiled_summits import TileCache, TiledSummitReference, read_tiled_summit_index, \
+    write_tiled_summit_database
+from src.summits import report_visited_summits
+from src.summits.report_configuration import REPORT_CONFIG
+
+CODES = REPORT_CONFIG.classification_codes
+
+
+def mock_raw_table(n=2000, seed=0):
+    # Summits spread over the Alps and Norway, either side of the prime meridian
+    rng = np.random.default_rng(seed)
+    latitude = np.concatenate([rng.uniform(45., 48., n // 2), rng.uniform(60., 63., n - n // 2)])
+    longitude = np.concatenate([rng.uniform(-1., 12., n // 2), rng.uniform(5., 9., n - n // 2)])
+    raw = pd.DataFrame({'Number': np.arange(n),
+                        'Name': [f'Peak {i}' for i in range(n)],
+                        'Metres': np.round(rng.uniform(500., 4800., n), 1),
+                        'Latitude': latitude,
+                        'Longitude': longitude})
+    for code in CODES:
+        raw[code] = rng.integers(0, 2, n)
+    return raw
+
+
+@pytest.fixture
+def summit_table():
+    return optimise_summit_table(mock_raw_table(), classification_columns=CODES)
+
+
+def sort_summits(df):
+    return df.sort_values('Number').reset_index(drop=True)
+
+
+def test_tiled_database_contains_every_summit_once(tmp_path, summit_table):
+    write_tiled_summit_database(summit_table, str(tmp_path), classification_codes=CODES, tile_size=1.)
+    index = read_tiled_summit_index(str(tmp_path))
+
+    assert sum(tile['rows'] for tile in index['tiles'].values()) == len(summit_table)
+    assert len(index['tiles']) == len(os.listdir(tmp_path)) - 1
+    assert len(sort_summits(TiledSummitReference(str(tmp_path)).load())) == len(summit_table)
+
+
+def test_tiled_reference_loads_same_summits_as_single_file(tmp_path, summit_table):
+    write_summit_database(summit_table, str(tmp_path / 'database.pkl'), classification_codes=CODES)
+    write_tiled_summit_database(summit_table, str(tmp_path / 'tiles'), classification_codes=CODES, tile_size=0.5)
+    single_file_reference = LocalFileSummitReference(str(tmp_path / 'database.pkl'), classification_codes=CODES)
+    tiled_reference = TiledSummitReference(str(tmp_path / 'tiles'), classification_codes=CODES, tile_cache=TileCache())
+
+    for latitude_window, longitude_window in [((46.2, 46.9), (-0.4, 1.3)),
+                                              ((61., 61.01), (6.5, 6.51)),
+                                              ((50., 55.), (0., 10.)),
+                                              ((45., 63.), (-1., 12.))]:
+        expected_result = sort_summits(single_file_reference.load(latitude_window, longitude_window))
+        calculated_result = sort_summits(tiled_reference.load(latitude_window, longitude_window))
+
+        pd.testing.assert_frame_equal(calculated_result, expected_result, check_categorical=False)
+
+
+def test_tiled_reference_only_loads_tiles_in_search_window(tmp_path, summit_table):
+    write_tiled_summit_database(summit_table, str(tmp_path), classification_codes=CODES, tile_size=1.)
+    tile_cache = TileCache()
+    reference = TiledSummitReference(str(tmp_path), tile_cache=tile_cache)
+
+    assert reference.tiles_in_window((46.2, 46.9), (7.5, 8.5)) == ['+046+0007.pkl', '+046+0008.pkl']
+    reference.load((46.2, 46.9), (7.5, 8.5))
+
+    assert len(tile_cache) == 2
+    assert tile_cache.miss_count == 2
+
+
+def test_warm_reads_tiled_index_without_loading_tiles(tmp_path, summit_table):
+    write_tiled_summit_database(summit_table, str(tmp_path), classification_codes=CODES, tile_size=1.)
+    tile_cache = TileCache()
+    reference = TiledSummitReference(str(tmp_path), tile_cache=tile_cache)
+
+    reference.warm()
+
+    assert reference.version == read_tiled_summit_index(str(tmp_path))['version']
+    assert len(tile_cache) == 0
+
+
+def test_warm_loads_single_file_table_once(tmp_path, summit_table):
+    write_summit_database(summit_table, str(tmp_path / 'database.pkl'), classification_codes=CODES)
+    reference = LocalFileSummitReference(str(tmp_path / 'database.pkl'), classification_codes=CODES)
+
+    with patch('src.data_sources.summits.read_summit_database',
+               wraps=read_summit_database) as mock_read_summit_database:
+        reference.warm()
+        reference.load((46.2, 46.9), (7.5, 8.5))
+
+    assert mock_read_summit_database.call_count == 1
+
+
+def test_tiled_reference_returns_empty_table_outside_dataset(tmp_path, summit_table):
+    write_tiled_summit_database(summit_table, str(tmp_path), classification_codes=CODES, tile_size=1.)
+
+    calculated_result = TiledSummitReference(str(tmp_path), tile_cache=TileCache()).load((-10., -9.), (20., 21.))
+
+    assert len(calculated_result) == 0
+    assert list(calculated_result.columns) == ['Number', 'Name', 'Latitude', 'Longitude', 'Classification', 'Metres']
+
+
+def test_tile_cache_evicts_least_recently_used_tiles(tmp_path, summit_table):
+    write_tiled_summit_database(summit_table, str(tmp_path), classification_codes=CODES, tile_size=1.)
+    tile_cache = TileCache(max_tiles=2)
+    reference = TiledSummitReference(str(tmp_path), tile_cache=tile_cache)
+
+    reference.load((46.5, 46.6), (7.5, 7.6))
+    reference.load((46.5, 46.6), (8.5, 8.6))
+    reference.load((46.5, 46.6), (7.5, 7.6))
+    reference.load((46.5, 46.6), (9.5, 9.6))
+    assert len(tile_cache) == 2
+    assert tile_cache.hit_count == 1
+
+    reference.load((46.5, 46.6), (7.5, 7.6))
+    assert tile_cache.hit_count == 2
+    reference.load((46.5, 46.6), (8.5, 8.6))
+    assert tile_cache.miss_count == 4
+
+
+def test_tiled_database_version_changes_with_content(tmp_path, summit_table):
+    first_version = write_tiled_summit_database(summit_table, str(tmp_path / 'a'), classification_codes=CODES)
+    second_version = write_tiled_summit_database(summit_table.iloc[1:], str(tmp_path / 'b'),
+                                                 classification_codes=CODES)
+
+    assert first_version == TiledSummitReference(str(tmp_path / 'a')).version
+    assert first_version != second_version
+
+
+def test_read_tiled_summit_index_rejects_other_directories(tmp_path):
+    # SummitDatabaseError, as imported by the tiled_summits module
+    with pytest.raises(Exception, match='is not a tiled summit database'):
+        read_tiled_summit_index(str(tmp_path))
+
+
+def test_open_summit_reference_selects_reference_by_path(tmp_path, summit_table):
+    write_summit_database(summit_table, str(tmp_path / 'database.pkl'), classification_codes=CODES)
+    write_tiled_summit_database(summit_table, str(tmp_path / 'tiles'), classification_codes=CODES)
+
+    assert isinstance(open_summit_reference(str(tmp_path / 'database.pkl')), LocalFileSummitReference)
+    assert type(open_summit_reference(str(tmp_path / 'tiles'))).__name__ == TiledSummitReference.__name__
+
+
+def test_report_visited_summits_with_tiled_database(tmp_path, summit_table):
+    write_summit_database(summit_table, str(tmp_path / 'database.pkl'), classification_codes=CODES)
+    write_tiled_summit_database(summit_table, str(tmp_path / 'tiles'), classification_codes=CODES)
+    summits = summit_table.iloc[[5, 1500]]
+    lat = np.repeat(summits['Latitude'].values.astype(np.float64), 3)
+    lng = np.repeat(summits['Longitude'].values.astype(np.float64), 3)
+
+    expected_result = report_visited_summits(lat, lng, str(tmp_path / 'database.pkl'))
+    calculated_result = report_visited_summits(lat, lng, str(tmp_path / 'tiles'))
+
+    assert calculated_result is not None
+    assert calculated_result == expected_result
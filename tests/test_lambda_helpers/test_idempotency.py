@@ -0,0 +1,155 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.lambda_helpers.idempotency import InMemoryIdempotencyStore, LocalFileIdempotencyStore, \
+    DynamoDBIdempotencyStore, EventDeduplicator
+
+
+class MockClock:
+    def __init__(self):
+        self.time = 1000.
+
+    def __call__(self):
+        return self.time
+
+
+def test_in_memory_store_rejects_repeated_key():
+    store = InMemoryIdempotencyStore()
+    assert store.add('a', ttl=60)
+    assert not store.add('a', ttl=60)
+    assert store.add('b', ttl=60)
+
+
+def test_in_memory_store_accepts_key_after_expiry():
+    clock = MockClock()
+    store = InMemoryIdempotencyStore(clock=clock)
+    assert store.add('a', ttl=60)
+    clock.time += 61
+    assert store.add('a', ttl=60)
+
+
+def test_local_file_store_persists_keys_between_instances(tmp_path):
+    filepath = str(tmp_path / 'idempotency.json')
+    assert LocalFileIdempotencyStore(filepath).add('a', ttl=60)
+    assert not LocalFileIdempotencyStore(filepath).add('a', ttl=60)
+
+    LocalFileIdempotencyStore(filepath).remove('a')
+    assert LocalFileIdempotencyStore(filepath).add('a', ttl=60)
+
+
+def test_local_file_store_claims_concurrently_from_separate_instances(tmp_path):
+    filepath = str(tmp_path / 'idempotency.json')
+    barrier = threading.Barrier(8)
+
+    def claim_keys(thread_index: int):
+        # Each thread uses its own store instance, as separate processes would
+        store = LocalFileIdempotencyStore(filepath)
+        barrier.wait()
+        return [store.add(f'{thread_index}:{key_index}', ttl=60) for key_index in range(25)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(claim_keys, range(8)))
+
+    assert all(all(claimed) for claimed in results)
+    store = LocalFileIdempotencyStore(filepath)
+    assert not any(store.add(f'{thread_index}:{key_index}', ttl=60)
+                   for thread_index in range(8) for key_index in range(25))
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
+
+
+def test_dynamodb_store_returns_false_when_conditional_write_fails():
+    table = MagicMock()
+    table.put_item.side_effect = ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+    store = DynamoDBIdempotencyStore(table, clock=MockClock())
+
+    assert not store.add('a', ttl=60)
+    assert table.put_item.call_args.kwargs['Item'] == {'idempotency_key': 'a', 'expires_at': 1060}
+
+
+def test_dynamodb_store_put_replaces_expiry_time():
+    table = MagicMock()
+    store = DynamoDBIdempotencyStore(table, clock=MockClock())
+
+    store.put('a', ttl=3600)
+    assert table.put_item.call_args.kwargs == {'Item': {'idempotency_key': 'a', 'expires_at': 4600}}
+
+
+def test_dynamodb_store_raises_other_client_errors():
+    table = MagicMock()
+    table.put_item.side_effect = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'PutItem')
+    store = DynamoDBIdempotencyStore(table)
+
+    with pytest.raises(ClientError):
+        store.add('a', ttl=60)
+
+
+def test_event_deduplicator_counts_suppressed_events():
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='test')
+
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+    assert not deduplicator.claim(athlete_id=1, activity_id=2)
+    assert not deduplicator.claim(athlete_id=1, activity_id=2)
+    assert deduplicator.claim(athlete_id=1, activity_id=3)
+    assert deduplicator.suppressed_count == 2
+
+
+def test_event_deduplicator_namespaces_do_not_collide():
+    store = InMemoryIdempotencyStore()
+    webhook = EventDeduplicator(store, namespace='webhook')
+    update = EventDeduplicator(store, namespace='update_description')
+
+    assert webhook.claim(athlete_id=1, activity_id=2)
+    assert update.claim(athlete_id=1, activity_id=2)
+
+
+def test_event_deduplicator_release_allows_retry():
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='test')
+
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+    deduplicator.release(athlete_id=1, activity_id=2)
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+
+
+def test_event_deduplicator_lease_expires_unless_completed():
+    clock = MockClock()
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(clock=clock), namespace='test', ttl=3600, lease=60)
+
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+    assert not deduplicator.claim(athlete_id=1, activity_id=2)
+    clock.time += 61
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+
+    deduplicator.complete(athlete_id=1, activity_id=2)
+    clock.time += 61
+    assert not deduplicator.claim(athlete_id=1, activity_id=2)
+    clock.time += 3600
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
+
+
+def test_local_file_store_put_replaces_expiry_time(tmp_path):
+    clock = MockClock()
+    filepath = str(tmp_path / 'idempotency.json')
+    assert LocalFileIdempotencyStore(filepath, clock=clock).add('a', ttl=60)
+
+    LocalFileIdempotencyStore(filepath, clock=clock).put('a', ttl=3600)
+    clock.time += 61
+    assert not LocalFileIdempotencyStore(filepath, clock=clock).add('a', ttl=60)
+
+
+def test_event_deduplicator_claims_each_event_once_across_threads():
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='test')
+    barrier = threading.Barrier(8)
+
+    def claim_events():
+        barrier.wait()
+        return [deduplicator.claim(athlete_id=1, activity_id=activity_id) for activity_id in range(200)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: claim_events(), range(8)))
+
+    assert sum(sum(claimed) for claimed in results) == 200
+    assert deduplicator.suppressed_count == 7 * 200
@@ -0,0 +1,79 @@
+import json
+import os
+
+from src.lambda_helpers.message_queue import FileQueue, InMemoryQueue
+
+
+def test_in_memory_queue_delivers_messages_in_order():
+    queue = InMemoryQueue()
+    queue.publish(Message='a')
+    queue.publish(Message='b')
+
+    assert queue.receive(timeout=0.1).body == 'a'
+    assert queue.receive(timeout=0.1).body == 'b'
+    assert queue.receive(timeout=0.01) is None
+
+
+def test_in_memory_queue_redelivers_released_message_with_attempt_count():
+    queue = InMemoryQueue()
+    response = queue.publish(Message='a')
+
+    message = queue.receive(timeout=0.1)
+    queue.release(message)
+    redelivered_message = queue.receive(timeout=0.1)
+
+    assert redelivered_message.message_id == response['MessageId']
+    assert redelivered_message.attempts == 2
+
+
+def test_file_queue_delivers_messages_in_order(tmp_path):
+    queue = FileQueue(str(tmp_path))
+    for body in ['a', 'b', 'c']:
+        queue.publish(Message=body)
+
+    assert len(queue) == 3
+    assert [queue.receive(timeout=0.1).body for _ in range(3)] == ['a', 'b', 'c']
+    assert len(queue) == 0
+    assert queue.receive(timeout=0.01) is None
+
+
+def test_file_queue_is_shared_between_instances(tmp_path):
+    publisher = FileQueue(str(tmp_path))
+    consumer = FileQueue(str(tmp_path))
+    publisher.publish(Message=json.dumps({'athlete_id': 1, 'activity_id': 2}))
+
+    message = consumer.receive(timeout=0.1)
+
+    assert json.loads(message.body) == {'athlete_id': 1, 'activity_id': 2}
+    assert publisher.receive(timeout=0.01) is None
+
+
+def test_file_queue_acknowledge_removes_message(tmp_path):
+    queue = FileQueue(str(tmp_path))
+    queue.publish(Message='a')
+
+    queue.acknowledge(queue.receive(timeout=0.1))
+
+    assert os.listdir(queue.pending_directory) == []
+    assert os.listdir(queue.processing_directory) == []
+
+
+def test_file_queue_redelivers_released_message_with_attempt_count(tmp_path):
+    queue = FileQueue(str(tmp_path))
+    response = queue.publish(Message='a')
+
+    queue.release(queue.receive(timeout=0.1))
+    redelivered_message = queue.receive(timeout=0.1)
+
+    assert redelivered_message.message_id == response['MessageId']
+    assert redelivered_message.attempts == 2
+
+
+def test_file_queue_recovers_messages_left_in_processing(tmp_path):
+    queue = FileQueue(str(tmp_path))
+    queue.publish(Message='a')
+    queue.receive(timeout=0.1)
+
+    assert queue.receive(timeout=0.01) is None
+    assert FileQueue(str(tmp_path)).recover() == 1
+    assert queue.receive(timeout=0.1).body == 'a'
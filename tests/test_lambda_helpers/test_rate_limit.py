@@ -0,0 +1,151 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.lambda_helpers.rate_limit import Priority, RateLimitedStravaClient, RateLimitExceeded, StravaRateLimiter, \
+    TokenBucket, parse_rate_limit_headers
+
+
+class MockClock:
+    def __init__(self):
+        self.time = 1000.
+
+    def __call__(self):
+        return self.time
+
+
+def test_token_bucket_refills_over_period():
+    clock = MockClock()
+    bucket = TokenBucket(capacity=10, period=100., clock=clock)
+    for _ in range(10):
+        bucket.consume()
+
+    assert bucket.tokens == 0
+    assert bucket.time_until(1) == pytest.approx(10.)
+    clock.time += 25.
+    assert bucket.tokens == pytest.approx(2.5)
+    clock.time += 1000.
+    assert bucket.tokens == 10
+
+
+def test_parse_rate_limit_headers():
+    headers = {'x-ratelimit-limit': '100,1000', 'X-RateLimit-Usage': '20,300', 'Content-Type': 'application/json'}
+
+    assert parse_rate_limit_headers(headers) == [(100, 20), (1000, 300)]
+    assert parse_rate_limit_headers({'Content-Type': 'application/json'}) is None
+
+
+def test_rate_limiter_allows_requests_within_quota():
+    rate_limiter = StravaRateLimiter(short_term_limit=5, daily_limit=100, clock=MockClock())
+
+    assert [rate_limiter.try_acquire(Priority.LIVE) for _ in range(5)] == [0.] * 5
+    assert rate_limiter.try_acquire(Priority.LIVE) > 0
+
+
+def test_rate_limiter_reserves_quota_for_live_requests():
+    rate_limiter = StravaRateLimiter(short_term_limit=10, daily_limit=100, backfill_reserve=0.2, clock=MockClock())
+
+    backfill_requests = 0
+    while not rate_limiter.try_acquire(Priority.BACKFILL):
+        backfill_requests += 1
+
+    assert backfill_requests == 8
+    assert rate_limiter.try_acquire(Priority.LIVE) == 0.
+    assert rate_limiter.try_acquire(Priority.LIVE) == 0.
+    assert rate_limiter.try_acquire(Priority.LIVE) > 0
+
+
+def test_rate_limiter_daily_quota_limits_requests():
+    rate_limiter = StravaRateLimiter(short_term_limit=100, daily_limit=3, clock=MockClock())
+
+    assert [rate_limiter.try_acquire() for _ in range(3)] == [0.] * 3
+    assert rate_limiter.try_acquire() == pytest.approx(24 * 60 * 60 / 3)
+
+
+def test_rate_limiter_synchronises_with_response_headers():
+    rate_limiter = StravaRateLimiter(short_term_limit=100, daily_limit=1000, clock=MockClock())
+    rate_limiter.update_from_headers({'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '99,300'})
+
+    assert rate_limiter.try_acquire() == 0.
+    assert rate_limiter.try_acquire() > 0
+
+
+def test_acquire_delays_request_until_quota_is_available():
+    # 3600 requests per 15 minutes refill one token every 0.25 s
+    rate_limiter = StravaRateLimiter(short_term_limit=100, daily_limit=10000)
+    rate_limiter.update_from_headers({'X-RateLimit-Limit': '3600,10000', 'X-RateLimit-Usage': '3600,0'})
+
+    assert rate_limiter.acquire(Priority.LIVE, timeout=5.)
+    assert rate_limiter.delayed_count == 1
+
+
+def test_acquire_times_out():
+    rate_limiter = StravaRateLimiter(short_term_limit=1, daily_limit=100)
+    assert rate_limiter.acquire(timeout=0.01)
+
+    assert not rate_limiter.acquire(timeout=0.01)
+
+
+def test_waiting_live_request_is_served_before_backfill():
+    clock = MockClock()
+    rate_limiter = StravaRateLimiter(short_term_limit=10, daily_limit=100, backfill_reserve=0., clock=clock)
+    while not rate_limiter.try_acquire():
+        pass
+
+    acquired = threading.Event()
+    live_request = threading.Thread(target=lambda: rate_limiter.acquire(Priority.LIVE) and acquired.set())
+    live_request.start()
+    while not rate_limiter._waiting[Priority.LIVE]:
+        pass
+
+    # Quota becomes available while the live request is waiting: backfill requests must not take it
+    clock.time += 90.
+    assert rate_limiter.try_acquire(Priority.BACKFILL) > 0
+    with rate_limiter._condition:
+        rate_limiter._condition.notify_all()
+    assert acquired.wait(5.)
+    live_request.join()
+
+
+def test_rate_limited_client_delegates_requests():
+    client = MagicMock()
+    client.get_activity.return_value = {'id': 2}
+    rate_limiter = StravaRateLimiter(short_term_limit=10, daily_limit=100, clock=MockClock())
+    rate_limited_client = RateLimitedStravaClient(client, rate_limiter)
+
+    assert rate_limited_client.get_activity(athlete_id=1, activity_id=2) == {'id': 2}
+    rate_limited_client.update_activity(athlete_id=1, activity_id=2, updatable_activity=None)
+
+    client.get_activity.assert_called_once_with(athlete_id=1, activity_id=2)
+    assert rate_limited_client.authorisation is client.authorisation
+    assert rate_limiter.buckets[0].tokens == 8
+
+
+def test_rate_limited_client_fails_live_request_without_quota():
+    client = MagicMock()
+    rate_limiter = StravaRateLimiter(short_term_limit=1, daily_limit=100, clock=MockClock())
+    rate_limited_client = RateLimitedStravaClient(client, rate_limiter, priority=Priority.LIVE, max_wait=0.01)
+    rate_limited_client.get_activity(athlete_id=1, activity_id=2)
+
+    with pytest.raises(RateLimitExceeded):
+        rate_limited_client.get_activity(athlete_id=1, activity_id=3)
+    assert client.get_activity.call_count == 1
+
+
+def test_rate_limited_client_reads_headers_of_rate_limit_errors():
+    error = Exception('429 Too Many Requests')
+    error.response = MagicMock(headers={'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '100,500'})
+    client = MagicMock()
+    client.get_activity.side_effect = error
+    rate_limiter = StravaRateLimiter(short_term_limit=100, daily_limit=1000, clock=MockClock())
+
+    with pytest.raises(Exception):
+        RateLimitedStravaClient(client, rate_limiter).get_activity(athlete_id=1, activity_id=2)
+    assert rate_limiter.try_acquire() > 0
+
+
+def test_priority_from_name():
+    assert Priority.from_name(None) == Priority.LIVE
+    assert Priority.from_name('backfill') == Priority.BACKFILL
+    assert Priority.from_name('unknown') == Priority.LIVE
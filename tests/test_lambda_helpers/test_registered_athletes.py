@@ -0,0 +1,152 @@
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.lambda_helpers.registered_athletes import DynamoDBRegisteredAthleteStore, InMemoryRegisteredAthleteStore, \
+    LocalFileRegisteredAthleteStore, reconcile_registered_athlete_count
+
+
+class MockTokenCache:
+    """
+    Token cache whose DynamoDB table is keyed on 'athlete_id', and is scanned in pages of two items.
+    """
+
+    def __init__(self, athlete_ids):
+        items = [{'athlete_id': athlete_id} for athlete_id in athlete_ids]
+        pages = [{'Items': items[i:i + 2], 'LastEvaluatedKey': {'athlete_id': i}} for i in range(0, len(items), 2)]
+        pages[-1:] = [{'Items': pages[-1]['Items']}] if pages else [{'Items': []}]
+        self.table = MagicMock()
+        self.table.key_schema = [{'AttributeName': 'athlete_id', 'KeyType': 'HASH'}]
+        self.table.scan.side_effect = pages
+
+
+def test_in_memory_store_counts_each_athlete_once():
+    store = InMemoryRegisteredAthleteStore()
+    assert store.register(1)
+    assert not store.register(1)
+    assert store.register(2)
+    assert store.count() == 2
+
+    assert store.deregister(1)
+    assert not store.deregister(1)
+    assert store.count() == 1
+
+
+def test_local_file_store_persists_count(tmp_path):
+    filepath = str(tmp_path / 'registered_athletes.json')
+    store = LocalFileRegisteredAthleteStore(filepath)
+    assert store.count() == 0
+    store.register(1)
+    store.register(2)
+    store.register(2)
+    store.deregister(1)
+
+    reopened_store = LocalFileRegisteredAthleteStore(filepath)
+    assert reopened_store.count() == 1
+    assert not reopened_store.register(2)
+
+
+def test_dynamodb_store_updates_athlete_and_counter_in_one_transaction():
+    table = MagicMock()
+    table.name = 'registrations'
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    assert store.register(1)
+
+    transact_items = table.meta.client.transact_write_items.call_args.kwargs['TransactItems']
+    assert transact_items[0]['Put']['Item'] == {'registration_key': {'S': 'athlete:1'}}
+    assert transact_items[1]['Update']['ExpressionAttributeValues'] == {':increment': {'N': '1'}, ':one': {'N': '1'}}
+
+
+def test_dynamodb_store_does_not_count_repeated_registration():
+    table = MagicMock()
+    table.meta.client.transact_write_items.side_effect = ClientError(
+        {'Error': {'Code': 'TransactionCanceledException'}}, 'TransactWriteItems')
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    assert not store.register(1)
+    assert not store.deregister(2)
+
+
+def test_dynamodb_store_raises_other_errors():
+    table = MagicMock()
+    table.meta.client.transact_write_items.side_effect = ClientError(
+        {'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'TransactWriteItems')
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    with pytest.raises(ClientError):
+        store.deregister(1)
+
+
+def test_dynamodb_store_reads_count_from_counter_item():
+    table = MagicMock()
+    table.get_item.return_value = {'Item': {'registration_key': 'registered_athletes', 'athlete_count': 3}}
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    assert store.count() == 3
+    table.get_item.assert_called_once_with(Key={'registration_key': 'registered_athletes'}, ConsistentRead=True)
+    table.scan.assert_not_called()
+
+
+def test_dynamodb_store_count_is_zero_before_first_registration():
+    table = MagicMock()
+    table.get_item.return_value = {}
+
+    assert DynamoDBRegisteredAthleteStore(table).count() == 0
+
+
+def test_reconcile_registers_athletes_from_token_cache():
+    store = InMemoryRegisteredAthleteStore()
+    store.register(1)
+    store.register(5)
+
+    assert reconcile_registered_athlete_count(store, MockTokenCache(athlete_ids=[1, 2, 3, 4])) == 2
+    assert store.count() == 4
+    assert store.registered_athlete_ids() == {1, 2, 3, 4}
+    assert not store.register(2)
+    assert reconcile_registered_athlete_count(store, MockTokenCache(athlete_ids=[1, 2, 3, 4])) == 0
+
+
+def test_athletes_registered_before_first_reconciliation_can_deregister(tmp_path):
+    store = LocalFileRegisteredAthleteStore(str(tmp_path / 'registered_athletes.json'))
+
+    reconcile_registered_athlete_count(store, MockTokenCache(athlete_ids=[1, 2, 3]))
+    assert store.deregister(2)
+
+    assert store.count() == 2
+
+
+def test_reconcile_resets_drifted_count():
+    store = InMemoryRegisteredAthleteStore()
+    store.register(1)
+    store._count = 7
+
+    assert reconcile_registered_athlete_count(store, MockTokenCache(athlete_ids=[1])) == -6
+    assert store.count() == 1
+
+
+def test_dynamodb_store_scans_registered_athlete_ids():
+    table = MagicMock()
+    table.scan.side_effect = [{'Items': [{'registration_key': 'athlete:1'}], 'LastEvaluatedKey': {'k': 1}},
+                              {'Items': [{'registration_key': 'athlete:22'}]}]
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    assert store.registered_athlete_ids() == {1, 22}
+    assert table.scan.call_args.kwargs['ExclusiveStartKey'] == {'k': 1}
+
+
+def test_dynamodb_store_resets_count_conditional_on_counter_version():
+    table = MagicMock()
+    table.get_item.return_value = {'Item': {'registration_key': 'registered_athletes', 'athlete_count': 5,
+                                            'version': 3}}
+    table.scan.return_value = {'Items': [{'registration_key': 'athlete:1'}, {'registration_key': 'athlete:2'}]}
+    store = DynamoDBRegisteredAthleteStore(table)
+
+    assert store.reset_count()
+    put_item = table.put_item.call_args.kwargs
+    assert put_item['Item'] == {'registration_key': 'registered_athletes', 'athlete_count': 2, 'version': 4}
+    assert put_item['ExpressionAttributeValues'] == {':version': 3}
+
+    table.put_item.side_effect = ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+    assert not store.reset_count()
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+from src.lambda_helpers.message_queue import InMemoryQueue
+from src.lambda_helpers.worker import QueueWorker
+
+
+def publish_messages(queue, n):
+    for i in range(n):
+        queue.publish(Message=json.dumps({'athlete_id': 1, 'activity_id': i}))
+
+
+def wait_until(condition, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_worker_handles_every_message_once():
+    queue = InMemoryQueue()
+    publish_messages(queue, 20)
+    handled_activities = []
+    lock = threading.Lock()
+
+    def handler(message):
+        with lock:
+            handled_activities.append(message['activity_id'])
+
+    worker = QueueWorker(queue, handler, concurrency=4, poll_interval=0.01)
+    worker.start()
+    assert wait_until(lambda: worker.processed_count == 20)
+    worker.stop()
+
+    assert sorted(handled_activities) == list(range(20))
+    assert not worker.running
+
+
+def test_worker_handles_messages_concurrently():
+    queue = InMemoryQueue()
+    publish_messages(queue, 3)
+    barrier = threading.Barrier(3, timeout=5.)
+
+    worker = QueueWorker(queue, lambda message: barrier.wait(), concurrency=3, poll_interval=0.01)
+    worker.start()
+    assert wait_until(lambda: worker.processed_count == 3)
+    worker.stop()
+
+
+def test_worker_retries_failed_message_then_drops_it():
+    queue = InMemoryQueue()
+    publish_messages(queue, 1)
+    attempts = []
+
+    def handler(message):
+        attempts.append(message['activity_id'])
+        raise ValueError('Strava unavailable')
+
+    worker = QueueWorker(queue, handler, concurrency=1, poll_interval=0.01, max_attempts=3)
+    worker.start()
+    assert wait_until(lambda: worker.dropped_count == 1)
+    worker.stop()
+
+    assert attempts == [0, 0, 0]
+    assert worker.retried_count == 2
+    assert worker.processed_count == 0
+    assert len(queue) == 0
+
+
+def test_worker_succeeds_on_retry():
+    queue = InMemoryQueue()
+    publish_messages(queue, 1)
+    attempts = []
+
+    def handler(message):
+        attempts.append(message['activity_id'])
+        if len(attempts) == 1:
+            raise ValueError('Strava unavailable')
+
+    worker = QueueWorker(queue, handler, concurrency=1, poll_interval=0.01)
+    worker.start()
+    assert wait_until(lambda: worker.processed_count == 1)
+    worker.stop()
+
+    assert worker.retried_count == 1
+    assert worker.dropped_count == 0
+
+
+def test_stop_waits_for_message_in_progress():
+    queue = InMemoryQueue()
+    publish_messages(queue, 1)
+    started = threading.Event()
+    finished = []
+
+    def handler(message):
+        started.set()
+        time.sleep(0.2)
+        finished.append(message['activity_id'])
+
+    worker = QueueWorker(queue, handler, concurrency=2, poll_interval=0.01)
+    worker.start()
+    assert started.wait(5.)
+    worker.stop()
+
+    assert finished == [0]
+    assert worker.processed_count == 1
+    assert not worker.running
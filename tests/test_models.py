@@ -30,3 +30,17 @@ def test_coordinate_set_length():
     expected_result = 2
     calculated_result = coords.length
     assert calculated_result == expected_result
+
+
+def test_coordinate_set_raises_if_altitude_not_same_length():
+    with pytest.raises(AssertionError):
+        coords = CoordinateSet(latitude=np.array([3, 4]), longitude=np.array([1, 2]), altitude=np.array([100]))
+
+
+def test_coordinate_set_select():
+    coords = CoordinateSet(latitude=np.array([3, 4, 5]), longitude=np.array([1, 2, 3]),
+                           altitude=np.array([10, 20, 30]))
+    calculated_result = coords.select(np.array([True, False, True]))
+    np.testing.assert_array_equal(calculated_result.latitude, [3, 5])
+    np.testing.assert_array_equal(calculated_result.longitude, [1, 3])
+    np.testing.assert_array_equal(calculated_result.altitude, [10, 30])
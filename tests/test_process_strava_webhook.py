@@ -0,0 +1,90 @@
+import json
+from unittest import mock
+
+import pytest
+
+from src import process_strava_webhook
+from src.lambda_helpers.idempotency import EventDeduplicator, InMemoryIdempotencyStore
+from src.lambda_helpers.notifications import LocalTopic
+
+
+@pytest.fixture(autouse=True)
+def deduplicator():
+    deduplicator = EventDeduplicator(InMemoryIdempotencyStore(), namespace='webhook')
+    process_strava_webhook.set_deduplicator(deduplicator)
+    yield deduplicator
+    process_strava_webhook.set_deduplicator(None)
+
+
+def new_activity_event(athlete_id: int, activity_id: int) -> dict:
+    body = {'aspect_type': 'create',
+            'object_id': activity_id,
+            'object_type': 'activity',
+            'owner_id': athlete_id,
+            'updates': {}}
+    return {'body': json.dumps(body)}
+
+
+def test_lambda_handler_publishes_new_activity_to_local_topic():
+    topic = LocalTopic()
+    process_strava_webhook.set_sns_topic(topic)
+    try:
+        response = process_strava_webhook.lambda_handler(new_activity_event(1, 2), None)
+    finally:
+        process_strava_webhook.set_sns_topic(None)
+
+    assert response == {'statusCode': 200}
+    assert [json.loads(m) for m in topic.messages] == [{'athlete_id': 1, 'activity_id': 2}]
+
+
+@mock.patch('src.process_strava_webhook.create_sns_topic_from_env', return_value=LocalTopic())
+def test_lambda_handler_creates_sns_topic_once_per_container(mock_create_topic):
+    process_strava_webhook.set_sns_topic(None)
+    try:
+        process_strava_webhook.lambda_handler(new_activity_event(1, 2), None)
+        process_strava_webhook.lambda_handler(new_activity_event(1, 3), None)
+    finally:
+        process_strava_webhook.set_sns_topic(None)
+
+    mock_create_topic.assert_called_once()
+    assert len(mock_create_topic.return_value.messages) == 2
+
+
+@mock.patch('src.process_strava_webhook.create_sns_topic_from_env')
+def test_lambda_handler_does_not_create_sns_topic_for_challenge(mock_create_topic):
+    process_strava_webhook.set_sns_topic(None)
+    event = {'queryStringParameters': {'hub.challenge': 'abc'}}
+
+    response = process_strava_webhook.lambda_handler(event, None)
+
+    assert json.loads(response['body']) == {'hub.challenge': 'abc'}
+    mock_create_topic.assert_not_called()
+
+
+def test_lambda_handler_drops_duplicate_deliveries(deduplicator):
+    topic = LocalTopic()
+    process_strava_webhook.set_sns_topic(topic)
+    try:
+        for _ in range(3):
+            process_strava_webhook.lambda_handler(new_activity_event(1, 2), None)
+    finally:
+        process_strava_webhook.set_sns_topic(None)
+
+    assert len(topic.messages) == 1
+    assert deduplicator.suppressed_count == 2
+
+
+class FailingTopic:
+    def publish(self, Message):
+        raise OSError('No space left on device')
+
+
+def test_lambda_handler_releases_claim_when_publish_fails(deduplicator):
+    process_strava_webhook.set_sns_topic(FailingTopic())
+    try:
+        with pytest.raises(OSError):
+            process_strava_webhook.lambda_handler(new_activity_event(1, 2), None)
+    finally:
+        process_strava_webhook.set_sns_topic(None)
+
+    assert deduplicator.claim(athlete_id=1, activity_id=2)
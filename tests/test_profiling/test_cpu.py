@@ -0,0 +1,105 @@
+import logging
+import os
+import pstats
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from src.profiling import cpu
+from src.profiling.cpu import ProfilerConfiguration, create_profiler_configuration_from_env, profile_handler, \
+    set_profiler_configuration
+
+
+def slow_function(n):
+    return sum(i * i for i in range(n))
+
+
+@profile_handler('test_handler')
+def handler(event, context):
+    return {'statusCode': 200, 'body': slow_function(event['n'])}
+
+
+def test_handler_is_not_profiled_when_profiling_is_disabled(monkeypatch):
+    monkeypatch.delenv('profiling_sample_rate', raising=False)
+    set_profiler_configuration(None)
+    with mock.patch.object(cpu.cProfile, 'Profile') as mock_profile:
+        response = handler({'n': 10}, None)
+
+    assert response == {'statusCode': 200, 'body': 285}
+    mock_profile.assert_not_called()
+
+
+def test_profiled_handler_logs_top_functions_and_writes_profile(tmp_path, caplog):
+    set_profiler_configuration(ProfilerConfiguration(sample_rate=1., output_directory=str(tmp_path), top_functions=5))
+    try:
+        with caplog.at_level(logging.INFO):
+            response = handler({'n': 1000}, SimpleNamespace(aws_request_id='request-1'))
+    finally:
+        set_profiler_configuration(None)
+
+    assert response['statusCode'] == 200
+    assert 'Profile of test_handler' in caplog.text
+    assert 'slow_function' in caplog.text
+
+    profile_filenames = os.listdir(tmp_path)
+    assert len(profile_filenames) == 1
+    assert profile_filenames[0].startswith('test_handler-') and profile_filenames[0].endswith('-request-1.prof')
+    stats = pstats.Stats(str(tmp_path / profile_filenames[0]))
+    assert any(function_name == 'slow_function' for _, _, function_name in stats.stats)
+
+
+def test_profiled_handler_writes_profile_when_handler_raises(tmp_path):
+    @profile_handler('failing_handler')
+    def failing_handler(event, context):
+        raise ValueError('Unable to process event')
+
+    set_profiler_configuration(ProfilerConfiguration(sample_rate=1., output_directory=str(tmp_path)))
+    try:
+        failing_handler({}, None)
+    except ValueError:
+        pass
+    finally:
+        set_profiler_configuration(None)
+
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_profiled_handler_result_is_unchanged_when_profile_cannot_be_written(tmp_path):
+    @profile_handler('failing_handler')
+    def failing_handler(event, context):
+        raise ValueError('Unable to process event')
+
+    set_profiler_configuration(ProfilerConfiguration(sample_rate=1., output_directory=str(tmp_path)))
+    try:
+        with mock.patch.object(cpu, 'write_profile', side_effect=OSError('Read-only file system')):
+            response = handler({'n': 10}, None)
+            with pytest.raises(ValueError):
+                failing_handler({}, None)
+    finally:
+        set_profiler_configuration(None)
+
+    assert response == {'statusCode': 200, 'body': 285}
+
+
+def test_only_sampled_invocations_are_profiled():
+    set_profiler_configuration(ProfilerConfiguration(sample_rate=0.25))
+    try:
+        with mock.patch.object(cpu.random, 'random', side_effect=[0.1, 0.5, 0.9, 0.2]), \
+                mock.patch.object(cpu, '_run_profiled', return_value={'statusCode': 200}) as mock_run_profiled:
+            for _ in range(4):
+                handler({'n': 10}, None)
+    finally:
+        set_profiler_configuration(None)
+
+    assert mock_run_profiled.call_count == 2
+
+
+def test_profiler_configuration_from_environment(monkeypatch):
+    monkeypatch.delenv('profiling_sample_rate', raising=False)
+    assert create_profiler_configuration_from_env() is None
+
+    monkeypatch.setenv('profiling_sample_rate', '0.1')
+    monkeypatch.setenv('profiling_output_directory', '/tmp/profiles')
+    assert create_profiler_configuration_from_env() == ProfilerConfiguration(sample_rate=0.1,
+                                                                             output_directory='/tmp/profiles')
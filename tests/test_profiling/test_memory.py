@@ -0,0 +1,115 @@
+import numpy as np
+
+from src.profiling import memory
+from src.profiling.memory import MemoryProfiler, get_memory_profiler, profile_memory, set_memory_profiler
+
+MB = 2 ** 20
+
+
+def allocate(megabytes: int) -> np.array:
+    array = np.ones(megabytes * MB // 8)
+    return array
+
+
+def test_stage_records_peak_allocation():
+    with MemoryProfiler() as profiler:
+        with profiler.stage('allocate'):
+            allocate(16)
+
+    summary = profiler.summary()['allocate']
+
+    assert summary['calls'] == 1
+    assert 16 <= summary['peak_allocated_mb'] < 17
+    assert summary['rss_high_water_mb'] > 0
+
+
+def test_nested_stage_peaks_are_included_in_enclosing_stage():
+    with MemoryProfiler() as profiler:
+        with profiler.stage('outer'):
+            retained = allocate(4)
+            with profiler.stage('inner'):
+                allocate(16)
+            allocate(8)
+
+    summary = profiler.summary()
+
+    assert 16 <= summary['inner']['peak_allocated_mb'] < 17
+    assert 20 <= summary['outer']['peak_allocated_mb'] < 21
+    assert len(retained)
+
+
+def test_stage_peak_is_measured_from_allocation_at_start():
+    with MemoryProfiler() as profiler:
+        retained = allocate(32)
+        with profiler.stage('small'):
+            allocate(1)
+
+    assert profiler.summary()['small']['peak_allocated_mb'] < 2
+    assert len(retained)
+
+
+def test_stage_records_largest_call():
+    with MemoryProfiler() as profiler:
+        for megabytes in [2, 8, 4]:
+            with profiler.stage('allocate'):
+                allocate(megabytes)
+
+    summary = profiler.summary()['allocate']
+
+    assert summary['calls'] == 3
+    assert 8 <= summary['peak_allocated_mb'] < 9
+
+
+def test_stage_has_no_effect_unless_profiler_is_running():
+    profiler = MemoryProfiler()
+    with profiler.stage('allocate'):
+        allocate(1)
+
+    assert profiler.summary() == {}
+
+
+def test_profile_memory_records_to_process_profiler():
+    profiler = MemoryProfiler()
+    set_memory_profiler(profiler)
+    try:
+        with profiler:
+            with profile_memory('allocate'):
+                allocate(4)
+    finally:
+        set_memory_profiler(None)
+
+    assert profiler.summary()['allocate']['calls'] == 1
+
+
+def test_profile_memory_decorates_functions():
+    @profile_memory('allocate')
+    def allocate_twice():
+        return len(allocate(2)) + len(allocate(2))
+
+    profiler = MemoryProfiler()
+    set_memory_profiler(profiler)
+    try:
+        with profiler:
+            allocate_twice()
+            allocate_twice()
+    finally:
+        set_memory_profiler(None)
+
+    assert profiler.summary()['allocate']['calls'] == 2
+
+
+def test_memory_profiling_is_configured_from_environment(monkeypatch):
+    monkeypatch.setenv('memory_profiling', 'false')
+    set_memory_profiler(None)
+    assert get_memory_profiler() is None
+
+    monkeypatch.setenv('memory_profiling', 'true')
+    set_memory_profiler(None)
+    try:
+        profiler = get_memory_profiler()
+        assert profiler is not None and profiler.running
+        assert get_memory_profiler() is profiler
+    finally:
+        profiler.stop()
+        set_memory_profiler(None)
+        assert not memory._memory_profiler_configured
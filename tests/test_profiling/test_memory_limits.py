@@ -0,0 +1,78 @@
+"""
+Peak memory of the summit search for reference workloads. These limits are the Lambda memory budget of each stage, so
+raise them deliberately, together with the memory size of the update_strava_description function.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The profiler must be installed in the module imported by the summits package, rather than in src.profiling.memory
+from profiling.memory import MemoryProfiler, set_memory_profiler
+from src.data_sources.summit_database import optimise_summit_table, write_summit_database
+from src.summits import report_visited_summits
+from src.summits.report_configuration import REPORT_CONFIG
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+# Peak allocation limits in megabytes, by workload and stage
+MEMORY_LIMITS_MB = {
+    'example_streamset': {'nearest_neighbour_search': 12, 'report_visited_summits': 16},
+    'synthetic_trail_50000': {'nearest_neighbour_search': 12, 'report_visited_summits': 16},
+    'synthetic_trail_100000': {'nearest_neighbour_search': 16, 'report_visited_summits': 20},
+}
+
+
+@pytest.fixture(scope='module')
+def summit_database(tmp_path_factory):
+    # Summits at the density of the British and Irish hills database
+    rng = np.random.default_rng(0)
+    n = 20000
+    raw = pd.DataFrame({'Number': np.arange(n),
+                        'Name': [f'Hill {i}' for i in range(n)],
+                        'Metres': rng.uniform(100., 1300., n),
+                        'Latitude': rng.uniform(53., 61., n),
+                        'Longitude': rng.uniform(-7., 1., n)})
+    for code in REPORT_CONFIG.classification_codes:
+        raw[code] = rng.integers(0, 2, n)
+
+    filepath = str(tmp_path_factory.mktemp('summits') / 'database.pkl')
+    write_summit_database(optimise_summit_table(raw, classification_columns=REPORT_CONFIG.classification_codes),
+                          filepath, classification_codes=REPORT_CONFIG.classification_codes)
+    return filepath
+
+
+def example_streamset_trail():
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'example_streamset.json'), 'r') as file:
+        latlng = np.array(json.load(file)['latlng']['data'])
+    return latlng[:, 0], latlng[:, 1]
+
+
+def synthetic_trail(n: int):
+    # An out-and-back route over the same area as the example stream set, sampled at n points
+    distance = np.linspace(0., 2. * np.pi, n)
+    return 57.07 + 0.06 * np.sin(0.5 * distance), -3.66 + 0.02 * np.sin(distance)
+
+
+WORKLOADS = {'example_streamset': example_streamset_trail,
+             'synthetic_trail_50000': lambda: synthetic_trail(50000),
+             'synthetic_trail_100000': lambda: synthetic_trail(100000)}
+
+
+@pytest.mark.parametrize('workload', list(MEMORY_LIMITS_MB))
+def test_report_visited_summits_peak_memory_is_within_limits(summit_database, workload):
+    lat, lng = WORKLOADS[workload]()
+    profiler = MemoryProfiler()
+    set_memory_profiler(profiler)
+    try:
+        with profiler:
+            report_visited_summits(lat, lng, summit_database)
+    finally:
+        set_memory_profiler(None)
+
+    summary = profiler.summary()
+    for stage, limit_mb in MEMORY_LIMITS_MB[workload].items():
+        assert summary[stage]['peak_allocated_mb'] <= limit_mb, \
+            f"{stage} peak allocation of {summary[stage]['peak_allocated_mb']:.1f} MB exceeds {limit_mb} MB"
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from src.simulation.fakes import FakeStravaClient, FakeTokenCache, FakeWeatherAPI, QueueTopic, \
+    UnauthorisedAthleteError
+
+
+def test_fake_strava_client_rejects_unregistered_athlete():
+    client = FakeStravaClient(FakeTokenCache())
+    with pytest.raises(UnauthorisedAthleteError):
+        client.get_activity(athlete_id=1, activity_id=2)
+
+
+def test_fake_strava_client_serves_fixtures_for_registered_athlete():
+    token_cache = FakeTokenCache()
+    client = FakeStravaClient(token_cache)
+    athlete_id = client.authorisation.post_athlete_auth_code('1')
+
+    activity = client.get_activity(athlete_id=athlete_id, activity_id=2)
+    streams = client.get_activity_stream_set(athlete_id=athlete_id, activity_id=2, streams=['latlng'], as_df=True)
+
+    assert token_cache.total_tokens == 1
+    assert activity['id'] == 2
+    assert activity['description'] is None
+    assert list(streams.columns) == ['lat', 'lng']
+    assert len(streams) == 23246
+    assert client.call_counts == {'get_activity': 1, 'get_activity_stream_set': 1}
+
+
+def test_fake_weather_api_returns_hourly_weather():
+    weather_api = FakeWeatherAPI()
+    df = weather_api(api_key='key', latitude=0., longitude=0., start_time=None, end_time=None)
+    assert df['condition'].iloc[0]['text'] == 'Overcast'
+    assert weather_api.call_count == 1
+
+
+def test_queue_topic_enqueues_published_messages():
+    topic = QueueTopic()
+    topic.publish(Message=json.dumps({'athlete_id': 1, 'activity_id': 2}))
+    assert json.loads(topic.queue.get_nowait()) == {'athlete_id': 1, 'activity_id': 2}
@@ -0,0 +1,37 @@
+from collections import Counter
+
+from src.process_strava_webhook import is_newly_created_activity, is_unsubscription_event
+from src.simulation.load_generator import generate_webhook_events
+
+
+def test_generate_webhook_events_creates_every_activity():
+    events = generate_webhook_events(athletes=5, activities_per_athlete=4, duplicate_probability=0.)
+
+    created = [e for e in events if is_newly_created_activity(e)]
+    assert len(created) == 20
+    assert len({e['object_id'] for e in created}) == 20
+    assert Counter(e['owner_id'] for e in created) == {athlete_id: 4 for athlete_id in range(100000, 100005)}
+
+
+def test_generate_webhook_events_is_time_ordered_and_reproducible():
+    events = generate_webhook_events(athletes=10, activities_per_athlete=3, seed=1)
+
+    assert [e['event_time'] for e in events] == sorted(e['event_time'] for e in events)
+    assert events == generate_webhook_events(athletes=10, activities_per_athlete=3, seed=1)
+
+
+def test_generate_webhook_events_deauthorisation_is_each_athletes_last_event():
+    events = generate_webhook_events(athletes=10, activities_per_athlete=3, deauthorisation_probability=1.)
+
+    deauthorised = [i for i, e in enumerate(events) if is_unsubscription_event(e)]
+    assert len(deauthorised) == 10
+    for index in deauthorised:
+        athlete_id = events[index]['owner_id']
+        assert all(e['owner_id'] != athlete_id for e in events[index + 1:])
+
+
+def test_generate_webhook_events_duplicates_creations():
+    events = generate_webhook_events(athletes=2, activities_per_athlete=5, duplicate_probability=1.)
+
+    created = Counter(e['object_id'] for e in events if is_newly_created_activity(e))
+    assert set(created.values()) == {2}
@@ -0,0 +1,23 @@
+import pytest
+
+from src.simulation.metrics import LatencyRecorder
+
+
+def test_latency_recorder_summary():
+    recorder = LatencyRecorder()
+    for seconds in [0.001 * i for i in range(1, 101)]:
+        recorder.record('stage', seconds)
+    recorder.record_failure('stage')
+
+    summary = recorder.summary()['stage']
+
+    assert summary['count'] == 100
+    assert summary['failures'] == 1
+    assert summary['p50_ms'] == pytest.approx(50.5)
+    assert summary['p99_ms'] == pytest.approx(99.01)
+
+
+def test_latency_recorder_summary_with_only_failures():
+    recorder = LatencyRecorder()
+    recorder.record_failure('stage')
+    assert recorder.summary() == {'stage': {'count': 0, 'failures': 1}}
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pandas as pd
+
+from src.simulation.pipeline import LocalPipeline, read_webhook_events
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+
+def create_event(athlete_id: int, activity_id: int) -> dict:
+    return {'aspect_type': 'create',
+            'event_time': 1516126040,
+            'object_id': activity_id,
+            'object_type': 'activity',
+            'owner_id': athlete_id,
+            'subscription_id': 120475,
+            'updates': {}}
+
+
+def test_local_pipeline_updates_activity_descriptions(tmp_path):
+    with LocalPipeline(database_filepath=str(tmp_path / 'missing_database.pkl')) as pipeline:
+        pipeline.register_athlete(1)
+        report = pipeline.replay([create_event(1, 10), create_event(1, 10), create_event(1, 11)], concurrency=2)
+
+    assert report['events'] == 3
+    assert report['duplicates_suppressed'] == 1
+    assert report['stages']['end_to_end']['count'] == 2
+    assert report['timezone_fallbacks'] == 0
+    assert set(pipeline.strava_client.descriptions) == {10, 11}
+    assert pipeline.strava_client.descriptions[10].startswith('Weather: ')
+
+
+def test_local_pipeline_skips_streams_for_activities_far_from_summits(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Latitude': [53.068585], 'Longitude': [-4.076196], 'Name': ['Snowdon'], 'Metres': [1085.0],
+                  'M': [0], 'F': [1]}).to_pickle(database_filepath)
+
+    with LocalPipeline(database_filepath=database_filepath) as pipeline:
+        pipeline.register_athlete(1)
+        report = pipeline.replay([create_event(1, 10), create_event(1, 11)])
+
+    assert report['streams_skipped'] == 2
+    assert 'get_activity_stream_set' not in report['strava_calls']
+    assert pipeline.strava_client.descriptions[10].startswith('Weather: ')
+
+
+def test_local_pipeline_does_not_process_unregistered_athletes(tmp_path):
+    with LocalPipeline(database_filepath=str(tmp_path / 'missing_database.pkl')) as pipeline:
+        report = pipeline.replay([create_event(1, 10)])
+
+    assert report['stages']['update_strava_description']['failures'] == 1
+    assert pipeline.strava_client.descriptions == {}
+
+
+def test_read_webhook_events_from_json_file():
+    events = read_webhook_events(os.path.join(TEST_DATA_DIRECTORY, 'activity_update_event.json'))
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'activity_update_event.json'), 'r') as file:
+        assert events == [json.load(file)]
+
+
+def test_read_webhook_events_from_json_lines_file(tmp_path):
+    filepath = tmp_path / 'events.jsonl'
+    filepath.write_text(json.dumps(create_event(1, 10)) + '\n' + json.dumps(create_event(2, 20)) + '\n')
+    assert read_webhook_events(str(filepath)) == [create_event(1, 10), create_event(2, 20)]
+
+
+def test_local_pipeline_maintains_registered_athlete_count(tmp_path):
+    with LocalPipeline(database_filepath=str(tmp_path / 'missing_database.pkl'), max_registered_users=2) as pipeline:
+        pipeline.register_athlete(1)
+        pipeline.register_athlete(1)
+        pipeline.register_athlete(2)
+        response = pipeline.register_athlete(3)
+
+    assert pipeline.registered_athletes.count() == 2
+    assert response['statusCode'] == 400
+    assert not pipeline.token_cache.is_registered(3)
+
+
+def test_local_pipeline_logs_visited_summits(tmp_path):
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'example_streamset.json'), 'r') as file:
+        latitude, longitude = json.load(file)['latlng']['data'][100]
+    database_filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Number': [7], 'Latitude': [latitude], 'Longitude': [longitude], 'Name': ['Summit'],
+                  'Metres': [1000.], 'M': [1]}).to_pickle(database_filepath)
+
+    with LocalPipeline(database_filepath=database_filepath) as pipeline:
+        pipeline.register_athlete(1)
+        pipeline.replay([create_event(1, 10), create_event(1, 11)])
+
+    assert pipeline.summit_log.visited_summit_ids(1) == [7]
+    assert pipeline.summit_log.classification_totals(1) == {'M': 1}
+    assert pipeline.summit_log.summit_ascents(1, [7])[7].ascents == 2
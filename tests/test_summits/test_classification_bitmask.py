@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.summits.report_configuration import REPORT_CONFIG, ReportConfiguration, ReportedSummit
+from src.summits.summit_report import (generate_summit_report, get_summit_classification_masks,
+                                       reduce_classification_list, reduce_classification_masks)
+
+TEST_CONFIG = ReportConfiguration([ReportedSummit(code='M', name='Munro', is_primary=True, is_top=False),
+                                   ReportedSummit(code='MT', name='Munro Top', is_primary=True, is_top=True),
+                                   ReportedSummit(code='Hew', name='Hewitt', is_primary=False, is_top=False),
+                                   ReportedSummit(code='Ma', name='Marilyn', is_primary=False, is_top=False)])
+
+
+def mock_visited_summits():
+    return pd.DataFrame({'Name': ['A', 'B', 'C', 'D'],
+                         'Metres': [1100.0, 950.5, 700.0, 1000.0],
+                         'M': [1, 0, 0, 0],
+                         'MT': [0, 1, 0, 0],
+                         'Hew': [1, 1, 1, 0],
+                         'Ma': [1, 0, 1, 1]}, index=[4, 5, 6, 7])
+
+
+def test_classification_mask_sets_bits_in_configuration_order():
+    assert TEST_CONFIG.classification_codes == ['M', 'MT', 'Hew', 'Ma']
+    assert TEST_CONFIG.classification_mask(['Munro', 'Marilyn']) == 0b1001
+    assert TEST_CONFIG.decode_classifications(0b0110) == ['Munro Top', 'Hewitt']
+
+
+def test_get_summit_classification_masks_prefers_bitmask_column():
+    summits = mock_visited_summits()
+    summits['Classification'] = np.array([1, 2, 4, 8], dtype=np.uint8)
+
+    np.testing.assert_array_equal(get_summit_classification_masks(summits, TEST_CONFIG), [1, 2, 4, 8])
+
+
+def test_get_summit_classification_masks_encodes_flag_columns():
+    masks = get_summit_classification_masks(mock_visited_summits(), TEST_CONFIG)
+
+    np.testing.assert_array_equal(masks, [0b1101, 0b0110, 0b1100, 0b1000])
+
+
+def test_reduce_classification_masks_matches_reduce_classification_list():
+    masks = np.arange(1 << len(REPORT_CONFIG.classes), dtype=REPORT_CONFIG.bitmask_dtype)
+    summit_classifications = {i: REPORT_CONFIG.decode_classifications(m) for i, m in enumerate(masks)}
+
+    expected_result = reduce_classification_list(summit_classifications, report_configuration=REPORT_CONFIG)
+    reduced_masks = reduce_classification_masks(masks, REPORT_CONFIG)
+    calculated_result = {i: REPORT_CONFIG.decode_classifications(m) for i, m in enumerate(reduced_masks)}
+
+    assert calculated_result == expected_result
+
+
+def test_generate_summit_report_reports_only_selected_classifications():
+    expected_result = ('Summits visited:\n'
+                       'Munros: A (1100.0 m)\n\n'
+                       'Marilyns: D (1000.0 m)')
+
+    calculated_result = generate_summit_report(mock_visited_summits(), TEST_CONFIG,
+                                               report_classifications=['Munro', 'Marilyn'])
+
+    assert calculated_result == expected_result
@@ -0,0 +1,80 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from src.data_sources.summits import LocalFileSummitReference
+from src.models.coordinates import CoordinateSet
+from src.summits import find_visited_summits
+from src.summits.elevation import high_ground_mask, prune_candidate_summits
+
+
+def mock_summit_reference():
+    mock_summit_database = pd.DataFrame({'Latitude': [0., 0.01, 0.02],
+                                         'Longitude': [0., 0., 0.],
+                                         'Name': ['A', 'B', 'C'],
+                                         'Metres': [400., 900., 1300.]})
+    summit_reference = LocalFileSummitReference('mock_filepath.pkl')
+    summit_reference._load_from_file = MagicMock(return_value=mock_summit_database)
+    return summit_reference
+
+
+def test_prune_candidate_summits_drops_summits_above_activity():
+    candidates = pd.DataFrame({'Metres': [400., 900., 1300.]}, index=[3, 4, 5])
+
+    calculated_result = prune_candidate_summits(candidates, 'Metres', elev_high=880., tolerance=30.)
+
+    pd.testing.assert_frame_equal(calculated_result, candidates.loc[[3, 4]])
+
+
+def test_high_ground_mask_keeps_points_within_tolerance_and_without_altitude():
+    altitude = np.array([100., 860., 880., np.nan, 1000.])
+
+    calculated_result = high_ground_mask(altitude, lowest_summit_height=900., tolerance=30.)
+
+    np.testing.assert_array_equal(calculated_result, [False, False, True, True, True])
+
+
+def test_find_visited_summits_with_elevation_pruning_matches_unpruned_search():
+    gpx_coords = CoordinateSet(latitude=np.array([0., 0.005, 0.01, 0.015]),
+                               longitude=np.array([0., 0., 0., 0.]),
+                               altitude=np.array([402., 650., 905., 700.]))
+
+    unpruned_result = find_visited_summits(gpx_trail=gpx_coords, summit_reference_data=mock_summit_reference())
+    pruned_result = find_visited_summits(gpx_trail=gpx_coords, summit_reference_data=mock_summit_reference(),
+                                         elev_high=910., elevation_tolerance=30.)
+
+    pd.testing.assert_frame_equal(pruned_result, unpruned_result)
+    assert list(pruned_result['Name']) == ['A', 'B']
+
+
+def test_find_visited_summits_only_searches_high_ground():
+    gpx_coords = CoordinateSet(latitude=np.array([0., 0.005, 0.01, 0.015]),
+                               longitude=np.array([0., 0., 0., 0.]),
+                               altitude=np.array([402., 250., 905., 300.]))
+
+    def mock_nearest_neighbour_search(coordinates, reference_points, workers, dtype):
+        return np.zeros(coordinates.length), np.zeros(coordinates.length, dtype=int)
+
+    with patch('summits.visited_summits.parallel_nearest_neighbour_search',
+               side_effect=mock_nearest_neighbour_search) as mock_search:
+        find_visited_summits(gpx_trail=gpx_coords, summit_reference_data=mock_summit_reference(),
+                             elev_high=910., elevation_tolerance=30.)
+
+    searched_trail = mock_search.call_args.kwargs['coordinates']
+    searched_summits = mock_search.call_args.kwargs['reference_points']
+    np.testing.assert_array_equal(searched_trail.latitude, [0., 0.01])
+    assert len(searched_summits.latitude) == 2
+
+
+def test_find_visited_summits_skips_search_when_trail_is_below_every_candidate():
+    gpx_coords = CoordinateSet(latitude=np.array([0.01, 0.0101]),
+                               longitude=np.array([0., 0.]),
+                               altitude=np.array([150., 160.]))
+
+    with patch('summits.visited_summits.parallel_nearest_neighbour_search') as mock_search:
+        calculated_result = find_visited_summits(gpx_trail=gpx_coords, summit_reference_data=mock_summit_reference(),
+                                                 elevation_tolerance=30.)
+
+    mock_search.assert_not_called()
+    assert not len(calculated_result)
@@ -0,0 +1,95 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_sources.summit_database import optimise_summit_table, write_summit_database
+from src.data_sources.summits import open_summit_reference
+from src.models.coordinates import CoordinateSet
+from src.summits.incremental import IncrementalSummitDetector
+from src.summits.report_configuration import REPORT_CONFIG
+from src.summits.summit_report import generate_summit_report
+from src.summits.visited_summits import find_visited_summits
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+
+@pytest.fixture(scope='module')
+def example_trail():
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'example_streamset.json'), 'r') as file:
+        latlng = np.array(json.load(file)['latlng']['data'])
+    return CoordinateSet(latitude=latlng[:, 0], longitude=latlng[:, 1])
+
+
+@pytest.fixture(scope='module')
+def summit_reference(example_trail, tmp_path_factory):
+    # Summits on the trail, so that there are summits to find, among summits scattered over the surrounding area
+    rng = np.random.default_rng(0)
+    on_trail = rng.choice(example_trail.length, 30, replace=False)
+    latitude = np.concatenate([example_trail.latitude[on_trail], rng.uniform(56.5, 57.6, 3000)])
+    longitude = np.concatenate([example_trail.longitude[on_trail], rng.uniform(-4.2, -3.1, 3000)])
+    n = len(latitude)
+    raw = pd.DataFrame({'Number': np.arange(n), 'Name': [f'Hill {i}' for i in range(n)],
+                        'Metres': rng.uniform(100., 1300., n), 'Latitude': latitude, 'Longitude': longitude})
+    for code in REPORT_CONFIG.classification_codes:
+        raw[code] = rng.integers(0, 2, n)
+
+    filepath = str(tmp_path_factory.mktemp('summits') / 'database.pkl')
+    write_summit_database(optimise_summit_table(raw, classification_columns=REPORT_CONFIG.classification_codes),
+                          filepath, classification_codes=REPORT_CONFIG.classification_codes)
+    return open_summit_reference(filepath, classification_codes=REPORT_CONFIG.classification_codes)
+
+
+def chunks(trail: CoordinateSet, chunk_size: int):
+    for start in range(0, trail.length, chunk_size):
+        yield trail.select(np.arange(start, min(start + chunk_size, trail.length)))
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 2500, 23246])
+def test_incremental_detector_matches_one_shot_search(example_trail, summit_reference, chunk_size):
+    expected_summits = find_visited_summits(summit_reference_data=summit_reference, gpx_trail=example_trail)
+    detector = IncrementalSummitDetector(summit_reference)
+
+    for chunk in chunks(example_trail, chunk_size):
+        detector.add_chunk(chunk)
+
+    assert len(expected_summits) > 0
+    assert detector.point_count == example_trail.length
+    assert detector.visited_summits['Number'].tolist() == expected_summits['Number'].tolist()
+    assert detector.report() == generate_summit_report(summits=expected_summits, config=REPORT_CONFIG)
+
+
+def test_incremental_detector_returns_summits_first_visited_in_each_chunk(example_trail, summit_reference):
+    detector = IncrementalSummitDetector(summit_reference)
+
+    new_summits = [detector.add_chunk(chunk)['Number'].tolist() for chunk in chunks(example_trail, 2000)]
+
+    visited = detector.visited_summits['Number'].tolist()
+    assert sum(new_summits, []) == visited
+    assert len(set(visited)) == len(visited)
+    for i, chunk in enumerate(chunks(example_trail, 2000)):
+        prefix = example_trail.select(np.arange(0, min((i + 1) * 2000, example_trail.length)))
+        assert find_visited_summits(summit_reference_data=summit_reference, gpx_trail=prefix)['Number'].tolist() == \
+               sum(new_summits[:i + 1], [])
+
+
+def test_incremental_detector_loads_candidates_when_trail_leaves_window(summit_reference):
+    detector = IncrementalSummitDetector(summit_reference, search_window_width=0.1, window_margin=0.1)
+
+    detector.add_chunk(CoordinateSet(latitude=np.array([57.0, 57.01]), longitude=np.array([-3.6, -3.6])))
+    detector.add_chunk(CoordinateSet(latitude=np.array([57.05, 57.09]), longitude=np.array([-3.65, -3.55])))
+    assert detector.window_load_count == 1
+
+    detector.add_chunk(CoordinateSet(latitude=np.array([57.2]), longitude=np.array([-3.6])))
+    assert detector.window_load_count == 2
+    assert detector.candidate_summits['Latitude'].max() <= 57.2 + 0.2
+
+
+def test_incremental_detector_without_chunks(summit_reference):
+    detector = IncrementalSummitDetector(summit_reference)
+
+    assert len(detector.add_chunk(CoordinateSet(latitude=np.array([]), longitude=np.array([])))) == 0
+    assert len(detector.visited_summits) == 0
+    assert detector.report() is None
@@ -1,4 +1,5 @@
-from src.summits.nearest_neighbour import haversine_distance, EARTH_RADIUS, nearest_neighbour_search
+from src.summits.nearest_neighbour import (haversine_distance, EARTH_RADIUS, nearest_neighbour_search,
+                                          nearest_neighbour_search_radians)
 import pytest
 import numpy as np
 
@@ -31,3 +32,77 @@ def test_nearest_neighbour_search():
 
     np.testing.assert_almost_equal(expected_result_distance, actual_result_distance)
     np.testing.assert_almost_equal(expected_result_index, actual_result_index)
+
+
+def full_matrix_nearest_neighbour_search(coordinates: CoordinateSet, reference_points: CoordinateSet):
+    # Reference implementation: the full float64 distance matrix, as computed before the search was blocked
+    coord_latitude, ref_latitude = np.meshgrid(np.radians(coordinates.latitude), np.radians(reference_points.latitude),
+                                               sparse=True)
+    coord_longitude, ref_longitude = np.meshgrid(np.radians(coordinates.longitude),
+                                                 np.radians(reference_points.longitude), sparse=True)
+    distance_matrix = haversine_distance(ref_longitude, ref_latitude, coord_longitude, coord_latitude)
+    minimum_indices = np.argmin(distance_matrix, axis=0)
+    return distance_matrix[minimum_indices, range(coordinates.length)], minimum_indices
+
+
+@pytest.fixture
+def random_search():
+    rng = np.random.default_rng(0)
+    coords = CoordinateSet(latitude=rng.uniform(54., 55., 3000), longitude=rng.uniform(-3.5, -2.5, 3000))
+    reference_set = CoordinateSet(latitude=rng.uniform(54., 55., 500), longitude=rng.uniform(-3.5, -2.5, 500))
+    return coords, reference_set
+
+
+@pytest.mark.parametrize("block_size", [1, 499, 500, 12345, 1 << 18])
+def test_nearest_neighbour_search_radians_matches_full_matrix(random_search, block_size):
+    coords, reference_set = random_search
+    expected_distance, expected_index = full_matrix_nearest_neighbour_search(coords, reference_set)
+
+    actual_distance, actual_index = nearest_neighbour_search_radians(
+        CoordinateSet(latitude=np.radians(coords.latitude), longitude=np.radians(coords.longitude)),
+        CoordinateSet(latitude=np.radians(reference_set.latitude), longitude=np.radians(reference_set.longitude)),
+        block_size=block_size)
+
+    np.testing.assert_array_equal(actual_index, expected_index)
+    np.testing.assert_allclose(actual_distance, expected_distance, rtol=1e-9, atol=1e-6)
+
+
+def test_nearest_neighbour_search_float32_within_tolerance(random_search):
+    coords, reference_set = random_search
+    expected_distance, expected_index = full_matrix_nearest_neighbour_search(coords, reference_set)
+
+    actual_distance, actual_index = nearest_neighbour_search(coordinates=coords, reference_points=reference_set,
+                                                             dtype=np.float32)
+
+    assert actual_distance.dtype == np.float64
+    np.testing.assert_allclose(actual_distance, expected_distance, atol=1.)
+    # Where a different reference point is selected, it is at almost the same distance as the nearest
+    mismatched = actual_index != expected_index
+    assert mismatched.mean() < 0.01
+    np.testing.assert_allclose(haversine_distance(np.radians(reference_set.longitude[actual_index[mismatched]]),
+                                                  np.radians(reference_set.latitude[actual_index[mismatched]]),
+                                                  np.radians(coords.longitude[mismatched]),
+                                                  np.radians(coords.latitude[mismatched])),
+                               expected_distance[mismatched], atol=1.)
+
+
+def test_nearest_neighbour_search_float32_close_approach():
+    # Distances that qualify a summit visit are resolved to well within the 20 m proximity threshold
+    summit = CoordinateSet(latitude=np.array([57.0, 57.001]), longitude=np.array([-5.0, -5.0]))
+    offsets = np.linspace(-5e-4, 5e-4, 101)
+    coords = CoordinateSet(latitude=57.0 + offsets, longitude=np.full(101, -5.0) + offsets)
+    expected_distance, expected_index = full_matrix_nearest_neighbour_search(coords, summit)
+
+    actual_distance, actual_index = nearest_neighbour_search(coordinates=coords, reference_points=summit,
+                                                             dtype=np.float32)
+
+    np.testing.assert_array_equal(actual_index, expected_index)
+    np.testing.assert_allclose(actual_distance, expected_distance, atol=1.)
+
+
+def test_nearest_neighbour_search_no_coordinates():
+    reference_set = CoordinateSet(latitude=np.array([50.]), longitude=np.array([0.]))
+    distances, indices = nearest_neighbour_search(coordinates=CoordinateSet(latitude=np.array([]),
+                                                                            longitude=np.array([])),
+                                                  reference_points=reference_set)
+    assert len(distances) == 0 and len(indices) == 0
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from src.data_sources.summits import LocalFileSummitReference
+from src.models.coordinates import CoordinateSet
+from src.summits import find_visited_summits
+from src.summits.nearest_neighbour import nearest_neighbour_search
+from src.summits.parallel import parallel_nearest_neighbour_search, resolve_worker_count
+
+from unittest.mock import MagicMock
+
+
+def random_coordinates(size: int, seed: int) -> CoordinateSet:
+    rng = np.random.default_rng(seed)
+    return CoordinateSet(latitude=rng.uniform(56., 57., size), longitude=rng.uniform(-4., -3., size))
+
+
+def test_parallel_nearest_neighbour_search_is_identical_to_sequential_search():
+    coords = random_coordinates(1000, seed=1)
+    reference_set = random_coordinates(50, seed=2)
+
+    expected_distance, expected_index = nearest_neighbour_search(coordinates=coords, reference_points=reference_set)
+    actual_distance, actual_index = parallel_nearest_neighbour_search(coordinates=coords,
+                                                                      reference_points=reference_set,
+                                                                      workers=2,
+                                                                      chunk_size=128)
+
+    np.testing.assert_array_equal(expected_distance, actual_distance)
+    np.testing.assert_array_equal(expected_index, actual_index)
+
+
+def test_parallel_nearest_neighbour_search_is_identical_to_sequential_search_for_float32_reference_points():
+    coords = random_coordinates(1000, seed=5)
+    reference_set = random_coordinates(50, seed=6)
+    reference_set = CoordinateSet(latitude=reference_set.latitude.astype(np.float32),
+                                  longitude=reference_set.longitude.astype(np.float32))
+
+    for dtype in (np.float64, np.float32):
+        expected_distance, expected_index = nearest_neighbour_search(coordinates=coords,
+                                                                     reference_points=reference_set,
+                                                                     dtype=dtype)
+        actual_distance, actual_index = parallel_nearest_neighbour_search(coordinates=coords,
+                                                                          reference_points=reference_set,
+                                                                          workers=2,
+                                                                          chunk_size=128,
+                                                                          dtype=dtype)
+
+        np.testing.assert_array_equal(expected_distance, actual_distance)
+        np.testing.assert_array_equal(expected_index, actual_index)
+
+
+def test_parallel_nearest_neighbour_search_falls_back_to_sequential_search_with_one_worker():
+    coords = random_coordinates(100, seed=3)
+    reference_set = random_coordinates(10, seed=4)
+
+    expected_distance, expected_index = nearest_neighbour_search(coordinates=coords, reference_points=reference_set)
+    actual_distance, actual_index = parallel_nearest_neighbour_search(coordinates=coords,
+                                                                      reference_points=reference_set,
+                                                                      workers=1,
+                                                                      chunk_size=10)
+
+    np.testing.assert_array_equal(expected_distance, actual_distance)
+    np.testing.assert_array_equal(expected_index, actual_index)
+
+
+def test_resolve_worker_count():
+    assert resolve_worker_count(4) == 4
+    assert resolve_worker_count(0) == 1
+    assert resolve_worker_count(None) >= 1
+
+
+def test_find_visited_summits_with_multiple_workers():
+    mock_summit_database = pd.DataFrame({'Latitude': [0., 10., 20.],
+                                         'Longitude': [0., 0., 0.],
+                                         'Name': ['A', 'B', 'C']})
+
+    mock_summit_reference = LocalFileSummitReference('mock_filepath.pkl')
+    mock_summit_reference._load_from_file = MagicMock(return_value=mock_summit_database)
+
+    gpx_coords = CoordinateSet(latitude=np.linspace(0., 10., 5001), longitude=np.zeros(5001))
+
+    expected_result = find_visited_summits(gpx_trail=gpx_coords,
+                                           summit_reference_data=mock_summit_reference,
+                                           distance_proximity=10)
+    calculated_result = find_visited_summits(gpx_trail=gpx_coords,
+                                             summit_reference_data=mock_summit_reference,
+                                             distance_proximity=10,
+                                             workers=2)
+
+    assert calculated_result['Name'].to_list() == ['A', 'B']
+    pd.testing.assert_frame_equal(expected_result, calculated_result)
@@ -0,0 +1,85 @@
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from src.data_sources.summits import LocalFileSummitReference
+from src.models.coordinates import CoordinateSet
+from src.summits import report_summit_visits, route_may_visit_summits
+from src.summits.polyline import decode_polyline, distance_to_polyline
+from src.summits.visited_summits import find_summits_near_polyline
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+
+def test_decode_polyline():
+    # example from the encoded polyline algorithm format documentation
+    calculated_result = decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+
+    np.testing.assert_allclose(calculated_result.latitude, [38.5, 40.7, 43.252])
+    np.testing.assert_allclose(calculated_result.longitude, [-120.2, -120.95, -126.453])
+
+
+def test_decode_empty_polyline():
+    assert decode_polyline('').length == 0
+
+
+def test_summary_polyline_is_close_to_full_route():
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'activity.json'), 'r') as file:
+        summary_route = decode_polyline(json.load(file)['map']['summary_polyline'])
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'example_streamset.json'), 'r') as file:
+        latlng = np.array(json.load(file)['latlng']['data'])
+
+    distances = distance_to_polyline(CoordinateSet(latitude=latlng[:, 0], longitude=latlng[:, 1]), summary_route)
+
+    assert distances.max() < 20.
+
+
+def test_distance_to_polyline_measures_to_nearest_segment():
+    # each step of 1e-5 is approx. 1.11 m of distance
+    polyline = CoordinateSet(latitude=np.array([0., 0., 0.01]), longitude=np.array([0., 0.02, 0.02]))
+    points = CoordinateSet(latitude=np.array([1e-3, 0.005, 0.]), longitude=np.array([0.01, 0.021, -1e-3]))
+
+    calculated_result = distance_to_polyline(points, polyline)
+
+    np.testing.assert_allclose(calculated_result, [111.2, 111.2, 111.2], rtol=1e-2)
+
+
+def test_find_summits_near_polyline_includes_summits_between_vertices():
+    mock_summit_database = pd.DataFrame({'Latitude': [0.0005, 0.003, 0.],
+                                         'Longitude': [0.01, 0.01, 0.05],
+                                         'Name': ['A', 'B', 'C']})
+    mock_summit_reference = LocalFileSummitReference('mock_filepath.pkl')
+    mock_summit_reference._load_from_file = MagicMock(return_value=mock_summit_database)
+    polyline = CoordinateSet(latitude=np.array([0., 0.]), longitude=np.array([0., 0.02]))
+
+    calculated_result = find_summits_near_polyline(mock_summit_reference, polyline, search_radius=250.)
+
+    assert list(calculated_result['Name']) == ['A']
+
+
+def test_route_may_visit_summits(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Latitude': [0.001], 'Longitude': [0.01], 'Name': ['A'], 'Metres': [100.]}).to_pickle(
+        database_filepath)
+    polyline = CoordinateSet(latitude=np.array([0., 0.]), longitude=np.array([0., 0.02]))
+
+    assert route_may_visit_summits(polyline, database_filepath, search_radius=250.)
+    assert not route_may_visit_summits(polyline, database_filepath, search_radius=50.)
+    assert not route_may_visit_summits(decode_polyline(''), database_filepath)
+
+
+def test_route_may_visit_summits_shares_the_summit_table_of_the_summit_report(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    pd.DataFrame({'Latitude': [0.001], 'Longitude': [0.01], 'Name': ['A'], 'Metres': [100.]}).to_pickle(
+        database_filepath)
+    polyline = CoordinateSet(latitude=np.array([0., 0.]), longitude=np.array([0., 0.02]))
+
+    with patch('data_sources.summits.pd.read_pickle', wraps=pd.read_pickle) as mock_read_pickle:
+        for _ in range(3):
+            assert route_may_visit_summits(polyline, database_filepath, search_radius=250.)
+            report_summit_visits(lat=np.zeros(2), lng=np.zeros(2), database_filepath=database_filepath)
+
+    assert mock_read_pickle.call_count == 1
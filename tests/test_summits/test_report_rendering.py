@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from src.summits.report_configuration import REPORT_CONFIG
+from src.summits.summit_report import (generate_report_from_classification_descriptions,
+                                       generate_visited_summit_report, get_summit_descriptions_by_classification,
+                                       group_summits_by_classification, reduce_classification_masks,
+                                       render_summit_report)
+
+
+def reference_descriptions_by_classification(hill_report_data, reported_classifications, config):
+    # Row-by-row DataFrame implementation that the rendering engine replaced
+    summit_classes = pd.DataFrame(columns=config.code_mapping.values())
+    for summit_name, reported_classes in reported_classifications.items():
+        summit_classes.loc[summit_name, :] = False
+        summit_classes.loc[summit_name, reported_classes] = True
+
+    summit_descriptions = {}
+    for classification in summit_classes.columns:
+        summits_of_class = summit_classes.loc[summit_classes[classification].astype(bool)].index
+        if len(summits_of_class):
+            descriptions = [f"{hill_report_data.loc[s, 'Name']} ({hill_report_data.loc[s, 'Metres']} m)"
+                            for s in summits_of_class]
+            summit_descriptions.update({str(classification) + 's': ', '.join(descriptions)})
+    return summit_descriptions
+
+
+def mock_visited_summits(n, seed):
+    rng = np.random.default_rng(seed)
+    masks = reduce_classification_masks(rng.integers(0, 1 << len(REPORT_CONFIG.classes), n,
+                                                     dtype=REPORT_CONFIG.bitmask_dtype), REPORT_CONFIG)
+    summits = pd.DataFrame({'Name': [f'Hill {i % 7}' for i in range(n)],
+                            'Metres': np.round(rng.uniform(100., 1350., n), 1)},
+                           index=rng.permutation(n))
+    return summits, masks
+
+
+def test_render_summit_report_matches_reference_rendering():
+    for seed in range(5):
+        summits, masks = mock_visited_summits(40, seed)
+        reported_classifications = {s: REPORT_CONFIG.decode_classifications(m) for s, m in zip(summits.index, masks)}
+
+        expected_result = generate_report_from_classification_descriptions(
+            reference_descriptions_by_classification(summits, reported_classifications, REPORT_CONFIG))
+        rendered_result = render_summit_report(np.asarray(summits['Name']), np.asarray(summits['Metres']), masks,
+                                               REPORT_CONFIG)
+        dictionary_result = generate_visited_summit_report(summits, reported_classifications, REPORT_CONFIG)
+
+        assert rendered_result == expected_result
+        assert dictionary_result == expected_result
+
+
+def test_get_summit_descriptions_by_classification_matches_reference():
+    summits, masks = mock_visited_summits(25, seed=7)
+    reported_classifications = {s: REPORT_CONFIG.decode_classifications(m) for s, m in zip(summits.index, masks)}
+
+    expected_result = reference_descriptions_by_classification(summits, reported_classifications, REPORT_CONFIG)
+    calculated_result = get_summit_descriptions_by_classification(summits, reported_classifications, REPORT_CONFIG)
+
+    assert list(calculated_result.items()) == list(expected_result.items())
+
+
+def test_generate_visited_summit_report_includes_summit_with_index_zero():
+    summits = pd.DataFrame({'Name': ['Cairn Gorm', 'Creag an Leth-choin'], 'Metres': [1244.8, 1053.0]})
+    reported_classifications = {0: ['Munro'], 1: ['Munro Top']}
+
+    calculated_result = generate_visited_summit_report(summits, reported_classifications, REPORT_CONFIG)
+
+    assert calculated_result == ('Summits visited:\n'
+                                 'Munros: Cairn Gorm (1244.8 m)\n\n'
+                                 'Munro Tops: Creag an Leth-choin (1053.0 m)')
+
+
+def test_render_summit_report_returns_none_without_reported_summits():
+    masks = np.zeros(2, dtype=REPORT_CONFIG.bitmask_dtype)
+
+    assert render_summit_report(np.array(['A', 'B']), np.array([1., 2.]), masks, REPORT_CONFIG) is None
+
+
+def test_group_summits_by_classification_uses_configuration_order():
+    masks = np.array([REPORT_CONFIG.classification_mask(['Tump']),
+                      REPORT_CONFIG.classification_mask(['Munro', 'Corbett']),
+                      REPORT_CONFIG.classification_mask(['Munro'])])
+
+    groups = group_summits_by_classification(masks, REPORT_CONFIG)
+
+    assert list(groups.keys()) == ['Munro', 'Corbett', 'Tump']
+    np.testing.assert_array_equal(groups['Munro'], [1, 2])
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.data_sources.report_store import InMemoryReportStore
+from src.summits import report_visited_summits, find_visited_summits
+from src.summits.report_configuration import REPORT_CONFIG, ReportConfiguration, ReportedSummit
+
+
+def write_mock_database(filepath):
+    pd.DataFrame({'Latitude': [0.05, 0.],
+                  'Longitude': [0., 0.],
+                  'Name': ['B', 'A'],
+                  'Metres': [200, 100],
+                  'M': [0, 1],
+                  'Ma': [1, 1]}).to_pickle(filepath)
+
+
+def test_report_visited_summits_serves_repeated_trail_from_report_store(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    write_mock_database(database_filepath)
+    report_store = InMemoryReportStore()
+    lat, lng = np.array([0., 1e-5]), np.array([0., 0.])
+
+    first_report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                          report_store=report_store)
+    with mock.patch('src.summits.find_visited_summits', side_effect=find_visited_summits) as mock_search:
+        second_report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                               report_store=report_store)
+
+    assert first_report == 'Summits visited:\nMunros: A (100 m)'
+    assert second_report == first_report
+    mock_search.assert_not_called()
+
+
+def test_report_visited_summits_searches_again_when_database_changes(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    write_mock_database(database_filepath)
+    report_store = InMemoryReportStore()
+    lat, lng = np.array([0., 1e-5]), np.array([0., 0.])
+
+    report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath, report_store=report_store)
+    pd.DataFrame({'Latitude': [0.05, 0.], 'Longitude': [0., 0.], 'Name': ['B', 'A'], 'Metres': [200, 101],
+                  'M': [0, 1]}).to_pickle(database_filepath)
+    report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                    report_store=report_store)
+
+    assert report == 'Summits visited:\nMunros: A (101 m)'
+    assert len(report_store) == 2
+
+
+def test_report_configuration_fingerprint_depends_on_classes():
+    munro = ReportedSummit(code='M', name='Munro', is_primary=True, is_top=False)
+    tump = ReportedSummit(code='Tu', name='Tump', is_primary=False, is_top=False)
+
+    assert ReportConfiguration([munro, tump]).fingerprint == ReportConfiguration([munro, tump]).fingerprint
+    assert ReportConfiguration([munro, tump]).fingerprint != ReportConfiguration([tump, munro]).fingerprint
+    assert REPORT_CONFIG.fingerprint != ReportConfiguration([munro]).fingerprint
+
+
+def test_report_visited_summits_prunes_by_elevation(tmp_path):
+    database_filepath = str(tmp_path / 'database.pkl')
+    write_mock_database(database_filepath)
+    report_store = InMemoryReportStore()
+    lat, lng, altitude = np.array([0., 1e-5]), np.array([0., 0.]), np.array([98., 99.])
+
+    unpruned_report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                             report_store=report_store)
+    pruned_report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                           report_store=report_store, altitude=altitude, elev_high=99.,
+                                           elevation_tolerance=20.)
+    below_tolerance_report = report_visited_summits(lat=lat, lng=lng, database_filepath=database_filepath,
+                                                    report_store=report_store, altitude=altitude - 50.,
+                                                    elevation_tolerance=20.)
+
+    assert pruned_report == unpruned_report == 'Summits visited:\nMunros: A (100 m)'
+    assert below_tolerance_report is None
+    assert len(report_store) == 3
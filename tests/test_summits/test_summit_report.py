@@ -7,7 +7,7 @@ from stravaclient import StravaClient
 from src.summits.summit_report import get_summit_classifications, convert_classification_codes_to_names, \
     reduce_classification_list, generate_visited_summit_report, generate_summit_report
 from src.summits.report_configuration import REPORT_CONFIG, ReportConfiguration, ReportedSummit
-from src.update_strava_description import report_visited_summits
+from src.summits import report_visited_summits
 
 EXAMPLE_STREAMSET_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data',
                                       'example_streamset.json')
@@ -0,0 +1,78 @@
+import datetime as dt
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.weather.frame import WeatherFrame
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+
+def load_weather_data() -> pd.DataFrame:
+    df = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'weather.csv'))
+    df['time'] = pd.to_datetime(df['time'])
+    df.set_index('time', inplace=True)
+    df['condition'] = df['condition'].apply(lambda x: json.loads(x.replace('\'', '"')))
+    return df
+
+
+def hourly_record(time: str, text: str, temp_c: float = 10.) -> dict:
+    return {'time': time, 'temp_c': temp_c, 'feelslike_c': temp_c - 2., 'wind_mph': 5., 'gust_mph': 10.,
+            'condition': {'text': text, 'code': 1000}}
+
+
+def test_weather_frame_from_dataframe_encodes_conditions_as_categories():
+    frame = WeatherFrame.from_dataframe(load_weather_data())
+
+    assert frame.length == 24
+    assert frame.condition_code.dtype == np.int32
+    assert list(frame.condition_text) == sorted(set(frame.condition_text))
+    assert frame.condition_text[frame.condition_code[0]] == 'Overcast'
+
+
+@pytest.mark.parametrize('start_time, end_time', [
+    (dt.datetime(2022, 7, 14, 7, 20, 34), dt.datetime(2022, 7, 14, 13, 47, 59)),
+    (dt.datetime(2022, 7, 14, 0, 0), dt.datetime(2022, 7, 14, 23, 0)),
+    (dt.datetime(2022, 7, 14, 12, 0), dt.datetime(2022, 7, 14, 12, 0))
+])
+def test_weather_frame_window_matches_dataframe_selection(start_time, end_time):
+    df = load_weather_data()
+    expected = df.loc[(df.index >= pd.Timestamp(start_time).floor('h')) &
+                      (df.index <= pd.Timestamp(end_time).ceil('h'))]
+
+    window = WeatherFrame.from_dataframe(df).window(start_time, end_time)
+
+    np.testing.assert_array_equal(window.time, expected.index.values)
+    np.testing.assert_array_equal(window.temp_c, expected['temp_c'].values)
+    np.testing.assert_array_equal(window.gust_mph, expected['gust_mph'].values)
+
+
+def test_weather_frame_sorts_by_time():
+    frame = WeatherFrame.from_hourly_records([hourly_record('2022-07-14 01:00', 'Sunny', temp_c=1.),
+                                              hourly_record('2022-07-14 00:00', 'Mist', temp_c=0.)])
+
+    np.testing.assert_array_equal(frame.temp_c, [0., 1.])
+    assert frame.most_common_condition() == 'Mist'
+
+
+def test_weather_frame_most_common_condition():
+    frame = WeatherFrame.from_hourly_records([hourly_record('2022-07-14 00:00', 'Sunny'),
+                                              hourly_record('2022-07-14 01:00', 'Mist'),
+                                              hourly_record('2022-07-14 02:00', 'Mist'),
+                                              hourly_record('2022-07-14 03:00', 'Sunny'),
+                                              hourly_record('2022-07-14 04:00', 'Mist')])
+    assert frame.most_common_condition() == 'Mist'
+
+
+def test_weather_frame_concat_merges_condition_lookup():
+    first = WeatherFrame.from_hourly_records([hourly_record('2022-07-15 00:00', 'Sunny')])
+    second = WeatherFrame.from_hourly_records([hourly_record('2022-07-14 23:00', 'Mist')])
+
+    frame = WeatherFrame.concat([first, second])
+
+    assert list(frame.condition_text[frame.condition_code]) == ['Mist', 'Sunny']
+    np.testing.assert_array_equal(frame.time, np.array(['2022-07-14T23:00', '2022-07-15T00:00'],
+                                                       dtype='datetime64[ns]'))
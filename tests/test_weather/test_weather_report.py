@@ -1,9 +1,11 @@
 import json
+import numpy as np
 import pandas as pd
 from unittest import mock
 import os
 
-from src.weather.report import generate_weather_report_for_activity
+from src.models.coordinates import CoordinateSet
+from src.weather.report import generate_weather_report_for_activity, get_weather_retriever
 
 TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
 
@@ -27,3 +29,30 @@ def test_generate_weather_report_for_activity(mock_get_weather):
                        'Temperature: 7.9 °C (feels like 3.7 °C)\n'
                        'Wind (mph): 11.8, gusting 24.8')
     assert calculated_result == expected_result
+
+
+@mock.patch('src.weather.report.get_weather_history', side_effect=mock_get_weather_data)
+def test_generate_weather_report_for_activity_along_route(mock_get_weather):
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'activity.json'), 'r') as file:
+        activity = json.load(file)
+    route = CoordinateSet(latitude=np.linspace(56.95, 57.15, 1000), longitude=np.full(1000, -3.75))
+
+    calculated_result = generate_weather_report_for_activity(api_key='my_key', strava_activity=activity,
+                                                             route=route, route_samples=50)
+    expected_result = ('Weather: Patchy rain possible\n'
+                       'Temperature: 7.9 °C (feels like 3.7 °C)\n'
+                       'Wind (mph): 11.8, gusting 24.8')
+    assert calculated_result == expected_result
+    assert mock_get_weather.call_count == 3
+
+
+def test_get_weather_retriever_shuts_down_replaced_retriever():
+    first = get_weather_retriever('key-1')
+    assert get_weather_retriever('key-1') is first
+
+    with mock.patch.object(first, 'shutdown') as mock_shutdown:
+        second = get_weather_retriever('key-2')
+
+    assert second is not first
+    mock_shutdown.assert_called_once_with(wait=False)
+    first.shutdown()
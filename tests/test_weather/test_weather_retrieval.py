@@ -0,0 +1,130 @@
+import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.weather.retrieval import DayRequest, WeatherRetriever, plan_day_requests
+
+
+class MockWeatherHistory:
+    """
+    Returns 24 hours of weather for the requested day, blocking until released so that requests overlap.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, api_key, latitude, longitude, start_time, end_time) -> pd.DataFrame:
+        self.calls.append((latitude, longitude, start_time.date()))
+        self.release.wait(timeout=5)
+        times = pd.date_range(start_time, periods=24, freq='h')
+        return pd.DataFrame({'temp_c': np.arange(24.) + start_time.day,
+                             'feelslike_c': np.arange(24.),
+                             'wind_mph': np.ones(24),
+                             'gust_mph': np.ones(24),
+                             'condition': [{'text': 'Sunny', 'code': 1000}] * 24}, index=times)
+
+
+def test_plan_day_requests_splits_range_by_day():
+    requests = plan_day_requests(57., -3., dt.datetime(2022, 7, 14, 22), dt.datetime(2022, 7, 16, 1))
+    assert requests == [DayRequest(57., -3., dt.date(2022, 7, 14)),
+                        DayRequest(57., -3., dt.date(2022, 7, 15)),
+                        DayRequest(57., -3., dt.date(2022, 7, 16))]
+
+
+def test_plan_day_requests_within_one_day():
+    requests = plan_day_requests(57., -3., dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13))
+    assert requests == [DayRequest(57., -3., dt.date(2022, 7, 14))]
+
+
+def test_weather_retriever_stitches_days_into_one_frame():
+    history = MockWeatherHistory()
+    history.release.set()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key')
+
+    frame = retriever.get_weather(57., -3., dt.datetime(2022, 7, 14, 22), dt.datetime(2022, 7, 15, 1))
+
+    assert frame.length == 48
+    assert np.all(np.diff(frame.time) == np.timedelta64(1, 'h'))
+    assert frame.temp_c[0] == 14. and frame.temp_c[-1] == 15. + 23.
+    assert sorted(history.calls) == [(57., -3., dt.date(2022, 7, 14)), (57., -3., dt.date(2022, 7, 15))]
+
+
+def test_weather_retriever_coalesces_concurrent_identical_requests():
+    history = MockWeatherHistory()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key')
+    start_time, end_time = dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(retriever.get_weather, 57., -3., start_time, end_time) for _ in range(4)]
+        while retriever.fetch_count + retriever.coalesced_count < 4:
+            pass
+        history.release.set()
+        frames = [f.result() for f in futures]
+
+    assert len(history.calls) == 1
+    assert retriever.coalesced_count == 3
+    assert all(f.length == 24 for f in frames)
+
+
+def test_weather_retriever_fetches_again_once_request_has_completed_without_cache():
+    history = MockWeatherHistory()
+    history.release.set()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key', cache_size=0)
+    start_time, end_time = dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13)
+
+    retriever.get_weather(57., -3., start_time, end_time)
+    retriever.get_weather(57., -3., start_time, end_time)
+
+    assert len(history.calls) == 2
+
+
+def test_weather_retriever_serves_completed_requests_from_cache():
+    history = MockWeatherHistory()
+    history.release.set()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key', cache_size=1)
+    start_time, end_time = dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13)
+
+    first = retriever.get_weather(57., -3., start_time, end_time)
+    second = retriever.get_weather(57., -3., start_time, end_time)
+    retriever.get_weather(58., -3., start_time, end_time)
+    retriever.get_weather(57., -3., start_time, end_time)
+
+    np.testing.assert_array_equal(first.temp_c, second.temp_c)
+    assert retriever.cache_hit_count == 1
+    assert len(history.calls) == 3
+
+
+def test_weather_retriever_combines_locations():
+    history = MockWeatherHistory()
+    history.release.set()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key')
+
+    frame = retriever.get_weather_at_locations([(57., -3.), (57.1, -3.)],
+                                               dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13))
+
+    assert frame.length == 48
+    assert np.all(np.diff(frame.time) >= np.timedelta64(0, 'h'))
+    assert sorted(history.calls) == [(57., -3., dt.date(2022, 7, 14)), (57.1, -3., dt.date(2022, 7, 14))]
+
+
+def test_weather_retriever_does_not_cache_days_in_progress():
+    history = MockWeatherHistory()
+    history.release.set()
+    # 2022-07-14 has ended in every timezone at 12:00 UTC on 2022-07-15
+    clock_time = dt.datetime(2022, 7, 15, 11, 59, tzinfo=dt.timezone.utc).timestamp()
+    retriever = WeatherRetriever(fetch_history=history, api_key='key', clock=lambda: clock_time)
+    start_time, end_time = dt.datetime(2022, 7, 14, 7), dt.datetime(2022, 7, 14, 13)
+
+    retriever.get_weather(57., -3., start_time, end_time)
+    retriever.get_weather(57., -3., start_time, end_time)
+    assert len(history.calls) == 2
+
+    clock_time = dt.datetime(2022, 7, 15, 12, tzinfo=dt.timezone.utc).timestamp()
+    retriever.get_weather(57., -3., start_time, end_time)
+    retriever.get_weather(57., -3., start_time, end_time)
+    assert len(history.calls) == 3
+    assert retriever.cache_hit_count == 1
@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.models.coordinates import CoordinateSet
+from src.weather.route import sample_route_weather_cells
+
+
+def test_sample_route_weather_cells_merges_samples_in_same_cell():
+    route = CoordinateSet(latitude=np.linspace(57.01, 57.09, 1000), longitude=np.full(1000, -3.65))
+    assert sample_route_weather_cells(route, samples=10) == [(57.05, -3.65)]
+
+
+def test_sample_route_weather_cells_in_order_of_first_visit():
+    route = CoordinateSet(latitude=np.array([57.05, 57.15, 57.25, 57.15, 57.05]),
+                          longitude=np.array([-3.65, -3.65, -3.65, -3.65, -3.65]))
+    assert sample_route_weather_cells(route, samples=5) == [(57.05, -3.65), (57.15, -3.65), (57.25, -3.65)]
+
+
+def test_sample_route_weather_cells_number_of_cells_does_not_grow_with_samples():
+    route = CoordinateSet(latitude=np.linspace(57.0, 57.3, 5000), longitude=np.linspace(-3.7, -3.6, 5000))
+    few_samples = sample_route_weather_cells(route, samples=20)
+    many_samples = sample_route_weather_cells(route, samples=2000)
+    assert few_samples == many_samples
+    assert len(many_samples) == 4
+
+
+def test_sample_route_weather_cells_with_empty_route():
+    route = CoordinateSet(latitude=np.array([]), longitude=np.array([]))
+    assert sample_route_weather_cells(route, samples=10) == []
@@ -0,0 +1,68 @@
+import datetime as dt
+import json
+import os
+from unittest import mock
+
+import pytest
+import pytz
+
+from src.weather import timezones
+from src.weather.timezones import TimezoneResolver, parse_strava_timezone
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'data')
+
+
+def load_activity():
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'activity.json'), 'r') as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize('timezone, expected_result', [('(GMT+00:00) Europe/London', 'Europe/London'),
+                                                       ('(GMT-08:00) America/Los_Angeles', 'America/Los_Angeles'),
+                                                       ('Europe/Paris', 'Europe/Paris')])
+def test_parse_strava_timezone(timezone, expected_result):
+    assert parse_strava_timezone(timezone) == pytz.timezone(expected_result)
+
+
+@pytest.mark.parametrize('timezone', [None, '', '(GMT+00:00) Not/A_Timezone', 42])
+def test_parse_strava_timezone_returns_none_for_invalid_timezone(timezone):
+    assert parse_strava_timezone(timezone) is None
+
+
+def test_resolver_uses_activity_timezone_without_lookup():
+    resolver = TimezoneResolver()
+    with mock.patch.object(timezones, 'tzwhere') as mock_tzwhere:
+        timezone = resolver.resolve(load_activity())
+
+    assert timezone == pytz.timezone('Europe/London')
+    assert resolver.fallback_count == 0
+    mock_tzwhere.tzwhere.assert_not_called()
+
+
+def test_resolver_uses_utc_offset_when_timezone_is_inconsistent():
+    activity = load_activity()
+    activity['timezone'] = '(GMT+01:00) Europe/Paris'
+    resolver = TimezoneResolver()
+
+    timezone = resolver.resolve(activity)
+
+    assert timezone == dt.timezone(dt.timedelta(hours=1))
+    assert resolver.fallback_count == 0
+
+
+def test_resolver_falls_back_to_cached_location_lookup():
+    activity = load_activity()
+    del activity['timezone']
+    del activity['utc_offset']
+    resolver = TimezoneResolver()
+
+    with mock.patch.object(timezones, 'tzwhere') as mock_tzwhere:
+        mock_tzwhere.tzwhere.return_value.tzNameAt.return_value = 'Europe/London'
+        first_timezone = resolver.resolve(activity)
+        second_timezone = resolver.resolve(activity)
+
+    assert first_timezone == second_timezone == pytz.timezone('Europe/London')
+    assert resolver.fallback_count == 2
+    assert resolver.cache_hit_count == 1
+    mock_tzwhere.tzwhere.assert_called_once()
+    mock_tzwhere.tzwhere.return_value.tzNameAt.assert_called_once()